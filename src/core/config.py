@@ -202,6 +202,9 @@ FAULT_COLORS = {
 
 PATHS = {
     "paired_remotes": str(PROJECT_ROOT / "paired_remotes.json"),
+    "motor_config": str(PROJECT_ROOT / "motor_config.json"),
+    "logs": str(PROJECT_ROOT / "logs"),
+    "telemetry": str(PROJECT_ROOT / "logs" / "telemetry"),
     "icon_bt_off": str(PROJECT_ROOT / "icons" / "ble_off.png"),
     "icon_bt_on": str(PROJECT_ROOT / "icons" / "ble_On.png"),
     "icon_wifi_off": str(PROJECT_ROOT / "icons" / "Off_Wifi.png"),
@@ -216,6 +219,8 @@ TIMING = {
     "motor_init_delay": 200,           # Delay before motor init
     "fault_check_interval": 2000,      # Fault monitoring frequency
     "speed_check_interval": 1000,      # Speed monitoring frequency
+    "telemetry_fast_interval": 250,    # Telemetry while ramping or faulted
+    "telemetry_off_interval": 5000,    # Telemetry while powered off
     "fault_cycle_interval": 10000,     # Multi-fault display cycle time
     "pairing_blink_interval": 500,     # BLE pairing icon blink
     "finish_flash_interval": 500,      # Timer finish animation
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+ASPEP/MCP asyncio client
+
+AsyncSerialTransport registers the serial fd with loop.add_reader() and turns
+incoming bytes into frames with the streaming decoder; AsyncASPEPClient matches
+responses to requests in FIFO order, so up to txs_max requests (from any number
+of coroutines) are in flight at once. Payload building and decoding are the
+same helpers ASPEPClient uses.
+
+    client = AsyncASPEPClient("/dev/ttyS0")
+    await client.open()
+    await client.handshake()
+    snapshot = await client.read_telemetry()
+    await client.set_speed_rpm(2400)
+"""
+
+import asyncio
+import struct
+import time
+from collections import deque
+from functools import wraps
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import serial
+
+from hardware.aspep_capture import DecodedFrame, StreamDecoder
+from hardware.flight_recorder import DIR_RX, FlightRecorder
+from hardware.uart_manager import (
+    log, Capabilities, DatalogSubscription, FrameEncoder, LinkSupervisor, MotorConfigStore, RTTEstimator,
+    TelemetrySnapshot, DEFAULT_TIMEOUTS, TELEMETRY_REG_BASES,
+    beacon_frame, ping_frame, registers_request, decode_registers, decode_telemetry, command_payload,
+    speed_ramp_payloads, speed_ref_payloads, ramp_duration_ms, hx,
+    TYPE_SILENT, TYPE_BEACON, TYPE_PING, TYPE_ERROR, TYPE_DATA, TYPE_ACK, TYPE_NACK,
+    START_MOTOR, STOP_MOTOR, FAULT_ACK, SET_DATA_ELEMENT, MOTOR_MASK, REG_MASK,
+    MC_REG_FAULTS_BASE, MC_REG_ASYNC_UARTA_BASE,
+)
+
+_HDR = struct.Struct('<I')
+
+Response = Tuple[int, bytes]  # (packet type, payload)
+
+
+class AsyncSerialTransport:
+    """Non-blocking serial port on the running event loop; hands every decoded frame to on_frame"""
+
+    def __init__(self, port: str, baud: int, on_frame: Callable[[DecodedFrame], None],
+                 recorder: Optional[FlightRecorder] = None) -> None:
+        self.port = port
+        self.baud = baud
+        self.ser: Optional[serial.Serial] = None
+        self._on_frame = on_frame
+        self._decoder = StreamDecoder()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.recorder = recorder
+
+    async def open(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.ser = serial.Serial(self.port, self.baud, timeout=0, exclusive=True)
+        try:
+            self.ser.set_low_latency_mode(True)
+        except (AttributeError, ValueError, OSError) as e:
+            log.debug("Low-latency mode not available on %s: %s", self.port, e)
+        self.ser.reset_input_buffer()
+        self._loop.add_reader(self.ser.fileno(), self._on_readable)
+        log.info(f"Opened {self.port} @ {self.baud} baud (asyncio)")
+
+    def close(self) -> None:
+        if self.ser and self.ser.is_open:
+            if self._loop:
+                self._loop.remove_reader(self.ser.fileno())
+            self.ser.close()
+            log.info("Port closed")
+
+    @property
+    def discarded(self) -> int:
+        return self._decoder.discarded
+
+    def reset(self) -> None:
+        """Forget partial frames and anything still queued in the driver"""
+        self._decoder = StreamDecoder()
+        if self.ser:
+            self.ser.reset_input_buffer()
+
+    def write(self, frame: bytes) -> None:
+        self.ser.write(frame)
+        if self.recorder is not None:
+            self.recorder.tx(frame)
+
+    def _on_readable(self) -> None:
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)
+        except serial.SerialException as e:
+            log.error(f"ERROR: {self.port}: {e}")
+            self._loop.remove_reader(self.ser.fileno())
+            return
+        if not data:
+            return
+        for frame in self._decoder.feed(data, time.monotonic_ns(), DIR_RX):
+            if self.recorder is not None:
+                self.recorder.rx(_HDR.pack(frame.header) + frame.payload)
+            self._on_frame(frame)
+
+
+def bounded_operation(default=None):
+    """Give a public coroutine the operation deadline; on expiry it returns `default`"""
+    def decorate(method):
+        @wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await asyncio.wait_for(method(self, *args, **kwargs), self.timeouts["operation"])
+            except asyncio.TimeoutError:
+                log.error(f"ERROR: {method.__name__}: operation deadline ({self.timeouts['operation']}s) exceeded")
+                return default
+        return wrapper
+    return decorate
+
+
+class AsyncASPEPClient(MotorConfigStore):
+    """ASPEP/MCP client for asyncio code (motor control next to BLE in one event loop)"""
+
+    def __init__(self, port: str = "/dev/ttyS0", baud: int = 115200, config_path: Optional[str] = None,
+                 recorder: Optional[FlightRecorder] = None) -> None:
+        self.transport = AsyncSerialTransport(port, baud, self._on_frame,
+                                              recorder if recorder is not None else FlightRecorder())
+        self.connected = False
+        self.ctrl_caps = Capabilities()
+        self.perf_caps: Optional[Capabilities] = None
+        self.packet_number = 0
+        self.ip_id = 0
+        self.last_nack = False
+        self.link = LinkSupervisor()
+        self.datalog: Optional[DatalogSubscription] = None
+        self._encoder = FrameEncoder()
+        self._pending: Deque[list] = deque()               # [future, expect_data, acked] per request
+        self._pings: Deque[asyncio.Future] = deque()
+        self._beacons: Deque[asyncio.Future] = deque()
+        self._window = asyncio.Semaphore(1)
+        self._last_speed_ref: Optional[int] = None
+        self._acceleration_rpm_s: float = 8000.0
+        self.config_path = config_path
+        self.motor_config: dict = self._load_motor_config()
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(self.motor_config.get("timeouts") or {}))
+        self.rtt = RTTEstimator(self.timeouts["floor"], self.timeouts["command"])
+
+    # ====== PORT ======
+    async def open(self) -> None:
+        await self.transport.open()
+
+    def close(self) -> None:
+        self._fail_pending()
+        self.transport.close()
+        self.connected = False
+
+    # ====== FRAME DISPATCH (event loop reader callback) ======
+    def _on_frame(self, frame: DecodedFrame) -> None:
+        ptype = frame.ptype
+        if ptype == TYPE_BEACON:
+            self._resolve(self._beacons, frame.header)
+        elif ptype == TYPE_PING:
+            self._resolve(self._pings, frame.header)
+        elif ptype == TYPE_DATA and self.datalog and self.datalog.matches(frame.payload):
+            self.datalog.feed(frame.payload)
+            self.link.record_ok()
+        elif ptype in (TYPE_DATA, TYPE_ACK, TYPE_NACK, TYPE_ERROR):
+            if not self._pending:
+                log.debug("Unsolicited packet type=0x%X dropped", ptype)
+                return
+            entry = self._pending[0]
+            if ptype == TYPE_ACK and not frame.payload and entry[1] and not entry[2]:
+                entry[2] = True  # Empty ACK: the DATA follows
+                return
+            self._pending.popleft()
+            if not entry[0].done():
+                entry[0].set_result((ptype, frame.payload))
+        elif ptype != TYPE_SILENT:
+            log.debug("Unexpected packet type=0x%X dropped", ptype)
+
+    @staticmethod
+    def _resolve(waiters: Deque[asyncio.Future], value) -> None:
+        while waiters:
+            fut = waiters.popleft()
+            if not fut.done():
+                fut.set_result(value)
+                return
+
+    def _fail_pending(self) -> None:
+        """Responses can no longer be matched to requests: fail everything in flight"""
+        while self._pending:
+            fut = self._pending.popleft()[0]
+            if not fut.done():
+                fut.set_result(None)
+
+    async def _wait(self, waiters: Deque[asyncio.Future], frame: bytes, timeout: float):
+        fut = asyncio.get_running_loop().create_future()
+        waiters.append(fut)
+        self.transport.write(frame)
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    # ====== HANDSHAKE / LINK ======
+    async def handshake(self) -> bool:
+        """BEACON exchange and PING; sizes the request window from the negotiated txs_max"""
+        if self.connected:
+            return True
+        self.transport.reset()
+        log.info("Handshaking...")
+        hs_timeout = self.timeouts["handshake"]
+        word = await self._wait(self._beacons, beacon_frame(self.ctrl_caps), hs_timeout)
+        if word is None:
+            log.error("ERROR: No performer beacon")
+            return False
+        self.perf_caps = Capabilities.from_lower28(word & 0x0FFFFFFF)
+        self.ctrl_caps.rx_max  = min(self.ctrl_caps.rx_max,  self.perf_caps.rx_max)
+        self.ctrl_caps.txs_max = min(self.ctrl_caps.txs_max, self.perf_caps.txs_max)
+        self.ctrl_caps.txa_max = min(self.ctrl_caps.txa_max, self.perf_caps.txa_max)
+        await self._wait(self._beacons, beacon_frame(self.perf_caps), min(0.1, hs_timeout))
+
+        if not await self._ping(hs_timeout):
+            log.error("ERROR: Ping failed")
+            return False
+        self._window = asyncio.Semaphore(max(1, self.ctrl_caps.txs_max))
+        self.connected = True
+        log.info(f"Handshake OK (window {max(1, self.ctrl_caps.txs_max)})")
+        return True
+
+    async def _ping(self, timeout: float) -> bool:
+        frame = ping_frame(self.ip_id, self.packet_number)
+        self.packet_number = (self.packet_number + 1) & 0xFFFF
+        sent_at = time.monotonic()
+        if await self._wait(self._pings, frame, timeout) is None:
+            return False
+        self.rtt.sample(time.monotonic() - sent_at)
+        self.link.record_ok()
+        return True
+
+    async def ping(self) -> bool:
+        """Keepalive PING; marks the link down after consecutive misses"""
+        if await self._ping(self.rtt.timeout()):
+            return True
+        self.rtt.backoff()
+        self._note_link_failure("ping")
+        return False
+
+    def _note_link_failure(self, what: str) -> None:
+        if self.connected and self.link.record_failure():
+            log.warning(f"Link down after {self.link.failures} missed answers ({what}) - reconnecting")
+            self.connected = False
+            self.link.schedule_retry()
+
+    async def _ensure_link(self) -> bool:
+        if self.connected:
+            return True
+        if not self.link.retry_due():
+            return False
+        if await self.handshake():
+            return True
+        self.link.schedule_retry()
+        return False
+
+    async def supervise(self, interval: float = 0.1) -> None:
+        """Keepalive/reconnect loop; run it as a task next to the application's coroutines"""
+        while True:
+            if self.connected:
+                if self.link.ping_due() and not self._pending:
+                    await self.ping()
+            else:
+                await self._ensure_link()
+            await asyncio.sleep(interval)
+
+    # ====== REQUESTS ======
+    async def _request(self, payload: bytes, label: str, expect_data: bool = False) -> Optional[bytes]:
+        """
+        Send one DATA request and await its response payload (None on NACK/ERROR/timeout).
+        Up to txs_max requests are in flight; responses are matched in FIFO order.
+        """
+        async with self._window:
+            self.last_nack = False
+            fut = asyncio.get_running_loop().create_future()
+            entry = [fut, expect_data, False]
+            alone = not self._pending
+            self._pending.append(entry)
+            self.transport.write(bytes(self._encoder.encode(payload)))
+            sent_at = time.monotonic()
+            log.debug("CMD %s: %s", label, hx(payload))
+
+            rto = self.rtt.timeout()
+            try:
+                result = await asyncio.wait_for(asyncio.shield(fut), rto)
+            except asyncio.TimeoutError:
+                result = None
+                if entry[2]:  # Empty ACK already arrived: give the DATA the data_read budget
+                    try:
+                        result = await asyncio.wait_for(asyncio.shield(fut), self.timeouts["data_read"])
+                    except asyncio.TimeoutError:
+                        pass
+                if result is None and not fut.done():
+                    log.error(f"ERROR: {label}: No response ({rto * 1000:.0f} ms)")
+                    fut.cancel()
+                    self._fail_pending()
+                    self.transport.reset()
+                    self.rtt.backoff()
+                    self._note_link_failure(label)
+                    return None
+            if result is None:
+                return None  # Failed along with an earlier request that lost sync
+
+            ptype, data = result
+            if alone:
+                self.rtt.sample(time.monotonic() - sent_at)
+            self.link.record_ok()
+            if ptype == TYPE_NACK:
+                log.error(f"ERROR: {label}: NACK")
+                self.last_nack = True
+                return None
+            if ptype == TYPE_ERROR:
+                log.error(f"ERROR: {label}: ERROR {hx(data)}")
+                return None
+            return data
+
+    async def _send_with_layouts(self, key: str, formats: List[bytes], label: str) -> bool:
+        """Learned payload layout first; probe the others only when unknown or NACKed"""
+        learned = self.get_layout(key)
+        if learned is not None and 1 <= learned <= len(formats):
+            if await self._request(formats[learned - 1], f"{label}_{learned}") is not None:
+                return True
+            if not self.last_nack:
+                return False
+            log.warning(f"{label}: layout {learned} NACKed - re-probing")
+            self._set_layout(key, None)
+        for i, payload in enumerate(formats, 1):
+            if i != learned and await self._request(payload, f"{label}_{i}") is not None:
+                log.info(f"{label}: controller accepts layout {i}")
+                self._set_layout(key, i)
+                return True
+        return False
+
+    # ====== REGISTERS ======
+    @bounded_operation()
+    async def read_registers(self, registers: Iterable[int], motor_index: int = 1) -> Optional[Dict[int, int]]:
+        """{base_id: value} for several registers in one GET_DATA_ELEMENT"""
+        bases = [r & REG_MASK for r in registers]
+        if not bases:
+            return {}
+        if not await self._ensure_link():
+            return None
+        raw = await self._request(registers_request(bases, motor_index), "READ_REGISTERS", expect_data=True)
+        if not raw:
+            return None
+        values = decode_registers(bases, raw)
+        if values is None:
+            log.warning(f"WARNING: READ_REGISTERS got {len(raw)}B: {hx(raw)}")
+        return values
+
+    @bounded_operation()
+    async def read_telemetry(self, motor_index: int = 1) -> Optional[TelemetrySnapshot]:
+        if not await self._ensure_link():
+            return None
+        raw = await self._request(registers_request(list(TELEMETRY_REG_BASES), motor_index), "READ_TELEMETRY",
+                                  expect_data=True)
+        return decode_telemetry(raw) if raw else None
+
+    async def read_faults(self, motor_index: int = 1) -> Optional[int]:
+        values = await self.read_registers([MC_REG_FAULTS_BASE], motor_index)
+        return values[MC_REG_FAULTS_BASE] if values else None
+
+    # ====== MOTOR COMMANDS ======
+    async def _command(self, command: int, motor_index: int, label: str) -> bool:
+        if not await self._ensure_link():
+            return False
+        return await self._request(command_payload(command, motor_index), label) is not None
+
+    @bounded_operation(False)
+    async def start_motor(self, motor_index: int = 1) -> bool:
+        log.info(f"Starting motor {motor_index}")
+        return await self._command(START_MOTOR, motor_index, "START_MOTOR")
+
+    @bounded_operation(False)
+    async def stop_motor(self, motor_index: int = 1) -> bool:
+        log.info(f"Stopping motor {motor_index}")
+        return await self._command(STOP_MOTOR, motor_index, "STOP_MOTOR")
+
+    @bounded_operation(False)
+    async def fault_acknowledge(self, motor_index: int = 1) -> bool:
+        """FAULT_ACK, then verify that no fault bits remain"""
+        if not await self._command(FAULT_ACK, motor_index, "FAULT_ACK"):
+            return False
+        await asyncio.sleep(0.1)
+        return await self.read_faults(motor_index) == 0
+
+    async def set_speed_rpm(self, rpm: int, motor_index: int = 1) -> bool:
+        """
+        Ramp to rpm at the configured acceleration (RAW ramp, step-wise fallback).
+        The operation deadline applies to the RAW ramp and to each fallback step.
+        """
+        ramped = await self._ramp_raw(rpm, motor_index)
+        if ramped is None:
+            return False
+        return ramped or await self._set_speed_stepwise(rpm, motor_index)
+
+    @bounded_operation()
+    async def _ramp_raw(self, rpm: int, motor_index: int) -> Optional[bool]:
+        """RAW speed ramp from the last reference; None when the link is down"""
+        if not await self._ensure_link():
+            return None
+        current = self._last_speed_ref or 0
+        if rpm == current:
+            return True
+        duration = ramp_duration_ms(rpm - current, self._acceleration_rpm_s)
+        if await self._send_with_layouts("speed_ramp", speed_ramp_payloads(rpm, duration, motor_index),
+                                         "SPEED_RAMP_RAW"):
+            self._last_speed_ref = rpm
+            return True
+        return False
+
+    async def start_motor_with_speed(self, rpm: int, motor_index: int = 1) -> bool:
+        """
+        START_MOTOR and the speed ramp in flight together. Needs a learned ramp layout;
+        otherwise the commands go one after the other so set_speed_rpm can learn it.
+        """
+        ramped = await self._start_with_ramp(rpm, motor_index)
+        if ramped is None:
+            return False
+        return ramped or await self.set_speed_rpm(rpm, motor_index)
+
+    @bounded_operation()
+    async def _start_with_ramp(self, rpm: int, motor_index: int) -> Optional[bool]:
+        """START_MOTOR (+ learned RAW ramp); None if the start failed, False if the speed is still to set"""
+        if not await self._ensure_link():
+            return None
+        layout = self.get_layout("speed_ramp")
+        if rpm <= 0 or layout is None:
+            if not await self._command(START_MOTOR, motor_index, "START_MOTOR"):
+                return None
+            return rpm <= 0
+        ramp = speed_ramp_payloads(rpm, ramp_duration_ms(rpm, self._acceleration_rpm_s), motor_index)[layout - 1]
+        started, ramped = await asyncio.gather(
+            self._request(command_payload(START_MOTOR, motor_index), "START_MOTOR"),
+            self._request(ramp, f"SPEED_RAMP_RAW_{layout}"),
+        )
+        if started is None:
+            return None
+        if ramped is None:
+            return False
+        self._last_speed_ref = rpm
+        return True
+
+    async def _set_speed_stepwise(self, target_rpm: int, motor_index: int, step_size: int = 500,
+                                  step_delay: float = 0.2) -> bool:
+        """SPEED_REF writes in step_size increments (learned "speed_ref" layout; yields between steps)"""
+        log.warning("RAW ramp failed, using step-wise fallback")
+        current = self._last_speed_ref or 0
+        direction = 1 if target_rpm > current else -1
+        setpoints = list(range(current + direction * step_size, target_rpm, direction * step_size)) + [target_rpm]
+        for i, rpm in enumerate(setpoints):
+            if not await self._speed_ref_step(rpm, motor_index):
+                log.error(f"Step failed at {rpm} RPM")
+                return False
+            self._last_speed_ref = rpm
+            if i < len(setpoints) - 1:
+                await asyncio.sleep(step_delay)
+        return True
+
+    @bounded_operation(False)
+    async def _speed_ref_step(self, rpm: int, motor_index: int) -> bool:
+        """One SPEED_REF write, with its own operation deadline"""
+        return await self._send_with_layouts("speed_ref", speed_ref_payloads(rpm, motor_index), "SET_SPEED_REF")
+
+    # ====== DATALOG ======
+    @bounded_operation()
+    async def subscribe_datalog(self, registers: Iterable[int], rate_hz: float,
+                                on_sample: Optional[Callable[[float, int, Dict[int, int]], None]] = None,
+                                buffer_len: int = 1024, motor_index: int = 1) -> Optional[DatalogSubscription]:
+        """Stream registers as ASYNC records; on_sample runs on the event loop"""
+        if not await self._ensure_link():
+            return None
+        sub = DatalogSubscription(list(registers), rate_hz, on_sample, buffer_len)
+        if not await self._write_async_config(sub.config_payload(motor_index), motor_index, "DATALOG_START"):
+            return None
+        self.datalog = sub
+        return sub
+
+    @bounded_operation(False)
+    async def unsubscribe_datalog(self, motor_index: int = 1) -> bool:
+        if not self.datalog:
+            return True
+        cfg = struct.pack('<HBBBBB', 0, 0, 0, 0, 0, self.datalog.mark)
+        ok = await self._write_async_config(cfg, motor_index, "DATALOG_STOP")
+        self.datalog = None
+        return ok
+
+    async def _write_async_config(self, cfg: bytes, motor_index: int, label: str) -> bool:
+        motor = motor_index & MOTOR_MASK
+        payload = struct.pack('<HHH', SET_DATA_ELEMENT | motor, MC_REG_ASYNC_UARTA_BASE | motor, len(cfg)) + cfg
+        return await self._request(payload, label) is not None
+
+
+# ========== ========== ==== ================ ==================== CLI ============ ========== ==========
+async def _demo(port: str, baud: int, interval: float) -> None:
+    client = AsyncASPEPClient(port, baud)
+    await client.open()
+    try:
+        if not await client.handshake():
+            return
+        keepalive = asyncio.create_task(client.supervise())
+        try:
+            while True:
+                # Faults and speed concurrently: both requests share the pipeline window
+                faults, telemetry = await asyncio.gather(client.read_faults(), client.read_telemetry())
+                print(f"faults=0x{(faults or 0):08X} {telemetry}")
+                await asyncio.sleep(interval)
+        finally:
+            keepalive.cancel()
+    finally:
+        client.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="asyncio ASPEP client - telemetry monitor")
+    parser.add_argument("--port", default="/dev/ttyS0")
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--interval", type=float, default=0.5)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_demo(args.port, args.baud, args.interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+ASPEP Capture Tools - capture files, live protocol analyzer and replay
+
+Capture files use the flight recorder format (see hardware.flight_recorder):
+a CZFR header followed by timestamped TX/RX records. A record may hold a whole
+frame (flight recorder dumps) or an arbitrary chunk of line bytes (sniff
+captures); the streaming decoder reassembles frames either way.
+
+Usage (from src/):
+    python -m hardware.aspep_capture analyze capture.czfr
+    python -m hardware.aspep_capture replay capture.czfr --speed 1.0
+"""
+
+import struct
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple
+
+from hardware.flight_recorder import (
+    DIR_RX, DIR_TX, FILE_HEADER, FILE_MAGIC, FILE_VERSION, RECORD_HEADER, Frame, write_header,
+)
+from hardware.uart_manager import (
+    ASPEPClient, check_header_crc, hx, reg_value_size, register_struct, REGISTER_TABLE, SIGNED_REG_BASES,
+    TYPE_SILENT, TYPE_BEACON, TYPE_PING, TYPE_ERROR, TYPE_DATA, TYPE_ACK, TYPE_NACK,
+    GET_MCP_VERSION, SET_DATA_ELEMENT, GET_DATA_ELEMENT, START_MOTOR, STOP_MOTOR, STOP_RAMP,
+    START_STOP, FAULT_ACK, CPULOAD_CLEAR, IQDREF_CLEAR, PFC_ENABLE, PFC_DISABLE, PFC_FAULT_ACK,
+    PROFILER_CMD, SW_RESET, MOTOR_MASK, REG_MASK, TYPE_MASK, TYPE_DATA_RAW,
+    MC_REG_SPEED_RAMP_BASE, MC_REG_ASYNC_UARTA_BASE,
+)
+
+_HDR = struct.Struct('<I')
+
+PACKET_TYPE_NAMES = {
+    TYPE_SILENT: "SILENT", TYPE_BEACON: "BEACON", TYPE_PING: "PING", TYPE_ERROR: "ERROR",
+    TYPE_DATA: "DATA", TYPE_ACK: "ACK", TYPE_NACK: "NACK",
+}
+
+MCP_COMMAND_NAMES = {
+    GET_MCP_VERSION: "GET_MCP_VERSION", SET_DATA_ELEMENT: "SET_DATA_ELEMENT",
+    GET_DATA_ELEMENT: "GET_DATA_ELEMENT", START_MOTOR: "START_MOTOR", STOP_MOTOR: "STOP_MOTOR",
+    STOP_RAMP: "STOP_RAMP", START_STOP: "START_STOP", FAULT_ACK: "FAULT_ACK",
+    CPULOAD_CLEAR: "CPULOAD_CLEAR", IQDREF_CLEAR: "IQDREF_CLEAR", PFC_ENABLE: "PFC_ENABLE",
+    PFC_DISABLE: "PFC_DISABLE", PFC_FAULT_ACK: "PFC_FAULT_ACK", PROFILER_CMD: "PROFILER_CMD",
+    SW_RESET: "SW_RESET",
+}
+
+REGISTER_NAMES = {reg.base: reg.name.upper() for reg in REGISTER_TABLE}
+REGISTER_NAMES.update({MC_REG_SPEED_RAMP_BASE: "SPEED_RAMP", MC_REG_ASYNC_UARTA_BASE: "ASYNC_UARTA"})
+
+MAX_FRAME = 4 + 0x1FFF  # Largest frame a 13-bit length field can describe
+
+
+# =========== ========== ========== =================== CAPTURE FILES =================== ========== ==========
+@dataclass
+class CaptureInfo:
+    """Capture file header"""
+    version: int
+    wall_start: float       # Wall-clock time matching mono_start_ns
+    mono_start_ns: int
+
+
+def read_capture_info(f: BinaryIO) -> CaptureInfo:
+    raw = f.read(FILE_HEADER.size)
+    if len(raw) < FILE_HEADER.size:
+        raise ValueError("Truncated capture header")
+    magic, version, _, wall_start, mono_start_ns = FILE_HEADER.unpack(raw)
+    if magic != FILE_MAGIC:
+        raise ValueError(f"Not an ASPEP capture (magic {magic!r})")
+    if version > FILE_VERSION:
+        raise ValueError(f"Unsupported capture version {version}")
+    return CaptureInfo(version, wall_start, mono_start_ns)
+
+
+def iter_capture(path: str) -> Iterator[Frame]:
+    """Stream (monotonic ns, direction, data) records from a capture file"""
+    with open(path, 'rb') as f:
+        read_capture_info(f)
+        while True:
+            raw = f.read(RECORD_HEADER.size)
+            if len(raw) < RECORD_HEADER.size:
+                return
+            t_ns, direction, length = RECORD_HEADER.unpack(raw)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield t_ns, direction, data
+
+
+class CaptureWriter:
+    """Streams TX/RX records to a capture file as they happen"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._f = open(path, 'wb')
+        write_header(self._f, time.time(), time.monotonic_ns())
+        self.records = 0
+
+    def write(self, direction: int, data: bytes, t_ns: Optional[int] = None) -> None:
+        self._f.write(RECORD_HEADER.pack(t_ns if t_ns is not None else time.monotonic_ns(),
+                                         direction, len(data)))
+        self._f.write(data)
+        self.records += 1
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# =========== ========== ========== =================== STREAM DECODER =================== ========== ==========
+@dataclass
+class DecodedFrame:
+    """One ASPEP packet reassembled from the byte stream"""
+    t_ns: int
+    direction: int
+    ptype: int
+    header: int
+    payload: bytes
+
+
+class StreamDecoder:
+    """Incremental ASPEP frame decoder for one direction, with bounded memory"""
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self.discarded = 0
+
+    def feed(self, data: bytes, t_ns: int, direction: int) -> List[DecodedFrame]:
+        """Add bytes and return every frame they complete"""
+        self._buf += data
+        frames: List[DecodedFrame] = []
+        pos = 0
+        buf = self._buf
+        while len(buf) - pos >= 4:
+            word = _HDR.unpack_from(buf, pos)[0]
+            if not check_header_crc(word):
+                pos += 1
+                self.discarded += 1
+                continue
+            ptype = word & 0xF
+            length = (word >> 4) & 0x1FFF if ptype in (TYPE_DATA, TYPE_ACK, TYPE_NACK, TYPE_ERROR) else 0
+            if len(buf) - pos < 4 + length:
+                break
+            frames.append(DecodedFrame(t_ns, direction, ptype, word, bytes(buf[pos + 4:pos + 4 + length])))
+            pos += 4 + length
+        del buf[:pos]
+        if len(buf) > MAX_FRAME:
+            # A valid-looking header with an absurd length: drop it rather than grow
+            self.discarded += len(buf) - 3
+            del buf[:-3]
+        return frames
+
+
+# =========== ========== ========== =================== PROTOCOL ANALYZER =================== ========== ==========
+def register_name(reg_id: int) -> str:
+    base = reg_id & REG_MASK
+    return f"{REGISTER_NAMES.get(base, f'0x{base:04X}')}/M{reg_id & MOTOR_MASK}"
+
+
+def decode_values(regs: List[int], payload: bytes) -> Optional[Dict[str, int]]:
+    """Decode a GET_DATA_ELEMENT response for the requested registers"""
+    decoder = register_struct(tuple(reg & REG_MASK for reg in regs))
+    if len(payload) < decoder.size:
+        return None
+    return {register_name(reg): value for reg, value in zip(regs, decoder.unpack_from(payload))}
+
+
+def describe_request(payload: bytes) -> Tuple[str, Optional[List[int]]]:
+    """Human-readable MCP request, plus the register list for GET requests"""
+    if len(payload) < 2:
+        return f"raw {hx(payload)}", None
+    header = int.from_bytes(payload[:2], 'little')
+    cmd, motor = header & 0xFFF8, header & MOTOR_MASK
+    name = MCP_COMMAND_NAMES.get(cmd)
+    if name is None:
+        return f"raw {hx(payload)}", None
+    if cmd == GET_DATA_ELEMENT:
+        count = (len(payload) - 2) // 2
+        regs = list(struct.unpack_from(f'<{count}H', payload, 2))
+        return f"{name} M{motor} [{', '.join(register_name(r) for r in regs)}]", regs
+    if cmd == SET_DATA_ELEMENT and len(payload) >= 4:
+        reg = int.from_bytes(payload[2:4], 'little')
+        if reg & TYPE_MASK == TYPE_DATA_RAW:
+            return f"{name} M{motor} {register_name(reg)} = raw {hx(payload[6:])}", None
+        size = reg_value_size(reg)
+        value = int.from_bytes(payload[4:4 + size], 'little', signed=(reg & REG_MASK) in SIGNED_REG_BASES)
+        return f"{name} M{motor} {register_name(reg)} = {value}", None
+    return f"{name} M{motor}", None
+
+
+class ProtocolAnalyzer:
+    """
+    Decodes both directions of a session into readable lines.
+    Requests are matched to responses in FIFO order to report turnaround latency
+    and to decode register values; only a bounded window of requests is kept.
+    """
+
+    def __init__(self, max_pending: int = 16) -> None:
+        self._decoders = {DIR_TX: StreamDecoder(), DIR_RX: StreamDecoder()}
+        self._pending: Deque[Tuple[int, Optional[List[int]]]] = deque(maxlen=max_pending)
+        self.counts: Dict[str, int] = {}
+        self.latency_count = 0
+        self.latency_sum_ms = 0.0
+        self.latency_max_ms = 0.0
+
+    @property
+    def discarded(self) -> int:
+        return sum(d.discarded for d in self._decoders.values())
+
+    def feed(self, t_ns: int, direction: int, data: bytes) -> List[str]:
+        lines = []
+        for frame in self._decoders[direction].feed(data, t_ns, direction):
+            lines.append(self._describe(frame))
+        return lines
+
+    def _describe(self, frame: DecodedFrame) -> str:
+        arrow = "TX" if frame.direction == DIR_TX else "RX"
+        tname = PACKET_TYPE_NAMES.get(frame.ptype, f"0x{frame.ptype:X}")
+        self.counts[f"{arrow} {tname}"] = self.counts.get(f"{arrow} {tname}", 0) + 1
+        text = f"{arrow} {tname}"
+
+        if frame.ptype == TYPE_PING:
+            text += f" #{(frame.header >> 12) & 0xFFFF}"
+        elif frame.direction == DIR_TX and frame.ptype == TYPE_DATA:
+            desc, regs = describe_request(frame.payload)
+            self._pending.append((frame.t_ns, regs))
+            text += f" {desc}"
+        elif frame.direction == DIR_RX and frame.ptype in (TYPE_DATA, TYPE_ACK, TYPE_NACK, TYPE_ERROR):
+            if self._pending:
+                t_req, regs = self._pending.popleft()
+                latency_ms = (frame.t_ns - t_req) / 1e6
+                self.latency_count += 1
+                self.latency_sum_ms += latency_ms
+                self.latency_max_ms = max(self.latency_max_ms, latency_ms)
+                values = decode_values(regs, frame.payload) if regs and frame.payload else None
+                text += f" {values if values is not None else hx(frame.payload)} ({latency_ms:.2f} ms)"
+            else:
+                text += f" {hx(frame.payload)}"
+        return text
+
+    def summary(self) -> Dict:
+        mean = self.latency_sum_ms / self.latency_count if self.latency_count else 0.0
+        return {
+            "frames": dict(sorted(self.counts.items())),
+            "discarded_bytes": self.discarded,
+            "responses": self.latency_count,
+            "latency_mean_ms": round(mean, 3),
+            "latency_max_ms": round(self.latency_max_ms, 3),
+        }
+
+
+# =========== ========== ========== =================== REPLAY =================== ========== ==========
+class ReplaySerial:
+    """
+    pyserial stand-in that plays the RX side of a capture back to ASPEPClient.
+
+    follow_tx=False: RX bytes become readable on the recorded timeline.
+    follow_tx=True:  each client write() releases the RX records that followed the
+                     next recorded TX, at their recorded offsets from that TX.
+    speed scales the recorded gaps (2.0 = twice as fast, 0 = no delays).
+    """
+
+    def __init__(self, path: str, follow_tx: bool = False, speed: float = 1.0, timeout: float = 0.04) -> None:
+        self.path = path
+        self.follow_tx = follow_tx
+        self.speed = speed
+        self.timeout = timeout
+        self.is_open = True
+        self._records = iter_capture(path)
+        self._peek: Optional[Frame] = next(self._records, None)
+        self._rx = bytearray()
+        self._anchor_wall = time.monotonic()
+        self._anchor_t = self._peek[0] if self._peek else 0
+        self.tx_mismatches = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self._peek is None and not self._rx
+
+    def _due(self, t_ns: int) -> float:
+        if self.speed <= 0:
+            return self._anchor_wall
+        return self._anchor_wall + (t_ns - self._anchor_t) / 1e9 / self.speed
+
+    def _advance(self) -> None:
+        self._peek = next(self._records, None)
+
+    def _pump(self) -> None:
+        """Release every RX record that is due"""
+        now = time.monotonic()
+        while self._peek is not None:
+            t_ns, direction, data = self._peek
+            if direction == DIR_TX:
+                if self.follow_tx:
+                    return  # Wait for the client to send it
+                self._advance()
+                continue
+            if self._due(t_ns) > now:
+                return
+            self._rx += data
+            self._advance()
+
+    @property
+    def in_waiting(self) -> int:
+        self._pump()
+        return len(self._rx)
+
+    def read(self, n: int = 1) -> bytes:
+        end = time.monotonic() + (self.timeout or 0)
+        while True:
+            self._pump()
+            if self._rx or self._peek is None or time.monotonic() >= end:
+                break
+            time.sleep(0.0005)
+        data = bytes(self._rx[:n])
+        del self._rx[:n]
+        return data
+
+    def write(self, data: bytes) -> int:
+        if self.follow_tx:
+            # Anything still scheduled before the next TX is released now
+            while self._peek is not None and self._peek[1] == DIR_RX:
+                self._rx += self._peek[2]
+                self._advance()
+            if self._peek is not None:
+                t_ns, _, recorded = self._peek
+                if bytes(data) != recorded:
+                    self.tx_mismatches += 1
+                self._anchor_wall, self._anchor_t = time.monotonic(), t_ns
+                self._advance()
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def reset_input_buffer(self) -> None:
+        self._rx.clear()
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+def replay_receive_path(path: str, speed: float = 1.0) -> Dict:
+    """Feed a capture's RX stream through ASPEPClient's packet reader and time it"""
+    client = ASPEPClient(port=path)
+    client.ser = ReplaySerial(path, follow_tx=False, speed=speed)
+    counts: Dict[str, int] = {}
+    start = time.monotonic()
+    max_gap = 0.0
+    last = start
+    # The client may already hold the tail of the capture in its own buffer
+    while not client.ser.exhausted or client._rx_available() >= 4:
+        pkt = client._read_packet(timeout=0.5)
+        now = time.monotonic()
+        if pkt is None:
+            if client.ser.exhausted:
+                break  # Only an incomplete packet is left
+            continue
+        max_gap = max(max_gap, now - last)
+        last = now
+        name = PACKET_TYPE_NAMES.get(pkt["type"], f"0x{pkt['type']:X}")
+        counts[name] = counts.get(name, 0) + 1
+    return {
+        "packets": counts,
+        "discarded_bytes": client.rx_discarded,
+        "elapsed_s": round(time.monotonic() - start, 4),
+        "max_gap_ms": round(max_gap * 1000, 3),
+    }
+
+
+# ========== ========== ==== ================ ==================== CLI ============ ========== ==========
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="ASPEP capture analyzer / replay")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_an = sub.add_parser("analyze", help="Decode a capture file")
+    p_an.add_argument("file")
+    p_an.add_argument("--quiet", action="store_true", help="Only print the summary")
+    p_re = sub.add_parser("replay", help="Replay a capture through the client's receive path")
+    p_re.add_argument("file")
+    p_re.add_argument("--speed", type=float, default=1.0, help="Timing scale (0 = as fast as possible)")
+    args = parser.parse_args()
+
+    if args.cmd == "analyze":
+        analyzer = ProtocolAnalyzer()
+        with open(args.file, 'rb') as f:
+            info = read_capture_info(f)
+        first_ns = None
+        for t_ns, direction, data in iter_capture(args.file):
+            first_ns = t_ns if first_ns is None else first_ns
+            for line in analyzer.feed(t_ns, direction, data):
+                if not args.quiet:
+                    print(f"{(t_ns - first_ns) / 1e6:10.3f} ms  {line}")
+        summary = analyzer.summary()
+        # The header pairs wall and monotonic clocks (at dump time for a flight recorder)
+        wall_first = info.wall_start + ((first_ns - info.mono_start_ns) / 1e9 if first_ns is not None else 0)
+        summary["recorded_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(wall_first))
+        print(json.dumps(summary, indent=2))
+    elif args.cmd == "replay":
+        print(json.dumps(replay_receive_path(args.file, args.speed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
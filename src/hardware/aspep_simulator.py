@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+ASPEP/MCP Performer Simulator - a fake STM32 motor controller on a pseudo-terminal
+
+Answers BEACON/PING handshakes, GET/SET_DATA_ELEMENT (including multi-register
+requests), START/STOP_MOTOR, STOP_RAMP, FAULT_ACK, the MC_REG_SPEED_RAMP RAW
+register and MCP datalog configuration, so ASPEPClient and MotorService can be
+exercised and measured without a board.
+
+Usage (from src/):
+    python -m hardware.aspep_simulator --latency-ms 2 --link /tmp/ttyCZ0
+    CONZERO_UART_PORT=/tmp/ttyCZ0 python main.py
+
+While running, type on stdin: ov / dp (inject over-voltage / driver protection
+fault), hold (toggle: injected faults stay active until release), release,
+noise (send garbage bytes), s (stats), q (quit).
+"""
+
+import math
+import os
+import random
+import select
+import struct
+import termios
+import threading
+import time
+import tty
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from hardware.aspep_capture import StreamDecoder
+from hardware.flight_recorder import DIR_TX
+from hardware.uart_manager import (
+    Capabilities, compute_header_crc, reg_value_size,
+    TYPE_BEACON, TYPE_PING, TYPE_DATA, TYPE_NACK,
+    GET_MCP_VERSION, SET_DATA_ELEMENT, GET_DATA_ELEMENT, START_MOTOR, STOP_MOTOR, STOP_RAMP, FAULT_ACK,
+    MOTOR_MASK, REG_MASK, TYPE_MASK, TYPE_DATA_STRING, TYPE_DATA_RAW,
+    MC_REG_FAULTS_BASE, MC_REG_SPEED_MEAS_BASE, MC_REG_SPEED_REF_BASE, MC_REG_STATUS_BASE,
+    MC_REG_BUS_VOLTAGE_BASE, MC_REG_HEATS_TEMP_BASE, MC_REG_SPEED_RAMP_BASE, MC_REG_ASYNC_UARTA_BASE,
+    MC_REG_UART_BAUD_BASE, FAULT_OVER_VOLT, FAULT_DP_FAULT, FAULT_NAMES,
+)
+
+# MCP status codes (last byte of every response)
+MCP_CMD_OK             = 0x00
+MCP_CMD_NOK            = 0x01
+MCP_CMD_UNKNOWN        = 0x02
+MCP_ERROR_RO_REG       = 0x04
+MCP_ERROR_UNKNOWN_REG  = 0x05
+MCP_ERROR_BAD_RAW_FORMAT = 0x0A
+
+# Motor states reported by MC_REG_STATUS
+STATE_IDLE       = 0
+STATE_RUN        = 6
+STATE_FAULT_NOW  = 10
+STATE_FAULT_OVER = 11
+
+READ_ONLY_REG_BASES = {
+    MC_REG_FAULTS_BASE, MC_REG_SPEED_MEAS_BASE, MC_REG_STATUS_BASE,
+    MC_REG_BUS_VOLTAGE_BASE, MC_REG_HEATS_TEMP_BASE,
+}
+
+BAUD_CONSTANTS = {getattr(termios, f"B{b}"): b for b in
+                  (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600) if hasattr(termios, f"B{b}")}
+
+
+@dataclass
+class SimulatorConfig:
+    """Behaviour of the simulated performer"""
+    latency_ms: float = 1.0          # Turnaround time from request to response
+    jitter_ms: float = 0.0           # Uniform extra latency 0..jitter_ms
+    corrupt_rate: float = 0.0        # Probability that a response has one byte flipped
+    drop_rate: float = 0.0           # Probability that a response is never sent
+    tau_s: float = 0.25              # First-order time constant of the speed response
+    regen_decel_limit: Optional[float] = None  # RPM/s; faster setpoint drops trip OVER_VOLT
+    emulate_line_rate: bool = True   # Delay responses by their transmission time at the port's baud
+    baud: int = 115200               # Rate after reset; bytes sent at any other rate arrive garbled
+    baud_register: bool = False      # Implement the firmware-defined MC_REG_UART_BAUD (stock firmware: no)
+    supported_bauds: Tuple[int, ...] = (115200, 230400, 460800, 921600)
+    baud_revert_s: float = 0.5       # Fall back to the old rate if nothing valid arrives after a switch
+    motors: int = 1
+    bus_voltage: int = 24
+    heatsink_temp: int = 32
+    name: str = "CONZERO-SIM"
+    mcp_version: int = 1
+    caps: Capabilities = field(default_factory=lambda: Capabilities(version=0, data_crc=0, rx_max=0x1C,
+                                                                    txs_max=3, txa_max=1))
+    seed: Optional[int] = None
+
+
+class MotorModel:
+    """One simulated drive: ramp generator + first-order speed response + fault latch"""
+
+    def __init__(self, cfg: SimulatorConfig) -> None:
+        self.cfg = cfg
+        self.running = False
+        self.faults = 0
+        self.fault_held = False     # Fault condition still present (FAULT_ACK cannot clear it)
+        self.speed_ref = 0
+        self.speed_meas = 0.0
+        self._setpoint = 0.0
+        self._ramp: Optional[Tuple[float, float, float, float]] = None  # (t0, from, to, duration)
+        self._last = time.monotonic()
+
+    def update(self, now: float) -> None:
+        dt = now - self._last
+        self._last = now
+        if self._ramp:
+            t0, start, target, duration = self._ramp
+            frac = 1.0 if duration <= 0 else min(1.0, (now - t0) / duration)
+            self._setpoint = start + (target - start) * frac
+            if frac >= 1.0:
+                self._ramp = None
+        command = self._setpoint if self.running and not self.faults else 0.0
+        if dt > 0:
+            self.speed_meas += (command - self.speed_meas) * (1.0 - math.exp(-dt / self.cfg.tau_s))
+
+    @property
+    def status(self) -> int:
+        if self.faults:
+            return STATE_FAULT_NOW if self.fault_held else STATE_FAULT_OVER
+        return STATE_RUN if self.running else STATE_IDLE
+
+    def start(self) -> bool:
+        if self.faults:
+            return False
+        self.running = True
+        return True
+
+    def stop(self) -> None:
+        self.running = False
+        self._ramp = None
+        self._setpoint = 0.0
+
+    def ramp_to(self, target: int, duration_ms: int, now: float) -> None:
+        self._check_regen(self._setpoint - target, duration_ms / 1000.0)
+        self.speed_ref = target
+        self._ramp = (now, self._setpoint, float(target), duration_ms / 1000.0)
+
+    def set_speed_ref(self, target: int) -> None:
+        self._check_regen(self._setpoint - target, 0.0)
+        self.speed_ref = target
+        self._ramp = None
+        self._setpoint = float(target)
+
+    def stop_ramp(self) -> None:
+        self._ramp = None
+
+    def _check_regen(self, drop_rpm: float, duration_s: float) -> None:
+        """Braking harder than the limit pumps the DC bus over voltage"""
+        limit = self.cfg.regen_decel_limit
+        if limit is None or not self.running or drop_rpm <= 0:
+            return
+        if duration_s <= 0 or drop_rpm / duration_s > limit:
+            self.inject_fault(FAULT_OVER_VOLT)
+
+    def inject_fault(self, bits: int, hold: bool = False) -> None:
+        self.faults |= bits
+        self.fault_held = self.fault_held or hold
+        self.running = False
+        self._ramp = None
+        self._setpoint = 0.0
+
+    def acknowledge(self) -> None:
+        if not self.fault_held:
+            self.faults = 0
+
+    def registers(self) -> Dict[int, int]:
+        return {
+            MC_REG_FAULTS_BASE: self.faults,
+            MC_REG_SPEED_MEAS_BASE: int(round(self.speed_meas)),
+            MC_REG_SPEED_REF_BASE: self.speed_ref,
+            MC_REG_STATUS_BASE: self.status,
+            MC_REG_BUS_VOLTAGE_BASE: self.cfg.bus_voltage,
+            MC_REG_HEATS_TEMP_BASE: self.cfg.heatsink_temp,
+        }
+
+
+def _header(ptype: int, length: int = 0) -> bytes:
+    l28 = (length << 4) | ptype
+    return ((compute_header_crc(l28) << 28) | l28).to_bytes(4, 'little')
+
+
+def _pack_value(reg_id: int, value: int) -> bytes:
+    size = reg_value_size(reg_id)
+    return (value & ((1 << (8 * size)) - 1)).to_bytes(size, 'little')
+
+
+class ASPEPSimulator:
+    """Performer side of an ASPEP link, served on the master end of a pty"""
+
+    def __init__(self, config: Optional[SimulatorConfig] = None, link: Optional[str] = None) -> None:
+        self.cfg = config or SimulatorConfig()
+        self.motors = {i: MotorModel(self.cfg) for i in range(1, self.cfg.motors + 1)}
+        self.link = link
+        self._rng = random.Random(self.cfg.seed)
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # No echo / line discipline until the client configures the port
+        self.port = os.ttyname(self._slave)
+        self._decoder = StreamDecoder()
+        self._outbox: Deque[Tuple[float, bytes, int]] = deque()  # (due, frame, baud) in send order
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._datalog: Optional[Tuple[int, int, int, List[int]]] = None  # (motor, divider, mark, regs)
+        self._next_log = 0.0
+        self._t0 = time.monotonic()
+        self.baud = self.cfg.baud
+        self._baud_switch: Optional[Tuple[int, float]] = None  # (previous rate, revert time)
+        self._pending_baud: Optional[int] = None  # Applied once the SET answer is queued
+        self.stats = {"requests": 0, "responses": 0, "dropped": 0, "corrupted": 0, "garbled": 0,
+                      "datalog_records": 0}
+
+    # ====== LIFECYCLE ======
+    def start(self) -> "ASPEPSimulator":
+        if self.link:
+            if os.path.islink(self.link):
+                os.unlink(self.link)
+            os.symlink(self.port, self.link)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ASPEPSimulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    # ====== FAULT / NOISE INJECTION ======
+    def inject_fault(self, bits: int, motor_index: int = 1, hold: bool = False) -> None:
+        with self._lock:
+            self.motors[motor_index].inject_fault(bits, hold)
+
+    def release_fault(self, motor_index: int = 1) -> None:
+        """Fault condition gone: the next FAULT_ACK clears it"""
+        with self._lock:
+            self.motors[motor_index].fault_held = False
+
+    def inject_noise(self, n: int = 16) -> None:
+        """Queue n random bytes on the line, forcing the client to resync"""
+        with self._lock:
+            self._outbox.append((time.monotonic(), bytes(self._rng.getrandbits(8) for _ in range(n)), self.baud))
+
+    # ====== MAIN LOOP ======
+    def _run(self) -> None:
+        while self._running:
+            now = time.monotonic()
+            timeout = 0.01
+            with self._lock:
+                if self._outbox:
+                    timeout = max(0.0, min(timeout, self._outbox[0][0] - now))
+                if self._datalog:
+                    timeout = max(0.0, min(timeout, self._next_log - now))
+            try:
+                readable, _, _ = select.select([self._master], [], [], timeout)
+                if readable:
+                    data = os.read(self._master, 4096)
+                    t_ns = time.monotonic_ns()
+                    with self._lock:
+                        if not self._rate_matches():
+                            self.stats["garbled"] += len(data)
+                            continue
+                        for frame in self._decoder.feed(data, t_ns, DIR_TX):
+                            self._baud_switch = None  # Valid frame at the new rate: switch confirmed
+                            self._handle(frame.ptype, frame.header, frame.payload)
+                with self._lock:
+                    self._flush(time.monotonic())
+            except OSError:
+                break  # pty closed
+
+    def _flush(self, now: float) -> None:
+        for motor in self.motors.values():
+            motor.update(now)
+        if self._baud_switch and now >= self._baud_switch[1]:
+            self.baud, self._baud_switch = self._baud_switch[0], None
+        while self._outbox and self._outbox[0][0] <= now:
+            _, frame, baud = self._outbox.popleft()
+            if not self._rate_matches(baud):
+                frame = bytes(self._rng.getrandbits(8) for _ in frame)
+            os.write(self._master, frame)
+        if self._datalog and now >= self._next_log:
+            self._emit_datalog(now)
+
+    def _client_baud(self) -> Optional[int]:
+        """Baud rate the client configured on its end of the pty"""
+        try:
+            return BAUD_CONSTANTS.get(termios.tcgetattr(self._slave)[5])
+        except termios.error:
+            return None
+
+    def _rate_matches(self, baud: Optional[int] = None) -> bool:
+        client = self._client_baud()
+        return client is None or client == (baud or self.baud)
+
+    def _line_time(self, nbytes: int) -> float:
+        """Seconds to shift nbytes out at the baud rate the client configured"""
+        if not self.cfg.emulate_line_rate:
+            return 0.0
+        baud = self._client_baud()
+        return nbytes * 10.0 / baud if baud else 0.0
+
+    def _queue(self, frame: bytes, turnaround: bool = True) -> None:
+        now = time.monotonic()
+        delay = 0.0
+        if turnaround:
+            delay = (self.cfg.latency_ms + self._rng.uniform(0, self.cfg.jitter_ms)) / 1000.0
+        due = max(now + delay, self._outbox[-1][0] if self._outbox else now) + self._line_time(len(frame))
+        if turnaround and self._rng.random() < self.cfg.drop_rate:
+            self.stats["dropped"] += 1
+            return
+        if turnaround and self._rng.random() < self.cfg.corrupt_rate:
+            buf = bytearray(frame)
+            buf[self._rng.randrange(len(buf))] ^= 1 << self._rng.randrange(8)
+            frame = bytes(buf)
+            self.stats["corrupted"] += 1
+        self._outbox.append((due, frame, self.baud))
+        self.stats["responses"] += 1
+
+    def _reply(self, payload: bytes) -> None:
+        self._queue(_header(TYPE_DATA, len(payload)) + payload)
+
+    # ====== PROTOCOL ======
+    def _handle(self, ptype: int, word: int, payload: bytes) -> None:
+        if ptype == TYPE_BEACON:
+            l28 = self.cfg.caps.build_lower28()
+            self._queue(((compute_header_crc(l28) << 28) | l28).to_bytes(4, 'little'))
+        elif ptype == TYPE_PING:
+            self._queue(word.to_bytes(4, 'little'))  # Echo packet number / IP id
+        elif ptype == TYPE_DATA:
+            self.stats["requests"] += 1
+            response = self._mcp(payload)
+            if response is None:
+                self._queue(_header(TYPE_NACK))
+            else:
+                self._reply(response)
+            if self._pending_baud:
+                # The answer goes out at the old rate; later traffic uses the new one
+                self._baud_switch = (self.baud, time.monotonic() + self.cfg.baud_revert_s)
+                self.baud, self._pending_baud = self._pending_baud, None
+
+    def _mcp(self, payload: bytes) -> Optional[bytes]:
+        """Execute one MCP command; returns the response payload, or None to NACK it"""
+        if len(payload) < 2:
+            return None
+        header = int.from_bytes(payload[:2], 'little')
+        cmd, motor_bits = header & 0xFFF8, header & MOTOR_MASK
+        now = time.monotonic()
+
+        if cmd == GET_DATA_ELEMENT:
+            if len(payload) < 4 or len(payload) % 2:
+                return None
+            out = bytearray()
+            for (reg,) in struct.iter_unpack('<H', payload[2:]):
+                value = self._get(reg)
+                if value is None:
+                    return bytes([MCP_ERROR_UNKNOWN_REG])
+                out += value
+            return bytes(out) + bytes([MCP_CMD_OK])
+
+        if cmd == SET_DATA_ELEMENT:
+            return bytes([self._set_all(payload[2:], now)])
+
+        motor = self.motors.get(motor_bits or 1)
+        if motor is None:
+            return bytes([MCP_CMD_NOK])
+        if cmd == START_MOTOR:
+            return bytes([MCP_CMD_OK if motor.start() else MCP_CMD_NOK])
+        if cmd == STOP_MOTOR:
+            motor.stop()
+            return bytes([MCP_CMD_OK])
+        if cmd == STOP_RAMP:
+            motor.stop_ramp()
+            return bytes([MCP_CMD_OK])
+        if cmd == FAULT_ACK:
+            motor.acknowledge()
+            return bytes([MCP_CMD_OK])
+        if cmd == GET_MCP_VERSION:
+            return struct.pack('<I', self.cfg.mcp_version) + bytes([MCP_CMD_OK])
+        return None  # Unknown command: refuse so layout probing moves on
+
+    def _get(self, reg: int) -> Optional[bytes]:
+        motor = self.motors.get(reg & MOTOR_MASK)
+        if reg & TYPE_MASK == TYPE_DATA_STRING:
+            return self.cfg.name.encode() + b'\x00'
+        if motor is None:
+            return None
+        value = motor.registers().get(reg & REG_MASK)
+        return None if value is None else _pack_value(reg, value)
+
+    def _set_all(self, body: bytes, now: float) -> int:
+        """Apply every (register, value) pair of a SET_DATA_ELEMENT request"""
+        pos = 0
+        while pos < len(body):
+            if pos + 2 > len(body):
+                return MCP_ERROR_BAD_RAW_FORMAT
+            reg = int.from_bytes(body[pos:pos + 2], 'little')
+            pos += 2
+            if reg & TYPE_MASK == TYPE_DATA_RAW:
+                if pos + 2 > len(body):
+                    return MCP_ERROR_BAD_RAW_FORMAT
+                size = int.from_bytes(body[pos:pos + 2], 'little')
+                data = body[pos + 2:pos + 2 + size]
+                pos += 2 + size
+                if len(data) != size:
+                    return MCP_ERROR_BAD_RAW_FORMAT
+            else:
+                size = reg_value_size(reg)
+                data = body[pos:pos + size]
+                pos += size
+                if len(data) != size:
+                    return MCP_ERROR_BAD_RAW_FORMAT
+            status = self._set(reg, data, now)
+            if status != MCP_CMD_OK:
+                return status
+        return MCP_CMD_OK
+
+    def _set(self, reg: int, data: bytes, now: float) -> int:
+        base = reg & REG_MASK
+        if base == MC_REG_UART_BAUD_BASE and self.cfg.baud_register:
+            rate = int.from_bytes(data, 'little')
+            if rate not in self.cfg.supported_bauds:
+                return MCP_CMD_NOK
+            self._pending_baud = rate
+            return MCP_CMD_OK
+        motor = self.motors.get(reg & MOTOR_MASK)
+        if motor is None:
+            return MCP_ERROR_UNKNOWN_REG
+        if base in READ_ONLY_REG_BASES:
+            return MCP_ERROR_RO_REG
+        if base == MC_REG_SPEED_REF_BASE:
+            motor.set_speed_ref(int.from_bytes(data, 'little', signed=True))
+        elif base == MC_REG_SPEED_RAMP_BASE:
+            if len(data) < 6:
+                return MCP_ERROR_BAD_RAW_FORMAT
+            target, duration_ms = struct.unpack_from('<iH', data)
+            motor.ramp_to(target, duration_ms, now)
+        elif base == MC_REG_ASYNC_UARTA_BASE:
+            return self._configure_datalog(reg & MOTOR_MASK, data, now)
+        else:
+            return MCP_ERROR_UNKNOWN_REG
+        return MCP_CMD_OK
+
+    # ====== DATALOG ======
+    def _configure_datalog(self, motor_index: int, data: bytes, now: float) -> int:
+        if len(data) < 7:
+            return MCP_ERROR_BAD_RAW_FORMAT
+        record_size, _, _, mf_rate, count, mark = struct.unpack_from('<HBBBBB', data)
+        if record_size == 0 or count == 0:
+            self._datalog = None
+            return MCP_CMD_OK
+        regs = list(struct.unpack_from(f'<{count}H', data, 7))
+        if 4 + sum(reg_value_size(r) for r in regs) + 1 != record_size:
+            return MCP_ERROR_BAD_RAW_FORMAT
+        self._datalog = (motor_index, mf_rate + 1, mark, regs)
+        self._next_log = now
+        return MCP_CMD_OK
+
+    def _emit_datalog(self, now: float) -> None:
+        _, divider, mark, regs = self._datalog
+        ticks = int((now - self._t0) * 1000)
+        record = struct.pack('<I', ticks)
+        for reg in regs:
+            motor = self.motors.get(reg & MOTOR_MASK)
+            value = motor.registers().get(reg & REG_MASK, 0) if motor else 0
+            record += _pack_value(reg, value)
+        record += bytes([mark])
+        self._queue(_header(TYPE_DATA, len(record)) + record, turnaround=False)
+        self.stats["datalog_records"] += 1
+        self._next_log = max(self._next_log + divider / 1000.0, now - 0.1)
+
+
+# ========== ========== ==== ================ ==================== CLI ============ ========== ==========
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ASPEP/MCP performer simulator on a pseudo-terminal")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Request turnaround latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform extra latency")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="Probability of corrupting a response byte")
+    parser.add_argument("--drop", type=float, default=0.0, help="Probability of dropping a response")
+    parser.add_argument("--tau", type=float, default=0.25, help="Speed response time constant (s)")
+    parser.add_argument("--regen-limit", type=float, default=None,
+                        help="Deceleration (RPM/s) above which OVER_VOLT trips")
+    parser.add_argument("--motors", type=int, default=1)
+    parser.add_argument("--baud-register", action="store_true",
+                        help="Implement the firmware-defined UART baud register")
+    parser.add_argument("--link", default=None, help="Create a symlink to the pty (e.g. ./ttyS0)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    cfg = SimulatorConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, corrupt_rate=args.corrupt,
+                          drop_rate=args.drop, tau_s=args.tau, regen_decel_limit=args.regen_limit,
+                          motors=args.motors, baud_register=args.baud_register, seed=args.seed)
+    with ASPEPSimulator(cfg, link=args.link) as sim:
+        print(f"Simulated performer on {sim.port}" + (f" (linked at {args.link})" if args.link else ""))
+        print("Commands: ov, dp, hold, release, noise, s (stats), q")
+        hold = False
+        try:
+            while True:
+                cmd = input("sim> ").strip().lower()
+                if cmd == "ov":
+                    sim.inject_fault(FAULT_OVER_VOLT, hold=hold)
+                elif cmd == "dp":
+                    sim.inject_fault(FAULT_DP_FAULT, hold=hold)
+                elif cmd == "hold":
+                    hold = not hold
+                    print(f"  Injected faults {'stay active until release' if hold else 'clear on FAULT_ACK'}")
+                elif cmd == "release":
+                    sim.release_fault()
+                elif cmd == "noise":
+                    sim.inject_noise()
+                elif cmd == "s":
+                    motor = sim.motors[1]
+                    active = [n for b, n in FAULT_NAMES.items() if motor.faults & b]
+                    print(f"  {sim.stats} speed={motor.speed_meas:.0f}/{motor.speed_ref} RPM faults={active}")
+                elif cmd == "q":
+                    break
+        except (KeyboardInterrupt, EOFError):
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+ASPEP Flight Recorder
+In-memory ring buffer of raw TX/RX frames with monotonic timestamps.
+
+Recording a frame is a single deque append - nothing is formatted or written
+until dump() is called (on demand, or automatically when a fault appears).
+
+Dump file format (little-endian):
+    file header: magic b"CZFR" | version u8 | reserved u8 | wall-clock start f64 | monotonic start ns u64
+    record:      monotonic ns u64 | direction u8 (0=TX, 1=RX) | length u16 | frame bytes
+"""
+
+import os
+import struct
+import time
+from collections import deque
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+
+DIR_TX = 0
+DIR_RX = 1
+
+FILE_MAGIC = b"CZFR"
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct('<4sBBdQ')
+RECORD_HEADER = struct.Struct('<QBH')
+
+Frame = Tuple[int, int, bytes]  # (monotonic ns, direction, raw frame)
+
+
+def write_header(f: BinaryIO, wall_start: float, mono_start_ns: int) -> None:
+    """Write the file header that anchors monotonic timestamps to wall-clock time"""
+    f.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, 0, wall_start, mono_start_ns))
+
+
+def write_frames(f: BinaryIO, frames: Iterable[Frame]) -> int:
+    """Append frame records; returns the number written"""
+    count = 0
+    for t_ns, direction, data in frames:
+        f.write(RECORD_HEADER.pack(t_ns, direction, len(data)))
+        f.write(data)
+        count += 1
+    return count
+
+
+class FlightRecorder:
+    """Keeps the last `capacity` ASPEP frames for post-mortem dumps"""
+
+    def __init__(self, capacity: int = 4096, dump_dir: Optional[str] = None) -> None:
+        self._frames: deque = deque(maxlen=capacity)
+        self.dump_dir = dump_dir
+
+    def tx(self, data: bytes) -> None:
+        self._frames.append((time.monotonic_ns(), DIR_TX, bytes(data)))
+
+    def rx(self, data: bytes) -> None:
+        self._frames.append((time.monotonic_ns(), DIR_RX, bytes(data)))
+
+    def snapshot(self) -> List[Frame]:
+        """Copy of the buffered frames, oldest first"""
+        return list(self._frames)
+
+    def clear(self) -> None:
+        self._frames.clear()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def dump(self, path: Optional[str] = None, reason: str = "manual") -> Optional[str]:
+        """Write the buffered frames to a binary capture file; returns its path"""
+        frames = self.snapshot()
+        if path is None:
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(self.dump_dir or ".", f"aspep_{stamp}_{reason}.czfr")
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Anchor: the wall-clock time that corresponds to "now" on the monotonic clock
+            mono_now = time.monotonic_ns()
+            wall_now = time.time()
+            with open(path, 'wb') as f:
+                write_header(f, wall_now, mono_now)
+                write_frames(f, frames)
+        except OSError as e:
+            print(f"[FlightRecorder] dump failed: {e}")
+            return None
+        return path
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+UART Benchmark - command latency and throughput of the ASPEP stack
+
+Measures, per baud rate: handshake time, p50/p95/p99 latency of each command
+type (ASPEPClient calls and MotorService round trips through the UART worker),
+sustained telemetry polls per second, and recovery time after a forced RX
+resync. Results are JSON so releases can be compared.
+
+Usage (from src/):
+    python -m hardware.uart_benchmark --sim                       # in-process pty simulator
+    python -m hardware.uart_benchmark --port /dev/ttyS0 --output bench.json
+    python -m hardware.uart_benchmark --sim --bauds 115200,460800,921600
+"""
+
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from hardware.uart_manager import ASPEPClient, MC_REG_SPEED_MEAS_BASE, log as aspep_log
+
+# Garbage prepended to the RX stream to force a resync (no valid header CRC at any offset)
+RESYNC_GARBAGE = b'\xAA' * 32
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies_ms: List[float], failures: int = 0) -> Dict:
+    values = sorted(latencies_ms)
+    return {
+        "n": len(values),
+        "failures": failures,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "max_ms": round(values[-1], 3) if values else 0.0,
+    }
+
+
+def time_calls(fn: Callable[[int], object], iterations: int) -> Dict:
+    """Call fn(i) repeatedly; a falsy/None result counts as a failure"""
+    latencies: List[float] = []
+    failures = 0
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        result = fn(i)
+        elapsed = (time.perf_counter() - t0) * 1000
+        if result is None or result is False:
+            failures += 1
+        else:
+            latencies.append(elapsed)
+    return summarize(latencies, failures)
+
+
+class UARTBenchmark:
+    """Runs the benchmark suite against one serial port"""
+
+    def __init__(self, port: str, iterations: int = 200, duration: float = 3.0, motor_index: int = 1) -> None:
+        self.port = port
+        self.iterations = iterations
+        self.duration = duration
+        self.motor = motor_index
+
+    def _client(self, baud: int) -> ASPEPClient:
+        # No config_path: layouts learned during a benchmark must not leak into motor_config.json
+        client = ASPEPClient(self.port, baud)
+        client.open()
+        return client
+
+    def measure_handshake(self, baud: int, repeats: int = 5) -> Dict:
+        latencies: List[float] = []
+        failures = 0
+        for _ in range(repeats):
+            client = self._client(baud)
+            try:
+                t0 = time.perf_counter()
+                ok = client.handshake()
+                elapsed = (time.perf_counter() - t0) * 1000
+            finally:
+                client.close()
+            if ok:
+                latencies.append(elapsed)
+            else:
+                failures += 1
+        return summarize(latencies, failures)
+
+    def measure_commands(self, client: ASPEPClient) -> Dict[str, Dict]:
+        m = self.iterations
+        motor = self.motor
+        results = {
+            "ping": time_calls(lambda i: client.ping(), m),
+            "read_faults": time_calls(lambda i: client.read_faults(motor), m),
+            "read_speed": time_calls(lambda i: client.read_registers([MC_REG_SPEED_MEAS_BASE], motor), m),
+            "read_telemetry": time_calls(lambda i: client.read_telemetry(motor), m),
+        }
+        client.start_motor(motor)
+        # Alternate targets so every call really ramps
+        results["set_speed_percentage"] = time_calls(
+            lambda i: client.set_speed_percentage(40 if i % 2 else 60, motor), max(1, m // 4))
+        results["stop_motor"] = time_calls(lambda i: client.stop_motor(motor), max(1, m // 10))
+        results["start_motor"] = time_calls(lambda i: client.start_motor(motor), max(1, m // 10))
+        client.stop_motor(motor)
+        return results
+
+    def measure_throughput(self, client: ASPEPClient) -> Dict:
+        """Back-to-back read_telemetry for `duration` seconds"""
+        ok = failed = 0
+        end = time.perf_counter() + self.duration
+        start = time.perf_counter()
+        while time.perf_counter() < end:
+            if client.read_telemetry(self.motor) is None:
+                failed += 1
+            else:
+                ok += 1
+        elapsed = time.perf_counter() - start
+        return {"polls_per_s": round(ok / elapsed, 1), "ok": ok, "failures": failed,
+                "duration_s": round(elapsed, 3)}
+
+    def measure_resync(self, client: ASPEPClient, repeats: int = 10) -> Dict:
+        """Inject garbage ahead of the next response; time until a read succeeds again"""
+        latencies: List[float] = []
+        failures = 0
+        discarded = client.rx_discarded
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            client._rx += RESYNC_GARBAGE
+            deadline = t0 + 2.0
+            while time.perf_counter() < deadline:
+                if client.read_telemetry(self.motor) is not None:
+                    latencies.append((time.perf_counter() - t0) * 1000)
+                    break
+            else:
+                failures += 1
+        result = summarize(latencies, failures)
+        result["garbage_bytes"] = len(RESYNC_GARBAGE) * repeats
+        result["discarded_bytes"] = client.rx_discarded - discarded
+        return result
+
+    def measure_service(self, baud: int) -> Dict[str, Dict]:
+        """Round trips through MotorService (UART worker queue + Future)"""
+        from services.motor_service import MotorService
+
+        # Scratch config and log dir: like _client, nothing may leak into motor_config.json or logs/
+        scratch = tempfile.TemporaryDirectory(prefix="uart_benchmark_")
+        service = MotorService(port=self.port, baud=baud,
+                               config_path=os.path.join(scratch.name, "motor_config.json"),
+                               log_dir=scratch.name)
+        try:
+            if not service.initialize().result(timeout=5):
+                return {}
+            m = self.iterations
+            motor = self.motor
+            return {
+                "service.read_faults": time_calls(lambda i: service.read_faults(motor).result(timeout=5), m),
+                "service.read_telemetry": time_calls(lambda i: service.read_telemetry(motor).result(timeout=5), m),
+            }
+        finally:
+            service.close()
+            scratch.cleanup()
+
+    def run(self, baud: int, service: bool = True) -> Dict:
+        result: Dict = {"baud": baud, "handshake": self.measure_handshake(baud)}
+        client = self._client(baud)
+        try:
+            if not client.handshake():
+                result["error"] = "handshake failed"
+                return result
+            result["commands"] = self.measure_commands(client)
+            result["throughput"] = self.measure_throughput(client)
+            result["resync"] = self.measure_resync(client)
+            result["rx_discarded"] = client.rx_discarded
+        finally:
+            client.close()
+        if service:
+            result["commands"].update(self.measure_service(baud))
+        return result
+
+
+# ========== ========== ==== ================ ==================== CLI ============ ========== ==========
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ASPEP UART latency/throughput benchmark")
+    parser.add_argument("--port", default=os.environ.get("CONZERO_UART_PORT", "/dev/ttyS0"))
+    parser.add_argument("--sim", action="store_true", help="Benchmark against the pty simulator")
+    parser.add_argument("--sim-latency-ms", type=float, default=1.0, help="Simulator turnaround latency")
+    parser.add_argument("--bauds", default="115200", help="Comma-separated baud rates to sweep")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per command type")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds of sustained polling")
+    parser.add_argument("--motor", type=int, default=1)
+    parser.add_argument("--no-service", action="store_true", help="Skip the MotorService measurements")
+    parser.add_argument("--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    aspep_log.setLevel(logging.WARNING)  # Per-command INFO logging would dominate the timings
+
+    port = args.port
+    bench = UARTBenchmark(port, args.iterations, args.duration, args.motor)
+    report: Dict = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "port": "simulator" if args.sim else port,
+            "sim_latency_ms": args.sim_latency_ms if args.sim else None,
+            "iterations": args.iterations,
+        },
+        "runs": [],
+    }
+    for baud in (int(b) for b in args.bauds.split(",") if b.strip()):
+        sim = None
+        if args.sim:
+            # The simulator garbles every rate but its own: start one fixed at each swept rate
+            from hardware.aspep_simulator import ASPEPSimulator, SimulatorConfig
+            sim = ASPEPSimulator(SimulatorConfig(latency_ms=args.sim_latency_ms, seed=0, baud=baud)).start()
+            bench.port = sim.port
+        print(f"Benchmarking {'simulator' if sim else port} @ {baud} baud...", flush=True)
+        try:
+            report["runs"].append(bench.run(baud, service=not args.no_service))
+        finally:
+            if sim:
+                sim.stop()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+        print(f"Results written to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,11 +16,20 @@ Features:
 """
 
 import serial
+import sys
+import select
 import time
+import json
+import os
 import logging
 import struct
+import threading
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Optional
+from functools import lru_cache, wraps
+from hardware.flight_recorder import FlightRecorder
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 # =========== ========== ========== =================== LOGGING ===== ========== ========== ========================= ========== ==========
 logging.basicConfig(
@@ -82,17 +91,66 @@ TYPE_DATA_STRING    = (4 << TYPE_POS)  # 0x20
 TYPE_DATA_RAW       = (5 << TYPE_POS)  # 0x28
 
 # =========== ========== ========== =================== REGISTER ADDRESSES ============= ========== ========== ========== =================
+_VALUE_FORMATS = {TYPE_DATA_8BIT: 'B', TYPE_DATA_16BIT: 'H', TYPE_DATA_32BIT: 'I'}
+
+@dataclass(frozen=True)
+class RegisterDef:
+    """One scalar MCP register: name, element id, type bits, signedness and engineering scale"""
+    name: str
+    element: int
+    type_bits: int
+    signed: bool = False
+    scale: float = 1.0      # Engineering units per raw count
+    unit: str = ""
+    per_motor: bool = True  # False: global register, motor bits stay 0
+
+    @property
+    def base(self) -> int:
+        return (self.element << ELT_IDENTIFIER_POS) | self.type_bits
+
+    @property
+    def struct_code(self) -> str:
+        code = _VALUE_FORMATS[self.type_bits]
+        return code.lower() if self.signed else code
+
+    def reg_id(self, motor_index: int = 1) -> int:
+        return self.base | (motor_index & MOTOR_MASK if self.per_motor else 0)
+
+    def to_units(self, raw: int) -> float:
+        return raw * self.scale
+
+# Scalar register map - a new telemetry value is one row here
+REGISTER_TABLE = (
+    RegisterDef("faults",        0,  TYPE_DATA_32BIT),                                # 0x0018
+    RegisterDef("status",        1,  TYPE_DATA_8BIT),                                 # 0x0048
+    RegisterDef("speed_meas",    1,  TYPE_DATA_32BIT, signed=True, unit="rpm"),       # 0x0058
+    RegisterDef("speed_ref",     2,  TYPE_DATA_32BIT, signed=True, unit="rpm"),       # 0x0098
+    RegisterDef("bus_voltage",   22, TYPE_DATA_16BIT, unit="raw"),                    # 0x0590
+    RegisterDef("heatsink_temp", 23, TYPE_DATA_16BIT, signed=True, unit="C"),         # 0x05D0
+    RegisterDef("uart_baud",     63, TYPE_DATA_32BIT, unit="baud", per_motor=False),  # 0x0FD8 (see below)
+)
+REGISTERS: Dict[str, RegisterDef] = {r.name: r for r in REGISTER_TABLE}
+REGISTERS_BY_BASE: Dict[int, RegisterDef] = {r.base: r for r in REGISTER_TABLE}
+
 # Base addresses (without motor ID encoded)
-MC_REG_SPEED_MEAS_BASE  = ((1 << ELT_IDENTIFIER_POS) | TYPE_DATA_32BIT)  # 0x0058
-MC_REG_SPEED_REF_BASE   = ((2 << ELT_IDENTIFIER_POS) | TYPE_DATA_32BIT)  # 0x0098
-MC_REG_STATUS_BASE      = ((1 << ELT_IDENTIFIER_POS) | TYPE_DATA_8BIT)   # 0x0048
-MC_REG_FAULTS_BASE      = ((0 << ELT_IDENTIFIER_POS) | TYPE_DATA_32BIT)  # 0x0018
-MC_REG_BUS_VOLTAGE_BASE = ((22 << ELT_IDENTIFIER_POS) | TYPE_DATA_16BIT) # 0x0590
-MC_REG_HEATS_TEMP_BASE  = ((23 << ELT_IDENTIFIER_POS) | TYPE_DATA_16BIT) # 0x05D0
+MC_REG_SPEED_MEAS_BASE  = REGISTERS["speed_meas"].base     # 0x0058
+MC_REG_SPEED_REF_BASE   = REGISTERS["speed_ref"].base      # 0x0098
+MC_REG_STATUS_BASE      = REGISTERS["status"].base         # 0x0048
+MC_REG_FAULTS_BASE      = REGISTERS["faults"].base         # 0x0018
+MC_REG_BUS_VOLTAGE_BASE = REGISTERS["bus_voltage"].base    # 0x0590
+MC_REG_HEATS_TEMP_BASE  = REGISTERS["heatsink_temp"].base  # 0x05D0
 
 # SPEED RAMP REGISTER - CRITICAL FOR PREVENTING OVER-VOLTAGE FAULTS
 MC_REG_SPEED_RAMP_BASE  = ((6 << ELT_IDENTIFIER_POS) | TYPE_DATA_RAW)    # 0x0604
 
+# MCP ASYNC (datalog) configuration register for the UART A channel
+MC_REG_ASYNC_UARTA_BASE = ((20 << ELT_IDENTIFIER_POS) | TYPE_DATA_RAW)   # 0x0528
+
+# UART baud rate (uint32, motor bits 0) - firmware-defined, not part of the stock MC SDK register map.
+# Writing it answers at the current rate, then switches; the performer falls back to its default rate
+# if no valid frame arrives at the new one shortly after the switch.
+MC_REG_UART_BAUD_BASE   = REGISTERS["uart_baud"].base      # 0x0FD8
+
 # For Motor 1 (with motor_id = 0x01 encoded)
 MC_REG_SPEED_MEAS   = 0x0059  # MC_REG_SPEED_MEAS_BASE | 0x01
 MC_REG_SPEED_REF    = 0x0099  # MC_REG_SPEED_REF_BASE | 0x01
@@ -167,10 +225,29 @@ def check_header_crc(word32: int) -> bool:
     crc = CRC4_Lookup8[crc ^ ((word32 >> 24) & 0xFF)]
     return crc == 0
 
+_HDR = struct.Struct('<I')  # 32-bit little-endian ASPEP header word
+
 def hx(b: bytes) -> str:
     """Format bytes as hex string"""
     return ' '.join(f"{x:02X}" for x in b) if b else ""
 
+@lru_cache(maxsize=None)
+def data_header_word(length: int) -> int:
+    """DATA header word (CRC included) for a payload length - memoized, lengths come from a tiny set"""
+    if length > 0x1FFF: raise ValueError("Payload too long")
+    l28 = (length << 4) | TYPE_DATA
+    return (compute_header_crc(l28) << 28) | l28
+
+class LazyHex:
+    """Defers hx() formatting until a log record is actually emitted"""
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+    def __str__(self) -> str:
+        return hx(self.data)
+
 def reg_value_size(reg_id: int) -> int:
     """Get register value size from type bits"""
     t = reg_id & TYPE_MASK
@@ -207,13 +284,393 @@ class Capabilities:
             txa_max = (l28 >>21) & 0x7F
         )
 
+# ======== ========== ========== ========== ====================== REGISTER DECODERS ========= ========== ========== =====================
+# Registers decoded as signed integers (everything else is unsigned)
+SIGNED_REG_BASES = frozenset(r.base for r in REGISTER_TABLE if r.signed)
+
+@lru_cache(maxsize=64)
+def register_struct(bases: Tuple[int, ...]) -> struct.Struct:
+    """
+    Compiled decoder for the values of a register set, in request order.
+    Registers missing from REGISTER_TABLE decode unsigned by their type bits.
+    """
+    codes = []
+    for base in bases:
+        reg = REGISTERS_BY_BASE.get(base & REG_MASK)
+        if reg is not None:
+            codes.append(reg.struct_code)
+        else:
+            codes.append(_VALUE_FORMATS.get(base & TYPE_MASK, 'H'))
+    return struct.Struct('<' + ''.join(codes))
+
+# ======== ========== ========== ========== ====================== TELEMETRY SNAPSHOT ========= ========== ========== =====================
+# Register set fetched by read_telemetry(), in response order (= TelemetrySnapshot field order)
+TELEMETRY_REGISTERS = ("faults", "speed_meas", "speed_ref", "status", "bus_voltage", "heatsink_temp")
+TELEMETRY_REG_BASES = tuple(REGISTERS[name].base for name in TELEMETRY_REGISTERS)
+TELEMETRY_STRUCT = register_struct(TELEMETRY_REG_BASES)
+
+# MC_REG_STATUS values (mc_type.h State_t)
+MOTOR_STATE_NAMES = {
+    0: "IDLE", 1: "IDLE_ALIGNMENT", 2: "ALIGNMENT", 3: "IDLE_START", 4: "START", 5: "START_RUN",
+    6: "RUN", 7: "ANY_STOP", 8: "STOP", 9: "STOP_IDLE", 10: "FAULT_NOW", 11: "FAULT_OVER",
+}
+
+@dataclass
+class TelemetrySnapshot:
+    """One GET_DATA_ELEMENT transaction worth of motor telemetry"""
+    timestamp: float
+    faults: int
+    speed_meas: int
+    speed_ref: int
+    status: int
+    bus_voltage: int
+    heatsink_temp: int
+
+# ======== ========== ========== ========== ====================== ASYNC DATALOG ========= ========== ========== =====================
+MCPA_MF_TASK_HZ = 1000   # Medium-frequency (speed loop) task rate the datalog divider applies to
+DATALOG_MARK    = 0xA5   # Trailer byte of every datalog record (never the MCP_CMD_OK status 0x00)
+
+class DatalogSubscription:
+    """
+    Decoder + ring buffer for one MCP datalog stream.
+    Each ASYNC record is: ticks (uint32) + register values + mark byte.
+    """
+
+    def __init__(self, registers: List[int], rate_hz: float,
+                 on_sample: Optional[Callable[[float, int, Dict[int, int]], None]] = None,
+                 buffer_len: int = 1024, mark: int = DATALOG_MARK) -> None:
+        self.registers = [r & REG_MASK for r in registers]
+        self.divider = max(1, round(MCPA_MF_TASK_HZ / rate_hz))
+        self.rate_hz = MCPA_MF_TASK_HZ / self.divider
+        self.on_sample = on_sample
+        self.mark = mark
+        self._values = register_struct(tuple(self.registers))
+        self.record_size = 4 + self._values.size + 1
+        self.samples: deque = deque(maxlen=buffer_len)  # (host_time, ticks, {reg: value})
+        self.received = 0
+
+    def config_payload(self, motor_index: int) -> bytes:
+        """MCPA log configuration: bufferSize, HF rate/num, MF rate/num, mark, register IDs"""
+        motor = motor_index & MOTOR_MASK
+        return (struct.pack('<HBBBBB', self.record_size, 0, 0, self.divider - 1, len(self.registers), self.mark)
+                + struct.pack(f'<{len(self.registers)}H', *(r | motor for r in self.registers)))
+
+    def matches(self, payload: bytes) -> bool:
+        return len(payload) == self.record_size and payload[-1] == self.mark
+
+    def feed(self, payload: bytes) -> None:
+        """Decode one ASYNC record into the ring buffer and callback"""
+        ticks = int.from_bytes(payload[:4], 'little')
+        values = dict(zip(self.registers, self._values.unpack_from(payload, 4)))
+        sample: Tuple[float, int, Dict[int, int]] = (time.time(), ticks, values)
+        self.samples.append(sample)
+        self.received += 1
+        if self.on_sample:
+            try:
+                self.on_sample(*sample)
+            except Exception as e:
+                log.error(f"ERROR: datalog callback: {e}")
+
+# ======== ========== ========== ========== ====================== PIPELINED REQUESTS ========= ========== ========== =====================
+@dataclass
+class PipelinedCommand:
+    """One DATA request for send_pipelined()"""
+    payload: bytes
+    label: str
+    expect_data: bool = False
+    allow_ack_only: bool = True
+    data_timeout: float = 1.0
+
+@dataclass
+class PipelineResult:
+    """Outcome of one pipelined request"""
+    label: str
+    ok: bool
+    payload: bytes = b''
+    latency_ms: float = 0.0
+    nack: bool = False
+
+# ======== ========== ========== ========== ====================== LINK SUPERVISOR ========= ========== ========== =====================
+class LinkSupervisor:
+    """Keepalive and reconnect policy for one ASPEP session"""
+
+    def __init__(self, ping_interval: float = 0.25, max_failures: int = 2,
+                 backoff_min: float = 0.05, backoff_max: float = 0.5) -> None:
+        self.ping_interval = ping_interval
+        self.max_failures = max_failures
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.failures = 0
+        self.last_ok = 0.0
+        self.next_retry = 0.0
+        self._backoff = backoff_min
+
+    def record_ok(self) -> None:
+        """Any valid answer from the performer proves the link is alive"""
+        self.failures = 0
+        self.last_ok = time.monotonic()
+        self._backoff = self.backoff_min
+
+    def record_failure(self) -> bool:
+        """Count a missed answer; True once the session should be marked down"""
+        self.failures += 1
+        return self.failures >= self.max_failures
+
+    def ping_due(self) -> bool:
+        return time.monotonic() - self.last_ok >= self.ping_interval
+
+    def retry_due(self) -> bool:
+        return time.monotonic() >= self.next_retry
+
+    def schedule_retry(self) -> None:
+        """Back off exponentially between reconnect attempts"""
+        self.next_retry = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, self.backoff_max)
+
+# ======== ========== ========== ========== ====================== ADAPTIVE TIMEOUTS ========= ========== ========== =====================
+# Defaults for the "timeouts" block of motor_config.json (seconds)
+DEFAULT_TIMEOUTS = {
+    "handshake": 0.6,   # Each handshake read
+    "data_read": 1.5,   # Wait for a late DATA after an empty ACK
+    "command": 0.8,     # Ceiling of the adaptive first-response timeout
+    "floor": 0.05,      # Floor of the adaptive first-response timeout
+    "operation": 2.0,   # Total budget of one public operation incl. retries and fallbacks
+    "estop": 3.0,       # Emergency stop: STOP_MOTOR + measured speed down to zero
+}
+
+class RTTEstimator:
+    """Smoothed round-trip time and retransmission-style timeout (RFC 6298)"""
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, floor: float, ceiling: float) -> None:
+        self.floor = floor
+        self.ceiling = ceiling
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self._backoff = 1
+
+    def sample(self, rtt: float) -> None:
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self._backoff = 1
+
+    def backoff(self) -> None:
+        """A response timed out: double the timeout until the next good sample"""
+        self._backoff = min(self._backoff * 2, 64)
+
+    def timeout(self) -> float:
+        if self.srtt is None:
+            return self.ceiling
+        rto = (self.srtt + max(self.floor, self.K * self.rttvar)) * self._backoff
+        return min(self.ceiling, max(self.floor, rto))
+
+class Deadline:
+    """Absolute monotonic deadline shared by every step of one operation"""
+
+    def __init__(self, seconds: float) -> None:
+        self.end = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.end - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.end
+
+    def restart(self, seconds: float) -> None:
+        """Give the next step of a long operation a fresh budget"""
+        self.end = time.monotonic() + seconds
+
+class TransactionAborted(Exception):
+    """The exchange in flight was cut short by ASPEPClient.abort()"""
+
+def bounded_operation(method):
+    """Run an ASPEPClient method under the operation deadline (nested calls share the outer one)"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._bounded():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+# ======== ========== ========== ========== ====================== BAUD NEGOTIATION ========= ========== ========== =====================
+# Defaults for the "baud_negotiation" block of motor_config.json; the agreed rate is stored as "baud"
+DEFAULT_BAUD_NEGOTIATION = {
+    "enabled": False,           # Opt-in: stock firmware has no baud register
+    "rates": [921600, 460800],  # Tried fastest first
+    "register": MC_REG_UART_BAUD_BASE,
+    "settle": 0.01,             # Seconds between switching the port and the verification PING
+    "revert": 0.5,              # Seconds the performer waits before falling back to its old rate
+}
+
+# ======== ========== ========== ========== ====================== MOTOR CONFIG (LEARNED LAYOUTS) ========= ========== ========== =====================
+# Saves from different worker threads (one client per board) must not interleave
+_CONFIG_SAVE_LOCK = threading.Lock()
+
+class MotorConfigStore:
+    """motor_config.json access for ASPEP clients (needs self.config_path and self.motor_config)"""
+
+    config_path: Optional[str]
+    motor_config: dict
+
+    def _load_motor_config(self) -> dict:
+        """Load motor_config.json (empty config if missing or unreadable)"""
+        cfg = {"speed_ramp_layout": None, "working_registers": []}
+        if not self.config_path or not os.path.exists(self.config_path):
+            return cfg
+        try:
+            with open(self.config_path, 'r') as f:
+                cfg.update(json.load(f))
+        except Exception as e:
+            log.warning(f"Could not read {self.config_path}: {e}")
+        return cfg
+
+    def _save_motor_config(self) -> None:
+        """Write motor_config.json atomically (serialized across clients, one temp file per writer)"""
+        if not self.config_path:
+            return
+        tmp = f"{self.config_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with _CONFIG_SAVE_LOCK:
+                with open(tmp, 'w') as f:
+                    json.dump(self.motor_config, f, indent=2)
+                os.replace(tmp, self.config_path)
+        except Exception as e:
+            log.warning(f"Could not save {self.config_path}: {e}")
+
+    def get_layout(self, key: str) -> Optional[int]:
+        """Learned payload layout (1-based format number) for a command, or None"""
+        if key == "speed_ramp":
+            return self.motor_config.get("speed_ramp_layout")
+        for entry in self.motor_config.get("working_registers", []):
+            if isinstance(entry, dict) and entry.get("name") == key:
+                return entry.get("layout")
+        return None
+
+    def _set_layout(self, key: str, layout: Optional[int]) -> None:
+        """Remember (or forget, with None) the payload layout for a command"""
+        if self.get_layout(key) == layout:
+            return
+        if key == "speed_ramp":
+            self.motor_config["speed_ramp_layout"] = layout
+        else:
+            entries = [e for e in self.motor_config.get("working_registers", [])
+                       if not (isinstance(e, dict) and e.get("name") == key)]
+            if layout is not None:
+                entries.append({"name": key, "layout": layout})
+            self.motor_config["working_registers"] = entries
+        self._save_motor_config()
+
+# ======== ========== ========== ========== ====================== FRAME ENCODER ========= ========== ========== =====================
+class FrameEncoder:
+    """Packs header + payload of a DATA frame into one reused TX buffer"""
+
+    def __init__(self, capacity: int = 64) -> None:
+        self._buf = bytearray(4 + capacity)
+
+    def encode(self, payload: bytes) -> memoryview:
+        """Return a view of the complete frame, valid until the next encode()"""
+        n = len(payload)
+        if 4 + n > len(self._buf):
+            # Replace rather than resize: a previous view may still be exported
+            self._buf = bytearray(4 + n)
+        _HDR.pack_into(self._buf, 0, data_header_word(n))
+        self._buf[4:4 + n] = payload
+        return memoryview(self._buf)[:4 + n]
+
+# ======== ========== ========== ========== ====================== PACKET CODEC ========= ========== ========== =====================
+# Shared by ASPEPClient and the asyncio client (hardware.aspep_async)
+def beacon_frame(caps: Capabilities) -> bytes:
+    """BEACON packet advertising caps"""
+    l28 = caps.build_lower28()
+    return ((compute_header_crc(l28) << 28) | l28).to_bytes(4, 'little')
+
+def ping_frame(ip_id: int, packet_number: int) -> bytes:
+    """PING packet with the given IP id and packet number"""
+    l28 = (TYPE_PING | (ip_id & 0xF) << 8 | (packet_number & 0xFFFF) << 12)
+    return ((compute_header_crc(l28) << 28) | l28).to_bytes(4, 'little')
+
+def registers_request(bases: List[int], motor_index: int) -> bytes:
+    """GET_DATA_ELEMENT payload reading several registers (base IDs) of one motor"""
+    motor = motor_index & MOTOR_MASK
+    ids = (REGISTERS_BY_BASE[base].reg_id(motor_index) if base in REGISTERS_BY_BASE else base | motor
+           for base in bases)
+    return struct.pack(f'<{1 + len(bases)}H', GET_DATA_ELEMENT | motor, *ids)
+
+def decode_registers(bases: List[int], raw: bytes) -> Optional[Dict[int, int]]:
+    """{base: value} from a GET_DATA_ELEMENT response (one unpack_from), or None if it is too short"""
+    decoder = register_struct(tuple(bases))
+    if len(raw) < decoder.size:
+        return None
+    return dict(zip(bases, decoder.unpack_from(raw)))
+
+def telemetry_snapshot(values: Dict[int, int]) -> TelemetrySnapshot:
+    """TelemetrySnapshot from a read of TELEMETRY_REG_BASES"""
+    return TelemetrySnapshot(time.time(), *(values[base] for base in TELEMETRY_REG_BASES))
+
+def decode_telemetry(raw: bytes) -> Optional[TelemetrySnapshot]:
+    """TelemetrySnapshot straight from a TELEMETRY_REG_BASES response"""
+    if len(raw) < TELEMETRY_STRUCT.size:
+        return None
+    return TelemetrySnapshot(time.time(), *TELEMETRY_STRUCT.unpack_from(raw))
+
+def command_payload(command: int, motor_index: int) -> bytes:
+    """Two-byte MCP command (START_MOTOR, STOP_MOTOR, FAULT_ACK, ...)"""
+    return (command | (motor_index & MOTOR_MASK)).to_bytes(2, 'little')
+
+def speed_ramp_payloads(target_rpm: int, ramp_duration_ms: int, motor_index: int) -> List[bytes]:
+    """Candidate payload layouts for a MC_REG_SPEED_RAMP write"""
+    # Calculate the actual register ID for this motor
+    speed_ramp_reg = MC_REG_SPEED_RAMP_BASE | (motor_index & MOTOR_MASK)
+    
+    # Pack raw data: RPM (int32, little-endian) + Duration (uint16, little-endian)  PACK DATA: RPM (4 bytes) + Duration (2 bytes)
+    raw_data = struct.pack('<iH', target_rpm, ramp_duration_ms)     # 3360 RPM = 0x200D in hex → b'\x0D\x20\x00\x00' (little-endian)
+    raw_data_size = len(raw_data)  # Should be 6 bytes
+    
+    # Build MCP command for RAW data register write
+    mcp_cmd = MCP_CMD_WRITE_REG | (motor_index & MOTOR_MASK)
+    
+    return [
+        # Format 1: Standard MCP write with raw data
+        struct.pack('<HHH', mcp_cmd, speed_ramp_reg, raw_data_size) + raw_data,
+        
+        # Format 2: With motor index separate
+        struct.pack('<BHHH', motor_index, MCP_CMD_WRITE_REG, speed_ramp_reg, raw_data_size) + raw_data,
+        
+        # Format 3: Alternative ordering
+        struct.pack('<HH', mcp_cmd, speed_ramp_reg) + struct.pack('<H', raw_data_size) + raw_data,
+    ]
+
+def speed_ref_payloads(rpm: int, motor_index: int) -> List[bytes]:
+    """Candidate payload layouts for a MC_REG_SPEED_REF write (learned under "speed_ref")"""
+    wire_motor = max(0, motor_index - 1)
+    data4 = struct.pack('<i', int(rpm))
+    speed_ref_reg = MC_REG_SPEED_REF_BASE | (motor_index & MOTOR_MASK)
+    reg_lo = speed_ref_reg & 0xFF
+    reg_hi = (speed_ref_reg >> 8) & 0xFF
+    return [
+        bytes([MCP_CMD_WRITE_REG, wire_motor, reg_lo, reg_hi]) + data4,
+        bytes([wire_motor, MCP_CMD_WRITE_REG, reg_lo, reg_hi]) + data4,
+        bytes([wire_motor, MCP_CMD_WRITE_REG, 0x01, reg_lo, reg_hi]) + data4,
+    ]
+
+def ramp_duration_ms(speed_change: int, acceleration_rpm_s: float) -> int:
+    """PHYSICALLY ACCURATE FORMULA: ramp_duration_ms = speed_change / acc_rpm_s * 1000 (minimum 500 ms)"""
+    return max(int(abs(speed_change) / acceleration_rpm_s * 1000), 500)
+
 # ============ ========== ========== ================== MAIN CLIENT CLASS ======== ========== ========== ======================
-class ASPEPClient:
+class ASPEPClient(MotorConfigStore):
     """Complete ASPEP/MCP Motor Control Client with Physically Accurate Speed Ramp"""
     
-    def __init__(self, port: str = "/dev/ttyS0", baud: int = 115200, timeout: float = 0.04) -> None:
+    def __init__(self, port: str = "/dev/ttyS0", baud: int = 115200, timeout: float = 0.04,
+                 config_path: Optional[str] = None, recorder: Optional[FlightRecorder] = None) -> None:
         self.port = port
         self.baud = baud
+        self.base_baud = baud  # Rate the performer uses after reset
         self.timeout = timeout
         self.ser: Optional[serial.Serial] = None
         self.connected = False
@@ -226,98 +683,293 @@ class ASPEPClient:
         self._max_speed_rpm: int = 4800  # Default max speed - adjust based on your motor
         self._speed_unit: str = "RPM"    # "RPM" or "PERCENT"
         self._acceleration_rpm_s: float = 8000.0 # Default acceleration: 1000 RPM/s
+        # RX buffer: bytes are pulled from the port in bulk and consumed by offset
+        self._rx = bytearray()
+        self._rx_pos = 0
+        self.rx_discarded = 0  # Total bytes skipped while resyncing to a header
+        self._poller: Optional[select.poll] = None  # Readiness of the port's fd (None: poll in_waiting)
+        # abort() sets the flag and writes the pipe so a blocked poll() returns at once
+        self._abort = threading.Event()
+        self._wake_r: Optional[int] = None
+        self._wake_w: Optional[int] = None
+        self._encoder = FrameEncoder()
+        self.last_nack = False  # True when the last command was refused with NACK
+        self.link = LinkSupervisor()
+        self.datalog: Optional[DatalogSubscription] = None
+        # Raw TX/RX frames for post-mortem dumps (auto-dumped when a fault appears)
+        self.recorder = recorder if recorder is not None else FlightRecorder()
+        self._last_fault_flags = 0
+        # Learned payload layouts, persisted in motor_config.json when config_path is set
+        self.config_path = config_path
+        self.motor_config: dict = self._load_motor_config()
+        # Timeouts: RTT-adaptive first-response wait, bounded by a per-operation deadline
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(self.motor_config.get("timeouts") or {}))
+        self.rtt = RTTEstimator(self.timeouts["floor"], self.timeouts["command"])
+        self._deadline: Optional[Deadline] = None
+        self._sent_at = 0.0
+        # Opt-in faster UART rate, negotiated after handshake and remembered across boots
+        self.baud_negotiation = dict(DEFAULT_BAUD_NEGOTIATION, **(self.motor_config.get("baud_negotiation") or {}))
 
     # ===== ========== ========== ========== =============== SERIAL I/O ========== ========== ========== ========== ========== ==========
     def open(self) -> None:
-        """Open serial port"""
+        """Open serial port (at the remembered negotiated rate, when baud negotiation is on)"""
+        remembered = self.motor_config.get("baud")
+        if self.baud_negotiation["enabled"] and remembered:
+            self.baud = int(remembered)
         self.ser = serial.Serial(
             self.port, self.baud, timeout=self.timeout,
             bytesize=serial.EIGHTBITS, parity=serial.PARITY_NONE,
-            stopbits=serial.STOPBITS_ONE, rtscts=False
+            stopbits=serial.STOPBITS_ONE, rtscts=False,
+            exclusive=True  # flock(): a second process on the port would steal responses
         )
+        try:
+            # USB-serial adapters batch RX for up to 16 ms unless ASYNC_LOW_LATENCY is set
+            self.ser.set_low_latency_mode(True)
+        except (AttributeError, ValueError, OSError) as e:
+            log.debug("Low-latency mode not available on %s: %s", self.port, e)
+        self._poller = select.poll()
+        self._poller.register(self.ser.fileno(), select.POLLIN)
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._poller.register(self._wake_r, select.POLLIN)
         log.info(f"Opened {self.port} @ {self.baud} baud")
         self._drain()
 
     def close(self) -> None:
         """Close serial port"""
+        self._poller = None
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._wake_r = self._wake_w = None
         if self.ser and self.ser.is_open:
             self.ser.close()
             log.info("Port closed")
 
-    def _drain(self):
-        """Drain RX buffer"""
+    def _drain(self, quiet: float = 0.005, limit: float = 0.1):
+        """Discard RX bytes until the line has been quiet for `quiet` seconds (at most `limit`)"""
         if not self.ser: return
-        time.sleep(0.02)
-        while self.ser.in_waiting:
-            self.ser.read(self.ser.in_waiting)
-            time.sleep(0.001)
+        self.ser.reset_input_buffer()
+        end = time.monotonic() + limit
+        while time.monotonic() < end and self._wait_readable(quiet):
+            self.ser.read(self.ser.in_waiting or 1)
+        self._rx.clear()
+        self._rx_pos = 0
 
     def _tx(self, data: bytes, desc=""):
         """Transmit data"""
         self.ser.write(data)
         self.ser.flush()
-        log.debug(f"TX {desc}: {hx(data)}")
+        self.recorder.tx(data)
+        log.debug("TX %s: %s", desc, LazyHex(data))
+
+    def _wait_readable(self, timeout: float) -> bool:
+        """Block on the port's fd until bytes arrive or timeout (seconds) passes; raises TransactionAborted"""
+        if self._abort.is_set():
+            raise TransactionAborted("transaction aborted")
+        if self.ser.in_waiting:
+            return True
+        if self._poller is None:
+            # Port object without a pollable fd (replay/fake ports): short sleep-poll
+            end = time.monotonic() + timeout
+            while not self.ser.in_waiting and time.monotonic() < end and not self._abort.is_set():
+                time.sleep(0.0005)
+            ready = bool(self.ser.in_waiting)
+        else:
+            events = self._poller.poll(max(0, int(timeout * 1000 + 0.999)))
+            ready = any(fd != self._wake_r for fd, _ in events)
+        if self._abort.is_set():
+            raise TransactionAborted("transaction aborted")
+        return ready
+
+    def abort(self) -> None:
+        """Cut short the exchange in flight (callable from any thread); it raises TransactionAborted"""
+        self._abort.set()
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b'\0')
+            except OSError:
+                pass  # Pipe full: a wake-up is already pending
+
+    @property
+    def abort_pending(self) -> bool:
+        return self._abort.is_set()
+
+    def clear_abort(self) -> None:
+        """Re-arm after abort(): drop the wake-up and whatever the aborted exchange left in RX"""
+        self._abort.clear()
+        if self._wake_r is not None:
+            try:
+                while os.read(self._wake_r, 64):
+                    pass
+            except OSError:
+                pass  # Drained
+        self._drain(quiet=0.002, limit=0.02)
+
+    def _fill_rx(self, timeout: float = 0.0) -> int:
+        """Pull everything the port holds into the RX buffer, waiting up to timeout for the first byte"""
+        if not self._wait_readable(timeout):
+            return 0
+        chunk = self.ser.read(self.ser.in_waiting or 1)
+        if chunk:
+            if self._rx_pos and self._rx_pos == len(self._rx):
+                self._rx.clear()
+                self._rx_pos = 0
+            self._rx += chunk
+        return len(chunk)
+
+    def _rx_available(self) -> int:
+        return len(self._rx) - self._rx_pos
+
+    def _rx_take(self, n: int) -> bytes:
+        """Consume n buffered bytes"""
+        data = bytes(self._rx[self._rx_pos:self._rx_pos + n])
+        self._rx_pos += len(data)
+        if self._rx_pos >= 4096:
+            # Compact occasionally so the buffer cannot grow without bound
+            del self._rx[:self._rx_pos]
+            self._rx_pos = 0
+        return data
 
     def _read_exact(self, n: int, timeout=0.4):
-        """Read exactly n bytes"""
-        end = time.time() + timeout
-        buf = b''
-        while len(buf) < n and time.time() < end:
-            part = self.ser.read(n - len(buf))
-            if part: buf += part
-            else: time.sleep(0.0008)
-        return buf
+        """Read exactly n bytes (or fewer once the monotonic deadline passes)"""
+        end = time.monotonic() + timeout
+        while self._rx_available() < n:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            self._fill_rx(remaining)
+        return self._rx_take(min(n, self._rx_available()))
+
+    def _read_word(self, timeout: float) -> bytes:
+        """Read one 4-byte handshake word (BEACON/PING reply) into the flight recorder"""
+        word = self._read_exact(4, timeout)
+        if word:
+            self.recorder.rx(word)
+        return word
 
     def _read_header_sync(self, timeout=0.6):
-        """Read and sync to valid header"""
-        start = time.time()
-        window = bytearray(self._read_exact(4, timeout))
-        if len(window) < 4: return b''
-        
-        while time.time() - start < timeout:
-            w = int.from_bytes(window, 'little')
-            if check_header_crc(w):
-                return bytes(window)
-            nxt = self.ser.read(1)
-            if not nxt:
-                time.sleep(0.0005)
+        """Read and sync to valid header by scanning the RX buffer at byte offsets"""
+        end = time.monotonic() + timeout
+        skipped = 0
+        try:
+            while True:
+                buf = self._rx
+                pos = self._rx_pos
+                last = len(buf) - 4
+                while pos <= last:
+                    if check_header_crc(_HDR.unpack_from(buf, pos)[0]):
+                        skipped += pos - self._rx_pos
+                        self._rx_pos = pos
+                        return self._rx_take(4)
+                    pos += 1
+                # Keep the last 3 bytes: they may be the start of a header
+                if pos > self._rx_pos:
+                    skipped += pos - self._rx_pos
+                    self._rx_pos = pos
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return b''
+                self._fill_rx(remaining)
+        finally:
+            if skipped:
+                self.rx_discarded += skipped
+                log.warning(f"RX resync: discarded {skipped} bytes (total {self.rx_discarded})")
+
+    def _send_with_layouts(self, key: str, formats: list, label: str, retry_delay: float, **kwargs) -> bool:
+        """
+        Send a command whose payload layout the controller decides.
+        The learned layout is used directly; all layouts are probed only when
+        none is known yet or the learned one was refused with NACK.
+        """
+        learned = self.get_layout(key)
+        if learned is not None and 1 <= learned <= len(formats):
+            if self._send_data_command(formats[learned - 1], f"{label}_{learned}", **kwargs):
+                return True
+            if not self.last_nack:
+                return False  # No answer is a link problem, not a layout problem
+            log.warning(f"{label}: layout {learned} NACKed - re-probing")
+            self._set_layout(key, None)
+        
+        for i, payload in enumerate(formats, 1):
+            if i == learned:
                 continue
-            window.pop(0)
-            window.append(nxt[0])
-        return b''
+            if self._deadline_expired(label):
+                return False
+            log.debug(f"Trying format {i}: {hx(payload)}")
+            if self._send_data_command(payload, f"{label}_{i}", **kwargs):
+                log.info(f"{label}: controller accepts layout {i}")
+                self._set_layout(key, i)
+                return True
+            log.debug(f"Format {i} failed, trying next...")
+            time.sleep(self._capped(retry_delay))
+        return False
+
+    # ===== ========== ========== ========== ========== =============== TIMEOUTS / DEADLINES ==== ========== ========== ========== ========== ================
+    @contextmanager
+    def _bounded(self, seconds: Optional[float] = None):
+        """Install the operation deadline unless an outer operation already owns one"""
+        if self._deadline is not None:
+            yield self._deadline
+            return
+        self._deadline = Deadline(self.timeouts["operation"] if seconds is None else seconds)
+        try:
+            yield self._deadline
+        finally:
+            self._deadline = None
+
+    def _capped(self, timeout: float) -> float:
+        """timeout, shortened to what is left of the current operation's deadline"""
+        if self._deadline is None:
+            return timeout
+        return min(timeout, self._deadline.remaining())
+
+    def _deadline_expired(self, label: str) -> bool:
+        if self._deadline is not None and self._deadline.expired():
+            log.error(f"ERROR: {label}: operation deadline ({self.timeouts['operation']}s) exceeded")
+            return True
+        return False
 
     # ===== ========== ========== ========== ========== =============== PACKET BUILDING ==== ========== ========== ========== ========== ================
     def build_data_header(self, length: int) -> bytes:
         """Build DATA packet header"""
-        if length > 0x1FFF: raise ValueError("Payload too long")
-        l28 = (length << 4) | TYPE_DATA
-        word = (compute_header_crc(l28) << 28) | l28
-        return word.to_bytes(4, 'little')
+        return data_header_word(length).to_bytes(4, 'little')
 
     def build_beacon(self, caps: Capabilities) -> bytes:
         """Build BEACON packet"""
-        l28 = caps.build_lower28()
-        word = (compute_header_crc(l28) << 28) | l28
-        return word.to_bytes(4, 'little')
+        return beacon_frame(caps)
     
     def build_ping(self):
-        """Build PING packet"""
-        l28 = (TYPE_PING | (self.ip_id & 0xF) << 8 | (self.packet_number & 0xFFFF) << 12)
-        word = (compute_header_crc(l28) << 28) | l28
-        return word.to_bytes(4, 'little')
+        """Build PING packet (each call advances the packet number)"""
+        frame = ping_frame(self.ip_id, self.packet_number)
+        self.packet_number = (self.packet_number + 1) & 0xFFFF
+        return frame
 
     # === ========== ========== ========== ========== ================= HANDSHAKE ========== ========== ========== ========== ==========
     def handshake(self) -> bool:
-        """Perform ASPEP handshake"""
+        """Perform ASPEP handshake (falling back to the base rate, then negotiating a faster one if enabled)"""
         if self.connected:
             log.info("Already connected")
             return True
         
+        ok = self._handshake()
+        if not ok and self.ser and self.baud != self.base_baud:
+            log.warning(f"No answer at {self.baud} baud - retrying at {self.base_baud}")
+            self._set_port_baud(self.base_baud)
+            ok = self._handshake()
+        if ok and self.baud_negotiation["enabled"] and self.baud == self.base_baud:
+            self.negotiate_baud()
+        return ok
+
+    def _handshake(self) -> bool:
+        """BEACON exchange + PING at the port's current rate"""
         self._drain()
         log.info("Handshaking...")
         
+        hs_timeout = self.timeouts["handshake"]
         self._tx(self.build_beacon(self.ctrl_caps), "BEACON")
-        perf = self._read_exact(4, 0.4)
+        perf = self._read_word(self._capped(hs_timeout))
         if not perf:
             log.error("ERROR: No performer beacon")
             return False
@@ -333,21 +985,144 @@ class ASPEPClient:
         self.ctrl_caps.txa_max = min(self.ctrl_caps.txa_max, self.perf_caps.txa_max)
         
         self._tx(self.build_beacon(self.perf_caps), "ECHO")
-        _ = self._read_exact(4, 0.1)
+        self._read_word(self._capped(min(0.1, hs_timeout)))
         
         self._tx(self.build_ping(), "PING")
-        pong = self._read_exact(4, 0.5)
+        pong = self._read_word(self._capped(hs_timeout))
         if not pong or (pong[0] & 0x0F) != TYPE_PING:
             log.error("ERROR: Ping failed")
             return False
         
         self.connected = True
+        self.link.record_ok()
         log.info("Handshake OK")
         return True
 
+    # === ========== ========== ========== ========== ================= BAUD NEGOTIATION ========== ========== ========== ========== ==========
+    def _set_port_baud(self, baud: int) -> None:
+        """Reconfigure the local port; buffered bytes at the old rate are meaningless"""
+        self.ser.baudrate = baud
+        self.baud = baud
+        self._rx.clear()
+        self._rx_pos = 0
+        self.rtt = RTTEstimator(self.timeouts["floor"], self.timeouts["command"])
+
+    def negotiate_baud(self) -> int:
+        """
+        Move both ends to the fastest configured rate the performer accepts.
+        Each switch is verified with PINGs at the new rate; on failure the host
+        returns to the old rate (the performer reverts on its own). The agreed
+        rate is stored in motor_config.json. Returns the active rate.
+        """
+        if not self.connected:
+            return self.baud
+        cfg = self.baud_negotiation
+        reg = int(cfg["register"]) & REG_MASK
+        for rate in sorted((int(r) for r in cfg["rates"]), reverse=True):
+            if rate <= self.baud:
+                continue
+            payload = struct.pack('<HHI', SET_DATA_ELEMENT, reg, rate)
+            if not self._send_data_command(payload, f"SET_BAUD_{rate}", expect_data=False, allow_ack_only=True):
+                if not self.last_nack:
+                    break  # No answer at all: leave the link alone
+                continue
+            if self.last_data_payload[:1] not in (b'', b'\x00'):
+                log.info(f"Performer refused {rate} baud (status 0x{self.last_data_payload[0]:02X})")
+                continue
+            
+            previous = self.baud
+            self.ser.flush()  # The request must leave at the old rate
+            self._set_port_baud(rate)
+            time.sleep(cfg["settle"])
+            # Three PINGs sharing one handshake timeout: the first may meet a settling receiver
+            if any(self._probe_ping(self.timeouts["handshake"] / 3) for _ in range(3)):
+                log.info(f"UART switched to {rate} baud")
+                self._remember_baud(rate)
+                return rate
+            
+            log.warning(f"No PING answer at {rate} baud - falling back to {previous}")
+            self._set_port_baud(previous)
+            time.sleep(cfg["revert"])
+            if not self._probe_ping(self.timeouts["handshake"]):
+                log.error(f"ERROR: Performer silent at {previous} baud after failed switch")
+                self.connected = False
+                self.link.schedule_retry()
+                break
+        
+        self._remember_baud(self.baud)
+        return self.baud
+
+    def _remember_baud(self, baud: int) -> None:
+        if self.motor_config.get("baud") != baud:
+            self.motor_config["baud"] = baud
+            self._save_motor_config()
+
+    # === ========== ========== ========== ========== ================= LINK SUPERVISION ========== ========== ========== ========== ==========
+    def _probe_ping(self, timeout: float) -> bool:
+        """One PING round trip, without link-failure accounting"""
+        self._tx(self.build_ping(), "PING")
+        sent_at = time.monotonic()
+        pkt = self._read_packet(timeout=timeout)
+        if pkt and pkt["type"] == TYPE_PING:
+            self.rtt.sample(time.monotonic() - sent_at)
+            self.link.record_ok()
+            return True
+        return False
+
+    def ping(self, timeout: Optional[float] = None) -> bool:
+        """Send a sequenced keepalive PING and wait for the performer's PING answer"""
+        if self._probe_ping(self.rtt.timeout() if timeout is None else timeout):
+            return True
+        self.rtt.backoff()
+        self._note_link_failure("ping")
+        return False
+
+    def _note_link_failure(self, what: str) -> None:
+        """Count a missed answer and mark the session down after consecutive misses"""
+        if self.connected and self.link.record_failure():
+            log.warning(f"Link down after {self.link.failures} missed answers ({what}) - reconnecting")
+            self.connected = False
+            self.link.schedule_retry()
+
+    def _ensure_link(self) -> bool:
+        """Fail fast while the link is down; re-handshake once the backoff has elapsed"""
+        if self.connected:
+            return True
+        if not self.link.retry_due():
+            return False
+        if self.handshake():
+            return True
+        self.link.schedule_retry()
+        return False
+
+    def supervise(self) -> None:
+        """Periodic keepalive/reconnect step, run by the port owner while idle"""
+        if not self.ser:
+            return
+        if self.datalog:
+            self.poll_async()
+        if self.connected:
+            if self.link.ping_due():
+                self.ping()
+        else:
+            self._ensure_link()
+
     # ==== ========== ========== ========== ================ PACKET READING ==== ========== ========== ========== ========== ================
     def _read_packet(self, timeout=0.8):
+        """Read ASPEP packet (datalog ASYNC records are demultiplexed and skipped)"""
+        end = time.monotonic() + timeout
+        while True:
+            pkt = self._read_one_packet(max(0.0, end - time.monotonic()))
+            if (pkt and pkt["type"] == TYPE_DATA and self.datalog
+                    and self.datalog.matches(pkt["payload"])):
+                self.datalog.feed(pkt["payload"])
+                self.link.record_ok()
+                continue
+            return pkt
+
+    def _read_one_packet(self, timeout=0.8):
         """Read ASPEP packet"""
+        end = time.monotonic() + timeout
         hdr = self._read_header_sync(timeout)
         if not hdr: return None
         
@@ -356,49 +1131,92 @@ class ASPEPClient:
         ptype = lower28 & 0xF
         length = (lower28 >> 4) & 0x1FFF
         
-        log.debug(f"RX type=0x{ptype:X} len={length}")
+        log.debug("RX type=0x%X len=%d", ptype, length)
         
         if ptype == TYPE_SILENT:
-            log.debug("SILENT")
+            self.recorder.rx(hdr)
             return {"type": TYPE_SILENT, "payload": b''}
         
         if ptype == TYPE_ERROR:
-            payload = self._read_exact(length, timeout) if length else b''
+            payload = self._read_exact(length, max(0.0, end - time.monotonic())) if length else b''
+            self.recorder.rx(hdr + payload)
             log.error(f"ERROR: {hx(payload)}")
             return {"type": TYPE_ERROR, "payload": payload}
         
         if ptype in (TYPE_DATA, TYPE_ACK, TYPE_NACK):
-            payload = self._read_exact(length, timeout) if length else b''
+            payload = self._read_exact(length, max(0.0, end - time.monotonic())) if length else b''
+            self.recorder.rx(hdr + payload)
             return {"type": ptype, "payload": payload}
         
-        if ptype in (TYPE_BEACON, TYPE_PING):
-            return {"type": ptype, "payload": b''}
-        
+        self.recorder.rx(hdr)
         return {"type": ptype, "payload": b''}
 
+    def poll_async(self) -> int:
+        """Consume datalog records already received, without waiting; returns how many"""
+        before = self.datalog.received if self.datalog else 0
+        while True:
+            self._fill_rx(0)
+            if self._rx_available() < 4:
+                break
+            # Short timeout only covers the tail of a frame whose header already arrived
+            pkt = self._read_packet(timeout=0.02)
+            if pkt is None:
+                break
+            log.debug("Unsolicited packet type=0x%X dropped", pkt['type'])
+        return (self.datalog.received if self.datalog else 0) - before
+
     # ====== ========== ========== ============== COMMAND SENDING ======== ========== ========== ============ ========== ==========
     def _send_data_command(self, payload: bytes, label: str,
                            expect_data: bool,
                            expect_string: bool = False,
                            allow_ack_only: bool = False,
                            data_timeout: float = 1.5):
-        """Send DATA command"""
-        
-        hdr = self.build_data_header(len(payload)) # 4-byte header
-        log.info(f"CMD {label}: {hx(payload)}")
-        
-        self._tx(hdr, f"{label}_H")  # Send header via serial
-        if payload:
-            time.sleep(0.0008)
-            self._tx(payload, f"{label}_P")
-        
-        first = self._read_packet(timeout=0.8)
+        """Send DATA command (refused once the operation deadline has passed)"""
+        self.last_nack = False
+        if self._deadline_expired(label):
+            return False
+        self._send_frame(payload, label)
+        return self._await_response(label, expect_data, expect_string, allow_ack_only, data_timeout,
+                                    sample_rtt=True)
+
+    def _send_frame(self, payload: bytes, label: str) -> None:
+        """Transmit one DATA request (header + payload); nothing new goes out while an abort is pending"""
+        if self._abort.is_set():
+            raise TransactionAborted("transaction aborted")
+        frame = self._encoder.encode(payload)  # 4-byte header + payload in one buffer
+        log.debug("CMD %s: %s", label, LazyHex(payload))
+        
+        self._tx(frame, label)  # Single write via serial
+        self._sent_at = time.monotonic()
+
+    def _await_response(self, label: str,
+                        expect_data: bool,
+                        expect_string: bool = False,
+                        allow_ack_only: bool = False,
+                        data_timeout: float = 1.5,
+                        sample_rtt: bool = False) -> bool:
+        """
+        Read the response to the oldest outstanding DATA request.
+        The first-response wait is the RTT-adaptive timeout; every wait is capped by
+        the operation deadline. sample_rtt feeds the estimator (only when a single
+        request was in flight, so queueing behind others is not mistaken for RTT).
+        """
+        self.last_nack = False
+        rto = self.rtt.timeout()
+        wait = self._capped(rto)
+        first = self._read_packet(timeout=wait)
         if not first:
-            log.error(f"ERROR: {label}: No response")
+            log.error(f"ERROR: {label}: No response ({wait * 1000:.0f} ms)")
+            if wait >= rto:  # Cut short by the deadline is not evidence of a dead link
+                self.rtt.backoff()
+                self._note_link_failure(label)
             return False
+        if sample_rtt:
+            self.rtt.sample(time.monotonic() - self._sent_at)
+        self.link.record_ok()
         
         if first["type"] == TYPE_SILENT:
-            first = self._read_packet(timeout=0.8)
+            first = self._read_packet(timeout=self._capped(rto))
             if not first:
                 log.error(f"ERROR: {label}: No response after SILENT")
                 return False
@@ -409,6 +1227,7 @@ class ASPEPClient:
         
         if first["type"] == TYPE_NACK:
             log.error(f"ERROR: {label}: NACK")
+            self.last_nack = True
             return False
         
         if first["type"] == TYPE_DATA:
@@ -423,12 +1242,12 @@ class ASPEPClient:
                 return True
             
             if not expect_data:
-                log.info(f"OK: {label}")
+                log.debug("OK: %s", label)
                 return True
             
-            end = time.time() + data_timeout
-            while time.time() < end:
-                pkt = self._read_packet(timeout=0.5)
+            end = time.monotonic() + self._capped(min(data_timeout, self.timeouts["data_read"]))
+            while time.monotonic() < end:
+                pkt = self._read_packet(timeout=max(0.0, min(rto, end - time.monotonic())))
                 if not pkt: continue
                 
                 if pkt["type"] == TYPE_SILENT: continue
@@ -445,10 +1264,11 @@ class ASPEPClient:
                     return True
                 if pkt["type"] == TYPE_NACK:
                     log.error(f"ERROR: {label}: Late NACK")
+                    self.last_nack = True
                     return False
             
             if allow_ack_only:
-                log.info(f"OK: {label} (ACK only)")
+                log.debug("OK: %s (ACK only)", label)
                 self.last_data_payload = b''
                 return True
             
@@ -458,13 +1278,61 @@ class ASPEPClient:
         log.error(f"ERROR: {label}: Unexpected type 0x{first['type']:X}")
         return False
 
+    def pipeline_window(self) -> int:
+        """Synchronous requests that may be in flight at once (negotiated txs_max)"""
+        if not self.connected:
+            return 1
+        return max(1, self.ctrl_caps.txs_max)
+
+    @bounded_operation
+    def send_pipelined(self, commands: List[PipelinedCommand]) -> List[PipelineResult]:
+        """
+        Send a burst of DATA requests keeping up to pipeline_window() in flight.
+        ASPEP DATA responses carry no request tag, so they are matched to requests
+        in FIFO order. A request that gets no answer at all breaks that matching,
+        so everything still in flight (and not yet sent) is reported as failed.
+        """
+        results: List[Optional[PipelineResult]] = [None] * len(commands)
+        if not commands:
+            return []
+        if not self._ensure_link():
+            return [PipelineResult(c.label, False) for c in commands]
+        
+        window = self.pipeline_window()
+        in_flight: deque = deque()
+        next_i = 0
+        while next_i < len(commands) or in_flight:
+            while next_i < len(commands) and len(in_flight) < window and not self._deadline.expired():
+                self._send_frame(commands[next_i].payload, commands[next_i].label)
+                in_flight.append((next_i, time.monotonic()))
+                next_i += 1
+            
+            if not in_flight:
+                self._deadline_expired("pipeline")
+                break
+            i, sent_at = in_flight.popleft()
+            cmd = commands[i]
+            ok = self._await_response(cmd.label, cmd.expect_data, False, cmd.allow_ack_only, cmd.data_timeout,
+                                      sample_rtt=len(in_flight) == 0 and next_i == i + 1)
+            latency_ms = (time.monotonic() - sent_at) * 1000
+            results[i] = PipelineResult(cmd.label, ok, self.last_data_payload if ok else b'',
+                                        latency_ms, nack=self.last_nack)
+            log.debug("PIPE %s: ok=%s %.1f ms (window %d)", cmd.label, ok, latency_ms, window)
+            
+            if not ok and not self.last_nack:
+                log.error(f"ERROR: pipeline lost sync at {cmd.label} - abandoning {len(commands) - i - 1} requests")
+                self._drain()
+                break
+        
+        return [r if r is not None else PipelineResult(c.label, False) for r, c in zip(results, commands)]
+
     def _log_payload(self, label: str, expect_string: bool):
         """Log payload"""
         if expect_string:
             txt = self.last_data_payload.rstrip(b"\x00").decode(errors="ignore")
             log.info(f"OK: {label}: '{txt}'")
         else:
-            log.info(f"OK: {label}: {len(self.last_data_payload)} bytes")
+            log.debug("OK: %s: %d bytes", label, len(self.last_data_payload))
 
     # ================================================== SPEED SCALING CONFIGURATION ======================================================================
     def set_max_speed(self, max_speed_rpm: int):
@@ -488,37 +1356,38 @@ class ASPEPClient:
     def percentage_to_rpm(self, percentage: int) -> int:
         """Convert percentage to RPM"""
         rpm = int((percentage / 100.0) * self._max_speed_rpm)
-        log.info(f"{percentage}% = {rpm} RPM (max: {self._max_speed_rpm} RPM)")
+        log.debug("%d%% = %d RPM (max: %d RPM)", percentage, rpm, self._max_speed_rpm)
         return rpm
 
     def rpm_to_percentage(self, rpm: int) -> int:
         """Convert RPM to percentage"""
         percentage = int((rpm / self._max_speed_rpm) * 100)
-        log.info(f"{rpm} RPM = {percentage}% (max: {self._max_speed_rpm} RPM)")
+        log.debug("%d RPM = %d%% (max: %d RPM)", rpm, percentage, self._max_speed_rpm)
         return percentage
 
     # ======= ========== ========== = ====================== MOTOR COMMANDS ======= ========== ========== ========== =============
+    @bounded_operation
     def request_name(self):
         """Request motor name"""
-        if not self.handshake(): return False
+        if not self._ensure_link(): return False
         
         formats = [
-            ("F1", CMD_NAME.to_bytes(2, 'little') + (0x00E1).to_bytes(2, 'little')),
-            ("F2", CMD_NAME.to_bytes(2, 'little')),
-            ("F3", bytes([0x00]) + CMD_NAME.to_bytes(2, 'little')),
+            CMD_NAME.to_bytes(2, 'little') + (0x00E1).to_bytes(2, 'little'),
+            CMD_NAME.to_bytes(2, 'little'),
+            bytes([0x00]) + CMD_NAME.to_bytes(2, 'little'),
         ]
         
-        for name, payload in formats:
-            log.info(f"Name {name}")
-            if self._send_data_command(payload, f"Name-{name}", expect_data=True, expect_string=True, data_timeout=2.0):
-                return True
+        if self._send_with_layouts("name", formats, "Name-F", 0.0,
+                                   expect_data=True, expect_string=True, data_timeout=2.0):
+            return True
         
         log.error("ERROR: All name formats failed")
         return False
 
+    @bounded_operation
     def start_motor(self, motor_index: int = 1) -> bool:
         """Start motor using MCP command"""
-        if not self.handshake(): return False
+        if not self._ensure_link(): return False
         
         mcp_header = START_MOTOR | (motor_index & MOTOR_MASK)
         payload = mcp_header.to_bytes(2, 'little')
@@ -526,9 +1395,10 @@ class ASPEPClient:
         log.info(f"Starting motor {motor_index} (header=0x{mcp_header:04X})")
         return self._send_data_command(payload, "START_MOTOR", expect_data=False, allow_ack_only=True)
 
+    @bounded_operation
     def stop_motor(self, motor_index: int = 1) -> bool:
         """Stop motor using MCP command"""
-        if not self.handshake(): return False
+        if not self._ensure_link(): return False
         
         mcp_header = STOP_MOTOR | (motor_index & MOTOR_MASK)
         payload = mcp_header.to_bytes(2, 'little')
@@ -536,13 +1406,40 @@ class ASPEPClient:
         log.info(f"Stopping motor {motor_index}")
         return self._send_data_command(payload, "STOP_MOTOR", expect_data=False, allow_ack_only=True)
 
+    def emergency_stop(self, motor_index: int = 1, timeout: Optional[float] = None,
+                       zero_rpm: int = 50, poll_interval: float = 0.05) -> bool:
+        """
+        STOP_MOTOR (repeated until acknowledged), then poll the measured speed until
+        it is within zero_rpm of standstill. True only when the stop was confirmed
+        before the deadline (timeouts["estop"] by default).
+        """
+        self.clear_abort()
+        budget = self.timeouts["estop"] if timeout is None else timeout
+        with self._bounded(budget) as deadline:
+            stop_sent = False
+            while not deadline.expired():
+                if not stop_sent:
+                    stop_sent = self.stop_motor(motor_index)
+                else:
+                    speed = self.read_register("speed_meas", motor_index)
+                    if speed is not None and abs(speed) <= zero_rpm:
+                        log.info(f"Motor {motor_index} stop confirmed ({speed} RPM, "
+                                 f"{(budget - deadline.remaining()) * 1000:.0f} ms)")
+                        self._last_speed_ref = 0
+                        return True
+                time.sleep(min(poll_interval, deadline.remaining()))
+        log.error(f"ERROR: motor {motor_index} stop not confirmed within {budget:.1f}s "
+                  f"({'speed still above zero' if stop_sent else 'STOP_MOTOR not acknowledged'})")
+        return False
+
     # ====== ======== ============ ============== PHYSICALLY ACCURATE SPEED CONTROL ========= ========== =========== ========== ==========
+    @bounded_operation
     def set_speed_auto_ramp(self, target_rpm: int, motor_index: int = 1) -> bool:
         """
         AUTOMATIC ramp handling with PHYSICALLY ACCURATE formula:
         ramp_duration_ms = speed_change / acc_rpm_s * 1000
         """
-        if not self.handshake():
+        if not self._ensure_link():
             return False
         
         current_speed = self._last_speed_ref or 0
@@ -553,21 +1450,18 @@ class ASPEPClient:
             log.info(f"Speed unchanged: {target_rpm} RPM")
             return True
         
-        # PHYSICALLY ACCURATE FORMULA: ramp_duration_ms = speed_change / acc_rpm_s * 1000
-        ramp_duration_ms = int(speed_change / self._acceleration_rpm_s * 1000)
-        
-        # Ensure minimum ramp time for stability
-        ramp_duration_ms = max(ramp_duration_ms, 500)  # Minimum 500ms # Ensure minimum ramp time for stability
+        ramp_duration_ms = self._ramp_duration_ms(target_rpm)
         
         log.info(f" ♿➡️ AUTO-RAMP: {current_speed} → {target_rpm} RPM "
                  f"over {ramp_duration_ms}ms ({self._acceleration_rpm_s} RPM/s acceleration)")
         
         # Try RAW speed ramp first (prevents over-voltage)
-        if self.set_speed_ramp_raw(target_rpm, ramp_duration_ms, motor_index):
-            self._last_speed_ref = target_rpm
+        if self.ramp_speed_raw(target_rpm, motor_index, ramp_duration_ms):
             return True
         
         # Fallback: Use step-wise approach if RAW ramp fails
+        if self._deadline_expired("SPEED_RAMP"):
+            return False
         log.warning("RAW ramp failed, using step-wise fallback")
         if self._set_speed_stepwise(target_rpm, motor_index):
             self._last_speed_ref = target_rpm
@@ -575,111 +1469,124 @@ class ASPEPClient:
         
         return False
     
+    def _ramp_duration_ms(self, target_rpm: int, from_rpm: Optional[int] = None) -> int:
+        """Ramp time from from_rpm (default: current reference) to target_rpm at the configured acceleration"""
+        if from_rpm is None:
+            from_rpm = self._last_speed_ref or 0
+        return ramp_duration_ms(target_rpm - from_rpm, self._acceleration_rpm_s)
+
+    def _speed_ramp_formats(self, target_rpm: int, ramp_duration_ms: int, motor_index: int) -> list:
+        """Candidate payload layouts for a MC_REG_SPEED_RAMP write"""
+        return speed_ramp_payloads(target_rpm, ramp_duration_ms, motor_index)
+
+    @bounded_operation
+    def start_motor_with_speed(self, target_rpm: int, motor_index: int = 1) -> bool:
+        """
+        START_MOTOR followed by the speed ramp as one pipelined burst.
+        Needs a learned ramp layout; otherwise (or on NACK) falls back to sequential commands.
+        """
+        if not self._ensure_link():
+            return False
+        
+        layout = self.get_layout("speed_ramp")
+        if target_rpm <= 0 or layout is None:
+            if not self.start_motor(motor_index):
+                return False
+            return target_rpm <= 0 or self.set_speed_auto_ramp(target_rpm, motor_index)
+        
+        ramp_duration_ms = self._ramp_duration_ms(target_rpm, from_rpm=0)  # Ramp up from standstill
+        ramp_payload = self._speed_ramp_formats(target_rpm, ramp_duration_ms, motor_index)[layout - 1]
+        start_payload = (START_MOTOR | (motor_index & MOTOR_MASK)).to_bytes(2, 'little')
+        
+        log.info(f"Starting motor {motor_index} at {target_rpm} RPM (pipelined)")
+        start, ramp = self.send_pipelined([
+            PipelinedCommand(start_payload, "START_MOTOR"),
+            PipelinedCommand(ramp_payload, f"SPEED_RAMP_RAW_{layout}"),
+        ])
+        if not start.ok:
+            return False
+        if ramp.ok:
+            self._last_speed_ref = target_rpm
+            return True
+        return self.set_speed_auto_ramp(target_rpm, motor_index)
+
    #converting Python commands into actual motor movements! 
+    @bounded_operation
     def set_speed_ramp_raw(self, target_rpm: int, ramp_duration_ms: int = 2000, motor_index: int = 1) -> bool:
         """
         Set speed with ramp using RAW data format - PREVENTS OVER-VOLTAGE FAULTS
         """
-        if not self.handshake():
+        if not self._ensure_link():
             return False
         
-        # Calculate the actual register ID for this motor
         speed_ramp_reg = MC_REG_SPEED_RAMP_BASE | (motor_index & MOTOR_MASK)
-        
-        # Pack raw data: RPM (int32, little-endian) + Duration (uint16, little-endian)  PACK DATA: RPM (4 bytes) + Duration (2 bytes)
-        raw_data = struct.pack('<iH', target_rpm, ramp_duration_ms)     # 3360 RPM = 0x200D in hex → b'\x0D\x20\x00\x00' (little-endian)
-        raw_data_size = len(raw_data)  # Should be 6 bytes
-        
         log.debug(f"Speed Ramp RAW: {target_rpm} RPM over {ramp_duration_ms}ms (reg=0x{speed_ramp_reg:04X})")
         
-        # Build MCP command for RAW data register write
-        mcp_cmd = MCP_CMD_WRITE_REG | (motor_index & MOTOR_MASK)
-        
         # Try different payload formats
-        formats = [
-            # Format 1: Standard MCP write with raw data
-            struct.pack('<HHH', mcp_cmd, speed_ramp_reg, raw_data_size) + raw_data,
-            
-            # Format 2: With motor index separate
-            struct.pack('<BHHH', motor_index, MCP_CMD_WRITE_REG, speed_ramp_reg, raw_data_size) + raw_data,
-            
-            # Format 3: Alternative ordering
-            struct.pack('<HH', mcp_cmd, speed_ramp_reg) + struct.pack('<H', raw_data_size) + raw_data,
-        ]
+        formats = self._speed_ramp_formats(target_rpm, ramp_duration_ms, motor_index)
         
-        for i, payload in enumerate(formats, 1):
-            log.debug(f"Trying format {i}: {hx(payload)}")
-            
-            ok = self._send_data_command(
-                payload,
-                f"SPEED_RAMP_RAW_{i}",
-                expect_data=False,
-                allow_ack_only=True,
-                data_timeout=1.0
-            )
-            
-            if ok:
-                log.debug(f"✓ Speed ramp programmed: {target_rpm} RPM over {ramp_duration_ms}ms")
-                return True
-            else:
-                log.debug(f"Format {i} failed, trying next...")
-                time.sleep(0.1)
+        if self._send_with_layouts("speed_ramp", formats, "SPEED_RAMP_RAW", 0.1,
+                                   expect_data=False, allow_ack_only=True, data_timeout=1.0):
+            log.debug(f"✓ Speed ramp programmed: {target_rpm} RPM over {ramp_duration_ms}ms")
+            return True
         
         log.error("✗ All speed ramp formats failed")
         return False
 
-    def _set_speed_stepwise(self, target_rpm: int, motor_index: int = 1, step_size: int = 500, step_delay: float = 0.2) -> bool:
+    def ramp_speed_raw(self, target_rpm: int, motor_index: int = 1, ramp_duration_ms: Optional[int] = None) -> bool:
+        """One RAW ramp from the current reference to target_rpm; the controller does the ramping"""
+        if ramp_duration_ms is None:
+            ramp_duration_ms = self._ramp_duration_ms(target_rpm)
+        if not self.set_speed_ramp_raw(target_rpm, ramp_duration_ms, motor_index):
+            return False
+        self._last_speed_ref = target_rpm
+        return True
+
+    def step_speed_toward(self, target_rpm: int, motor_index: int = 1, step_size: int = 500) -> Optional[int]:
         """
-        Step-wise speed transition as fallback when RAW ramp fails
+        Write the next SPEED_REF setpoint (at most step_size away) toward target_rpm.
+        Returns the new reference, or None if the write failed. One UART transaction, no sleeping.
         """
         current = self._last_speed_ref or 0
-        
         if abs(target_rpm - current) <= step_size:
-            # Small change, use direct command
-            return self._set_speed_instant(target_rpm, motor_index)
-        
-        # Large change, step through speeds
-        steps = abs(target_rpm - current) // step_size
-        direction = 1 if target_rpm > current else -1
-        
-        log.info(f"Step-wise transition: {current} → {target_rpm} RPM in {steps} steps")
+            setpoint = target_rpm
+        else:
+            setpoint = current + (step_size if target_rpm > current else -step_size)
+        if not self._set_speed_instant(setpoint, motor_index):
+            log.error(f"Step failed at {setpoint} RPM")
+            return None
+        self._last_speed_ref = setpoint
+        return setpoint
+
+    def _set_speed_stepwise(self, target_rpm: int, motor_index: int = 1, step_size: int = 500, step_delay: float = 0.2) -> bool:
+        """
+        Step-wise speed transition as fallback when RAW ramp fails (blocking; the
+        motor service streams the same steps from a timer via RampExecutor).
+        The operation budget applies per step: a large change takes many steps.
+        """
+        current = self._last_speed_ref or 0
+        log.info(f"Step-wise transition: {current} → {target_rpm} RPM in {step_size} RPM steps")
         
-        for step in range(steps):
-            intermediate = current + (direction * step_size * (step + 1))
-            if not self._set_speed_instant(intermediate, motor_index):
-                log.error(f"Step failed at {intermediate} RPM")
+        while True:
+            if self._deadline is not None:
+                self._deadline.restart(self.timeouts["operation"])
+            setpoint = self.step_speed_toward(target_rpm, motor_index, step_size)
+            if setpoint is None:
                 return False
+            if setpoint == target_rpm:
+                return True
             time.sleep(step_delay)
-        
-        # Final target
-        return self._set_speed_instant(target_rpm, motor_index)
 
-      
     def _set_speed_instant(self, rpm: int, motor_index: int = 1) -> bool:
         """
         Set speed instantly (used only as fallback)
         """
-        wire_motor = max(0, motor_index - 1)
-        rpm_i32 = int(rpm)
-        data4 = struct.pack('<i', rpm_i32)
-        
-        speed_ref_reg = MC_REG_SPEED_REF_BASE | (motor_index & MOTOR_MASK)
-        reg_lo = speed_ref_reg & 0xFF
-        reg_hi = (speed_ref_reg >> 8) & 0xFF
-        
-        log.debug(f"Set speed instant: {rpm} RPM (reg=0x{speed_ref_reg:04X})")
+        log.debug(f"Set speed instant: {rpm} RPM (reg=0x{MC_REG_SPEED_REF_BASE | (motor_index & MOTOR_MASK):04X})")
         
-        formats = [
-            bytes([MCP_CMD_WRITE_REG, wire_motor, reg_lo, reg_hi]) + data4,
-            bytes([wire_motor, MCP_CMD_WRITE_REG, reg_lo, reg_hi]) + data4,
-            bytes([wire_motor, MCP_CMD_WRITE_REG, 0x01, reg_lo, reg_hi]) + data4,
-        ]
-        
-        for idx, p in enumerate(formats, 1):
-            if self._send_data_command(p, f"SetSpeed_{idx}", expect_data=False, allow_ack_only=True):
-                log.debug(f"Speed set (format {idx})")
-                return True
-            time.sleep(0.02)
+        if self._send_with_layouts("speed_ref", speed_ref_payloads(rpm, motor_index), "SetSpeed", 0.02,
+                                   expect_data=False, allow_ack_only=True):
+            log.debug(f"Speed set (format {self.get_layout('speed_ref')})")
+            return True
         
         log.error("ERROR: Speed set failed")
         return False
@@ -701,12 +1608,12 @@ class ASPEPClient:
 
     def stop_ramp(self, motor_index: int = 1):
         """Stop ramp"""
-        if not self.handshake(): return False
+        if not self._ensure_link(): return False
         return self._send_data_command(bytes([motor_index, CMD_STOP_RAMP]), "StopRamp", expect_data=False)
 
     def ramp_status(self, motor_index: int = 1):
         """Check ramp status"""
-        if not self.handshake(): return False
+        if not self._ensure_link(): return False
         ok = self._send_data_command(
             bytes([motor_index, CMD_RAMP_STATUS]),
             "RampStatus",
@@ -720,105 +1627,55 @@ class ASPEPClient:
         return False
 
     # =========== ========== ========== =================== REGISTER READING ============= ========== ========== ========== ========== ========== ======
-    def poll_speed(self, motor_index: int = 1, repeat: int = 5, delay: float = 0.5) -> None:
-        """Poll speed using WORKING MCP format"""
-        
-        speed_reg = MC_REG_SPEED_MEAS_BASE | (motor_index & MOTOR_MASK)
-        
-        log.info(f"Polling speed (reg=0x{speed_reg:04X})...")
-        
-        mcp_header = GET_DATA_ELEMENT | (motor_index & MOTOR_MASK)
-        
-        log.info(f"    MCP header: cmd=0x{GET_DATA_ELEMENT:02X} | motor={motor_index} = 0x{mcp_header:04X}")
-        
-        for i in range(repeat):
-            payload = mcp_header.to_bytes(2, 'little') + speed_reg.to_bytes(2, 'little')
-            
-            log.info(f"Poll_{i+1}: {hx(payload)}")
-            
-            ok = self._send_data_command(
-                payload,
-                f"POLL_SPEED_{i+1}",
-                expect_data=True,
-                allow_ack_only=True,
-                data_timeout=1.0
-            )
-            
-            if ok and self.last_data_payload:
-                raw = self.last_data_payload
-                log.info(f"Response: {len(raw)}B = {hx(raw)}")
-                
-                if len(raw) >= 4:
-                    speed_val = int.from_bytes(raw[:4], 'little', signed=True)
-                    percentage = self.rpm_to_percentage(speed_val)
-                    log.info(f"Speed: {speed_val} RPM = {percentage}% (ref={self._last_speed_ref})")
-                    time.sleep(delay)
-                    break
-                elif len(raw) == 1:
-                    log.error(f"ERROR: MCP Error: 0x{raw[0]:02X}")
-                else:
-                    log.warning(f"WARNING: Unexpected {len(raw)} bytes")
-            
-            time.sleep(delay)
+    def poll_speed(self, motor_index: int = 1, repeat: int = 5, delay: float = 0.5) -> Optional[int]:
+        """Read the measured speed (up to `repeat` attempts); returns RPM"""
+        for attempt in range(repeat):
+            speed_val = self.read_register("speed_meas", motor_index)
+            if speed_val is not None:
+                log.debug("Speed: %d RPM = %d%% (ref=%s)", speed_val, self.rpm_to_percentage(speed_val),
+                          self._last_speed_ref)
+                return speed_val
+            if attempt < repeat - 1:
+                time.sleep(delay)
+        return None
 
     def read_faults(self, motor_index: int = 1) -> Optional[int]:
-        """Read motor fault flags using WORKING MCP format"""
-        if not self.handshake():
-            return None
-        
-        faults_reg = MC_REG_FAULTS_BASE | (motor_index & MOTOR_MASK)
-        mcp_header = GET_DATA_ELEMENT | (motor_index & MOTOR_MASK)
-        
-        payload = mcp_header.to_bytes(2, 'little') + faults_reg.to_bytes(2, 'little')
-        
-        log.info(f"Reading Faults (reg=0x{faults_reg:04X})")
-        log.info(f"Read Faults: {hx(payload)}")
-        
-        ok = self._send_data_command(
-            payload,
-            "READ_FAULTS",
-            expect_data=True,
-            allow_ack_only=True,
-            data_timeout=1.0
-        )
+        """Read motor fault flags"""
+        fault_flags = self.read_register("faults", motor_index)
+        if fault_flags is not None:
+            self._on_fault_flags(fault_flags)
+        return fault_flags
+
+    def _on_fault_flags(self, fault_flags: int) -> None:
+        """Log fault changes once and dump the flight recorder when a new fault appears"""
+        previous, self._last_fault_flags = self._last_fault_flags, fault_flags
+        if fault_flags == previous:
+            return
+        if fault_flags == 0:
+            log.info("No faults detected - System OK")
+            return
         
-        if ok and self.last_data_payload:
-            raw = self.last_data_payload
-            log.info(f"Response: {len(raw)}B = {hx(raw)}")
-            
-            if len(raw) >= 4:
-                fault_flags = int.from_bytes(raw[:4], 'little', signed=False)
-                log.info(f"Fault Flags: 0x{fault_flags:08X} (decimal: {fault_flags})")
-                
-                if fault_flags == 0:
-                    log.info(f"No faults detected - System OK")
-                else:
-                    active_faults = []
-                    for bit_value, fault_name in FAULT_NAMES.items():
-                        if fault_flags & bit_value:
-                            active_faults.append(fault_name)
-                    
-                    if active_faults:
-                        log.warning(f"Active Faults: {', '.join(active_faults)}")
-                        print("\n" + "="*70)
-                        print("FAULT DETAILS:")
-                        for fault in active_faults:
-                            print(f"   * {fault}")
-                        print("="*70 + "\n")
-                    else:
-                        log.info(f"WARNING: Unknown fault bits set: 0x{fault_flags:08X}")
-                
-                return fault_flags
-            elif len(raw) == 1:
-                log.error(f"ERROR: MCP Error: 0x{raw[0]:02X}")
+        active_faults = [name for bit, name in FAULT_NAMES.items() if fault_flags & bit]
+        if active_faults:
+            log.warning(f"Active Faults (0x{fault_flags:08X}): {', '.join(active_faults)}")
+        else:
+            log.warning(f"WARNING: Unknown fault bits set: 0x{fault_flags:08X}")
         
-        return None
+        if fault_flags & ~previous:
+            path = self.recorder.dump(reason="fault")
+            if path:
+                log.warning(f"Flight recorder dumped to {path}")
 
+    def dump_flight_recorder(self, path: Optional[str] = None) -> Optional[str]:
+        """Write the last TX/RX frames to a binary capture file on demand"""
+        return self.recorder.dump(path)
+
+    @bounded_operation
     def fault_acknowledge(self, motor_index: int = 1) -> bool:
         """
         Acknowledge/clear motor faults using FAULT_ACK command
         """
-        if not self.handshake():
+        if not self._ensure_link():
             return False
         
         mcp_header = FAULT_ACK | (motor_index & MOTOR_MASK)
@@ -839,7 +1696,7 @@ class ASPEPClient:
             log.info("Fault acknowledge sent successfully")
             
             # Read faults again to verify they're cleared
-            time.sleep(0.1)
+            time.sleep(self._capped(0.1))
             log.info("Verifying faults cleared...")
             remaining_faults = self.read_faults(motor_index)
             
@@ -854,88 +1711,132 @@ class ASPEPClient:
         log.error("ERROR: Fault acknowledge failed")
         return False
 
-    def read_status(self, motor_index: int = 1):
-        """Read motor status (8-bit register)"""
-        if not self.handshake():
-            return None
-        
-        status_reg = MC_REG_STATUS_BASE | (motor_index & MOTOR_MASK)
-        mcp_header = GET_DATA_ELEMENT | (motor_index & MOTOR_MASK)
-        
-        payload = mcp_header.to_bytes(2, 'little') + status_reg.to_bytes(2, 'little')
-        
-        log.info(f"Reading Status (reg=0x{status_reg:04X})")
-        
-        ok = self._send_data_command(
-            payload,
-            "READ_STATUS",
-            expect_data=True,
-            allow_ack_only=True,
-            data_timeout=1.0
-        )
-        
-        if ok and self.last_data_payload:
-            raw = self.last_data_payload
-            
-            if len(raw) >= 1:
-                status = raw[0]
-                
-                status_names = {
-                    0: "IDLE",
-                    1: "IDLE_ALIGNMENT",
-                    2: "ALIGNMENT",
-                    3: "IDLE_START",
-                    4: "START",
-                    5: "START_RUN",
-                    6: "RUN",
-                    7: "ANY_STOP",
-                    8: "STOP",
-                    9: "STOP_IDLE",
-                    10: "FAULT_NOW",
-                    11: "FAULT_OVER",
-                }
-                
-                status_name = status_names.get(status, f"UNKNOWN({status})")
-                log.info(f"Motor State: {status_name}")
-                
-                return status
-        
-        return None
+    def read_status(self, motor_index: int = 1) -> Optional[int]:
+        """Read motor state machine state (8-bit register)"""
+        status = self.read_register("status", motor_index)
+        if status is not None:
+            log.info(f"Motor State: {MOTOR_STATE_NAMES.get(status, f'UNKNOWN({status})')}")
+        return status
 
-    def read_bus_voltage(self, motor_index: int = 1):
+    def read_bus_voltage(self, motor_index: int = 1) -> Optional[int]:
         """Read bus voltage (16-bit register)"""
-        if not self.handshake():
+        voltage = self.read_register("bus_voltage", motor_index)
+        if voltage is not None:
+            log.info(f"Bus Voltage: {voltage} (raw units)")
+        return voltage
+
+    def read_heatsink_temp(self, motor_index: int = 1) -> Optional[int]:
+        """Read heatsink temperature (16-bit register)"""
+        temp = self.read_register("heatsink_temp", motor_index)
+        if temp is not None:
+            log.info(f"Heatsink Temperature: {temp} C")
+        return temp
+
+    def _read_values(self, bases: List[int], motor_index: int) -> Optional[bytes]:
+        """Raw value bytes of one GET_DATA_ELEMENT for base IDs (None if missing or short)"""
+        if not self._ensure_link():
             return None
         
-        voltage_reg = MC_REG_BUS_VOLTAGE_BASE | (motor_index & MOTOR_MASK)
-        mcp_header = GET_DATA_ELEMENT | (motor_index & MOTOR_MASK)
-        
-        payload = mcp_header.to_bytes(2, 'little') + voltage_reg.to_bytes(2, 'little')
-        
-        log.info(f"Reading Bus Voltage (reg=0x{voltage_reg:04X})")
-        
         ok = self._send_data_command(
-            payload,
-            "READ_BUS_VOLTAGE",
+            registers_request(bases, motor_index),
+            "READ_REGISTERS",
             expect_data=True,
             allow_ack_only=True,
             data_timeout=1.0
         )
+        if not ok or not self.last_data_payload:
+            return None
         
-        if ok and self.last_data_payload:
-            raw = self.last_data_payload
-            
-            if len(raw) >= 2:
-                voltage = int.from_bytes(raw[:2], 'little', signed=False)
-                log.info(f"Bus Voltage: {voltage} (raw units)")
-                return voltage
+        raw = self.last_data_payload
+        expected = register_struct(tuple(bases)).size
+        if len(raw) < expected:
+            if len(raw) == 1:
+                log.error(f"ERROR: MCP Error: 0x{raw[0]:02X}")
+            else:
+                log.warning(f"WARNING: READ_REGISTERS got {len(raw)}B, expected {expected}B")
+            return None
+        return raw
+
+    @bounded_operation
+    def read_registers(self, registers: Iterable[int], motor_index: int = 1) -> Optional[Dict[int, int]]:
+        """
+        Read several registers with ONE GET_DATA_ELEMENT request.
+        `registers` are base IDs (motor bits are filled in); returns {base_id: value}.
+        """
+        bases = [r & REG_MASK for r in registers]
+        if not bases:
+            return {}
+        raw = self._read_values(bases, motor_index)
+        return decode_registers(bases, raw) if raw is not None else None
+
+    def read_named(self, names: Iterable[str], motor_index: int = 1) -> Optional[Dict[str, int]]:
+        """Read REGISTER_TABLE entries by name in one transaction; returns {name: value}"""
+        names = list(names)
+        values = self.read_registers([REGISTERS[name].base for name in names], motor_index)
+        if values is None:
+            return None
+        return {name: values[REGISTERS[name].base] for name in names}
+
+    def read_register(self, name: str, motor_index: int = 1) -> Optional[int]:
+        """Read one REGISTER_TABLE entry by name"""
+        values = self.read_registers([REGISTERS[name].base], motor_index)
+        return values[REGISTERS[name].base] if values else None
+
+    @bounded_operation
+    def read_telemetry(self, motor_index: int = 1) -> Optional[TelemetrySnapshot]:
+        """Faults, speed, reference, status, bus voltage and heatsink temperature in one transaction"""
+        raw = self._read_values(list(TELEMETRY_REG_BASES), motor_index)
+        if raw is None:
+            return None
+        snapshot = decode_telemetry(raw)
+        self._on_fault_flags(snapshot.faults)
+        return snapshot
+
+    # ====== ========== ========== ========== ============== ASYNC DATALOG ========== ========== ========== ========== ==========
+    @bounded_operation
+    def subscribe_datalog(self, registers: Iterable[int], rate_hz: float,
+                          on_sample: Optional[Callable[[float, int, Dict[int, int]], None]] = None,
+                          buffer_len: int = 1024, motor_index: int = 1) -> Optional[DatalogSubscription]:
+        """
+        Configure the performer's MCP datalog to push `registers` (base IDs) at rate_hz
+        as ASPEP ASYNC packets. Records land in the returned subscription's ring buffer
+        and on_sample(host_time, ticks, values), called on the port owner's thread.
+        """
+        if not self._ensure_link():
+            return None
+        if self.ctrl_caps.txa_max == 0:
+            log.error("ERROR: Performer does not support ASYNC packets (txa_max=0)")
+            return None
         
-        return None
+        sub = DatalogSubscription(list(registers), rate_hz, on_sample, buffer_len)
+        if not self._write_async_config(sub.config_payload(motor_index), motor_index, "DATALOG_START"):
+            return None
+        self.datalog = sub
+        log.info(f"Datalog: {len(sub.registers)} registers @ {sub.rate_hz:.1f} Hz ({sub.record_size}B records)")
+        return sub
+
+    @bounded_operation
+    def unsubscribe_datalog(self, motor_index: int = 1) -> bool:
+        """Stop the datalog stream"""
+        if not self.datalog:
+            return True
+        if not self._ensure_link():
+            return False
+        cfg = struct.pack('<HBBBBB', 0, 0, 0, 0, 0, self.datalog.mark)
+        ok = self._write_async_config(cfg, motor_index, "DATALOG_STOP")
+        self.datalog = None
+        return ok
+
+    def _write_async_config(self, cfg: bytes, motor_index: int, label: str) -> bool:
+        """SET_DATA_ELEMENT on MC_REG_ASYNC_UARTA (RAW register write)"""
+        motor = motor_index & MOTOR_MASK
+        payload = struct.pack('<HHH', SET_DATA_ELEMENT | motor, MC_REG_ASYNC_UARTA_BASE | motor, len(cfg)) + cfg
+        return self._send_data_command(payload, label, expect_data=False, allow_ack_only=True, data_timeout=1.0)
 
     # ====== ========== ========== ========== ============== DIAGNOSTICS ========== ========== ========== ========== ==========
     def diagnostics(self, motor_index: int = 1):
         """Run comprehensive diagnostics"""
-        if not self.handshake():
+        if not self._ensure_link():
             return
         
         print("\n" + "="*70)
@@ -953,6 +1854,8 @@ class ASPEPClient:
         
         print("\nReading Fault Flags...")
         faults = self.read_faults(motor_index)
+        if faults is not None:
+            print(f"  Fault Flags: 0x{faults:08X}")
         
         if faults and faults != 0:
             print("\nNOTE: Faults detected! You can clear them with 'a' command (FAULT_ACK)")
@@ -960,27 +1863,56 @@ class ASPEPClient:
         print("\nReading Bus Voltage...")
         self.read_bus_voltage(motor_index)
         
+        print("\nReading Heatsink Temperature...")
+        self.read_heatsink_temp(motor_index)
+        
         print("\nReading Speed...")
-        self.poll_speed(motor_index, repeat=1)
+        speed_val = self.poll_speed(motor_index, repeat=1)
+        if speed_val is not None:
+            print(f"  Speed: {speed_val} RPM ({self.rpm_to_percentage(speed_val)}%)")
         
         print("\n" + "="*70)
 
-    def sniff(self, seconds: float = 2.0):
-        """Sniff raw data"""
-        if not self.ser: return
-        
-        log.info(f"Sniffing {seconds}s...")
-        end = time.time() + seconds
-        raw = b''
-        
-        while time.time() < end:
-            chunk = self.ser.read(self.ser.in_waiting or 1)
-            if chunk: raw += chunk
-        
-        if raw:
-            log.info(f"Data: {len(raw)}B: {hx(raw[:128])}")
+    def sniff(self, seconds: float = 2.0, path: Optional[str] = None) -> Optional[str]:
+        """Decode raw line traffic for `seconds`; optionally record it to a capture file"""
+        if not self.ser: return None
+        from hardware.aspep_capture import CaptureWriter, ProtocolAnalyzer
+        from hardware.flight_recorder import DIR_RX
+
+        analyzer = ProtocolAnalyzer()
+        writer = CaptureWriter(path) if path else None
+        log.info(f"Sniffing {seconds}s..." + (f" -> {path}" if path else ""))
+        end = time.monotonic() + seconds
+        pending = self._rx_take(self._rx_available())
+        total = 0
+        try:
+            while True:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    break
+                if pending:
+                    chunk, pending = pending, b''
+                elif self._wait_readable(remaining):
+                    chunk = self.ser.read(self.ser.in_waiting or 1)
+                else:
+                    continue
+                if not chunk:
+                    continue
+                t_ns = time.monotonic_ns()
+                total += len(chunk)
+                if writer:
+                    writer.write(DIR_RX, chunk, t_ns)
+                for line in analyzer.feed(t_ns, DIR_RX, chunk):
+                    log.info(f"  {line}")
+        finally:
+            if writer:
+                writer.close()
+
+        if total:
+            log.info(f"Data: {total}B, {analyzer.summary()}")
         else:
             log.info("No data")
+        return path
 
 # ========== ========== ==== ================ ==================== CLI ============ ========== ========== ==================
 def main():
@@ -996,18 +1928,41 @@ def main():
     parser.add_argument("--motor", type=int, default=1, help="Motor index")
     parser.add_argument("--max-speed", type=int, default=6000, help="Maximum speed in RPM")
     parser.add_argument("--acceleration", type=float, default=1000.0, help="Acceleration in RPM/s")
+    parser.add_argument("--config", default=None, help="motor_config.json to load/store learned payload layouts")
+    parser.add_argument("--fast-baud", action="store_true",
+                        help="Negotiate a faster UART rate after handshake (needs firmware baud register)")
+    parser.add_argument("--script", default=None,
+                        help="Batch mode: run this command script ('-' = stdin) and print JSON lines "
+                             "(see hardware/uart_script.py)")
+    parser.add_argument("--output", default=None, help="Batch mode: write JSON lines here instead of stdout")
+    parser.add_argument("--stop-on-error", action="store_true", help="Batch mode: end at the first failure")
     parser.add_argument("--debug", action="store_true", help="Debug mode")
     
     args = parser.parse_args()
     
     if args.debug:
         log.setLevel(logging.DEBUG)
+    elif args.script:
+        log.setLevel(logging.WARNING)  # Keep stderr quiet; results are in the JSON lines
     
-    client = ASPEPClient(args.port, args.baud)
+    client = ASPEPClient(args.port, args.baud, config_path=args.config)
+    if args.fast_baud:
+        client.baud_negotiation["enabled"] = True
     client.set_max_speed(args.max_speed)
     client.set_acceleration(args.acceleration)
     motor = args.motor
     
+    if args.script:
+        from hardware.uart_script import ScriptError, run_script
+        try:
+            ok = run_script(args.script, client, args.output, motor, args.stop_on_error)
+        except ScriptError as e:
+            print(f"Script error: {e}", file=sys.stderr)
+            sys.exit(2)
+        finally:
+            client.close()
+        sys.exit(0 if ok else 1)
+    
     try:
         client.open()
         
@@ -1070,7 +2025,8 @@ def main():
                     client.set_speed_unit(unit)
                 elif cmd == 'sn':
                     sec = float(input("  Seconds: ") or "2")
-                    client.sniff(sec)
+                    path = input("  Capture file (blank = none): ").strip() or None
+                    client.sniff(sec, path)
                 elif cmd == 'q':
                     break
                 else:
@@ -1085,3 +2041,7 @@ def main():
     finally:
         client.close()
         print("\nGoodbye!\n")
+
+
+if __name__ == "__main__":
+    main()
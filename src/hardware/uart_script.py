@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+UART Script - batch mode for the uart_manager CLI
+
+Runs a text script of ASPEP/MCP commands against one controller and writes one
+JSON line per command (per sample for poll/sweep) with its latency, so field
+diagnostics and stress runs are repeatable over SSH. Periodic commands run on
+absolute deadlines (no drift); `lag_ms` is how late a sample started. The whole
+script is parsed before the port is opened, and a motor started by the script
+is stopped again if the run ends early. Exit status: 0 when every command
+succeeded, 1 when one failed or the port could not be opened (the error is a
+JSON line too), 2 for a script error.
+
+Script syntax (one command per line, # starts a comment):
+    handshake                   ping                     name
+    start                       stop                     estop [timeout_s]
+    speed <rpm | N%>            ramp <rpm> [duration_ms]
+    faults                      ack                      telemetry
+    read <register> [...]       wait <seconds>
+    poll <count> <rate_hz> [register ...]     # telemetry unless registers given
+    sweep <from_rpm> <to_rpm> <step_rpm> <dwell_s>
+    repeat <n> ... end                        # blocks may nest
+
+Usage (from src/):
+    python -m hardware.uart_script diag.txt --port /dev/ttyS0
+    python -m hardware.uart_script stress.txt --sim --output run.jsonl
+    python -m hardware.uart_manager --script diag.txt       # same, via the CLI
+    echo "handshake
+    poll 50 10" | python -m hardware.uart_script -
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, IO, List, Optional, Tuple
+
+from hardware.uart_manager import REGISTERS, ASPEPClient, log as aspep_log
+
+# name -> (min args, max args (None: any), usage)
+COMMANDS: Dict[str, Tuple[int, Optional[int], str]] = {
+    "handshake": (0, 0, "handshake"),
+    "ping":      (0, 0, "ping"),
+    "name":      (0, 0, "name"),
+    "start":     (0, 0, "start"),
+    "stop":      (0, 0, "stop"),
+    "estop":     (0, 1, "estop [timeout_s]"),
+    "speed":     (1, 1, "speed <rpm | N%>"),
+    "ramp":      (1, 2, "ramp <rpm> [duration_ms]"),
+    "faults":    (0, 0, "faults"),
+    "ack":       (0, 0, "ack"),
+    "telemetry": (0, 0, "telemetry"),
+    "read":      (1, None, "read <register> [...]"),
+    "wait":      (1, 1, "wait <seconds>"),
+    "poll":      (2, None, "poll <count> <rate_hz> [register ...]"),
+    "sweep":     (4, 4, "sweep <from_rpm> <to_rpm> <step_rpm> <dwell_s>"),
+    "repeat":    (1, 1, "repeat <n> ... end"),
+}
+
+
+class ScriptError(ValueError):
+    """Syntax error in a command script (carries the line number)"""
+
+
+@dataclass
+class ScriptCommand:
+    """One parsed script line (repeat blocks hold their commands in body)"""
+    line: int
+    name: str
+    args: List[str]
+    body: List["ScriptCommand"] = field(default_factory=list)
+
+
+# ====== PARSING ======
+def _number(cmd: ScriptCommand, index: int, kind: Callable = float, minimum: Optional[float] = None):
+    """Argument `index` of cmd as a number (ScriptError if it is not one)"""
+    text = cmd.args[index]
+    try:
+        value = kind(text)
+    except ValueError:
+        raise ScriptError(f"line {cmd.line}: {cmd.name}: '{text}' is not a number "
+                          f"(usage: {COMMANDS[cmd.name][2]})") from None
+    if minimum is not None and value < minimum:
+        raise ScriptError(f"line {cmd.line}: {cmd.name}: {text} must be >= {minimum}")
+    return value
+
+
+def _validate(cmd: ScriptCommand) -> None:
+    low, high, usage = COMMANDS[cmd.name]
+    if len(cmd.args) < low or (high is not None and len(cmd.args) > high):
+        raise ScriptError(f"line {cmd.line}: usage: {usage}")
+    if cmd.name == "speed":
+        value = cmd.args[0][:-1] if cmd.args[0].endswith("%") else cmd.args[0]
+        if not value.lstrip("-").isdigit() or (value != cmd.args[0] and not 0 <= int(value) <= 100):
+            raise ScriptError(f"line {cmd.line}: usage: {COMMANDS['speed'][2]} (percent 0-100)")
+    elif cmd.name in ("ramp", "sweep"):
+        for i in range(len(cmd.args)):
+            _number(cmd, i, float if (cmd.name, i) == ("sweep", 3) else int)
+        if cmd.name == "sweep" and int(cmd.args[2]) <= 0:
+            raise ScriptError(f"line {cmd.line}: sweep: step_rpm must be > 0")
+    elif cmd.name in ("estop", "wait"):
+        for i in range(len(cmd.args)):
+            _number(cmd, i, float, 0)
+    elif cmd.name == "repeat":
+        _number(cmd, 0, int, 0)
+    elif cmd.name == "poll":
+        _number(cmd, 0, int, 1)
+        if _number(cmd, 1, float) <= 0:
+            raise ScriptError(f"line {cmd.line}: poll: rate_hz must be > 0")
+    names = cmd.args[2:] if cmd.name == "poll" else cmd.args if cmd.name == "read" else []
+    unknown = [n for n in names if n not in REGISTERS]
+    if unknown:
+        raise ScriptError(f"line {cmd.line}: unknown register(s) {', '.join(unknown)} "
+                          f"(known: {', '.join(REGISTERS)})")
+
+
+def parse_script(text: str) -> List[ScriptCommand]:
+    """Parse and validate a whole script (raises ScriptError before anything is sent)"""
+    root: List[ScriptCommand] = []
+    stack: List[ScriptCommand] = []
+    for number, raw in enumerate(text.splitlines(), 1):
+        words = raw.split("#", 1)[0].split()
+        if not words:
+            continue
+        name, args = words[0].lower(), words[1:]
+        if name == "end":
+            if not stack:
+                raise ScriptError(f"line {number}: 'end' without 'repeat'")
+            stack.pop()
+            continue
+        if name not in COMMANDS:
+            raise ScriptError(f"line {number}: unknown command '{words[0]}' (known: {', '.join(COMMANDS)})")
+        cmd = ScriptCommand(number, name, args)
+        _validate(cmd)
+        (stack[-1].body if stack else root).append(cmd)
+        if name == "repeat":
+            stack.append(cmd)
+    if stack:
+        raise ScriptError(f"line {stack[-1].line}: 'repeat' without 'end'")
+    return root
+
+
+# ====== EXECUTION ======
+class _Abort(Exception):
+    """Ends a run early (stop_on_error)"""
+
+
+class ScriptRunner:
+    """Runs parsed commands on an open ASPEPClient and writes JSON lines to `out`"""
+
+    def __init__(self, client: ASPEPClient, out: IO[str], motor: int = 1, stop_on_error: bool = False):
+        self.client = client
+        self.out = out
+        self.motor = motor
+        self.stop_on_error = stop_on_error
+        self.commands = 0
+        self.failures = 0
+        self.motor_started = False
+        self._t0 = time.perf_counter()
+        self._handlers: Dict[str, Callable[[ScriptCommand], None]] = {
+            "handshake": lambda c: self._timed(c, self.client.handshake, lambda: {"baud": self.client.baud}),
+            "ping": lambda c: self._timed(c, self.client.ping),
+            "name": lambda c: self._timed(c, self.client.request_name, self._name_result),
+            "start": self._start,
+            "stop": self._stop,
+            "estop": self._estop,
+            "speed": self._speed,
+            "ramp": self._ramp,
+            "faults": lambda c: self._timed(c, lambda: self.client.read_faults(self.motor),
+                                            value_key="faults"),
+            "ack": lambda c: self._timed(c, lambda: self.client.fault_acknowledge(self.motor)),
+            "telemetry": lambda c: self._timed(c, lambda: self.client.read_telemetry(self.motor),
+                                               value_key="telemetry"),
+            "read": lambda c: self._timed(c, lambda: self.client.read_named(c.args, self.motor),
+                                          value_key="values"),
+            "wait": self._wait,
+            "poll": self._poll,
+            "sweep": self._sweep,
+            "repeat": self._repeat,
+        }
+
+    def run(self, commands: List[ScriptCommand]) -> bool:
+        """Run the script; True when every command succeeded"""
+        self._t0 = time.perf_counter()
+        try:
+            self._run_block(commands)
+        except _Abort:
+            pass
+        finally:
+            if self.motor_started:
+                self._emit(ScriptCommand(0, "stop", []), self.client.stop_motor(self.motor), None,
+                           reason="motor left running by the script")
+        self._emit(ScriptCommand(0, "summary", []), self.failures == 0, None, commands=self.commands,
+                   failures=self.failures, elapsed_s=round(time.perf_counter() - self._t0, 3))
+        return self.failures == 0
+
+    def _run_block(self, commands: List[ScriptCommand]) -> None:
+        for cmd in commands:
+            self._handlers[cmd.name](cmd)
+
+    # ------ output ------
+    def _emit(self, cmd: ScriptCommand, ok: bool, latency_ms: Optional[float], **fields) -> None:
+        record = {"t": round(time.perf_counter() - self._t0, 4), "line": cmd.line, "cmd": cmd.name,
+                  "ok": bool(ok)}
+        if latency_ms is not None:
+            record["latency_ms"] = round(latency_ms, 3)
+        record.update(fields)
+        self.out.write(json.dumps(record) + "\n")
+        self.out.flush()
+
+    def _record(self, cmd: ScriptCommand, ok: bool, latency_ms: Optional[float], **fields) -> None:
+        """Emit a command result and count it (stops the run on failure with stop_on_error)"""
+        self.commands += 1
+        if not ok:
+            self.failures += 1
+            if self.client.last_nack:
+                fields.setdefault("nack", True)
+        self._emit(cmd, ok, latency_ms, **fields)
+        if not ok and self.stop_on_error:
+            raise _Abort()
+
+    def _call(self, fn: Callable[[], object]) -> Tuple[object, float, Optional[str]]:
+        """fn() -> (result, latency ms, error text)"""
+        t0 = time.perf_counter()
+        try:
+            result, error = fn(), None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        return result, (time.perf_counter() - t0) * 1000, error
+
+    def _timed(self, cmd: ScriptCommand, fn: Callable[[], object],
+               extra: Optional[Callable[[], Dict]] = None, value_key: Optional[str] = None) -> object:
+        """Run one request; a None/False result is a failure"""
+        result, latency, error = self._call(fn)
+        ok = result is not None and result is not False and error is None
+        fields: Dict = {}
+        if error:
+            fields["error"] = error
+        if ok and value_key:
+            fields[value_key] = _jsonable(result)
+        if ok and extra:
+            fields.update(extra())
+        self._record(cmd, ok, latency, **fields)
+        return result if ok else None
+
+    def _name_result(self) -> Dict:
+        return {"name": self.client.last_data_payload.rstrip(b"\x00").decode(errors="ignore")}
+
+    @staticmethod
+    def _sleep_until(deadline: float) -> float:
+        """Sleep until the perf_counter deadline; returns how late we woke (ms, >= 0)"""
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        return max(0.0, (time.perf_counter() - deadline) * 1000)
+
+    # ------ commands ------
+    def _start(self, cmd: ScriptCommand) -> None:
+        if self._timed(cmd, lambda: self.client.start_motor(self.motor)):
+            self.motor_started = True
+
+    def _stop(self, cmd: ScriptCommand) -> None:
+        if self._timed(cmd, lambda: self.client.stop_motor(self.motor)):
+            self.motor_started = False
+
+    def _estop(self, cmd: ScriptCommand) -> None:
+        timeout = float(cmd.args[0]) if cmd.args else None
+        if self._timed(cmd, lambda: self.client.emergency_stop(self.motor, timeout)):
+            self.motor_started = False
+
+    def _speed(self, cmd: ScriptCommand) -> None:
+        arg = cmd.args[0]
+        rpm = self.client.percentage_to_rpm(int(arg[:-1])) if arg.endswith("%") else int(arg)
+        self._timed(cmd, lambda: self.client.set_speed_rpm(rpm, self.motor), lambda: {"target_rpm": rpm})
+
+    def _ramp(self, cmd: ScriptCommand) -> None:
+        rpm = int(cmd.args[0])
+        duration = int(cmd.args[1]) if len(cmd.args) > 1 else None
+        self._timed(cmd, lambda: self.client.ramp_speed_raw(rpm, self.motor, duration),
+                    lambda: {"target_rpm": rpm})
+
+    def _wait(self, cmd: ScriptCommand) -> None:
+        self._sleep_until(time.perf_counter() + float(cmd.args[0]))
+
+    def _poll(self, cmd: ScriptCommand) -> None:
+        count, period = int(cmd.args[0]), 1.0 / float(cmd.args[1])
+        names = cmd.args[2:]
+        if names:
+            fn, key = (lambda: self.client.read_named(names, self.motor)), "values"
+        else:
+            fn, key = (lambda: self.client.read_telemetry(self.motor)), "telemetry"
+        start = time.perf_counter()
+        for i in range(count):
+            lag = self._sleep_until(start + i * period)
+            result, latency, error = self._call(fn)
+            fields: Dict = {"i": i, "lag_ms": round(lag, 3)}
+            if error:
+                fields["error"] = error
+            if result is not None:
+                fields[key] = _jsonable(result)
+            self._record(cmd, result is not None, latency, **fields)
+
+    def _sweep(self, cmd: ScriptCommand) -> None:
+        low, high, step = (int(a) for a in cmd.args[:3])
+        dwell = float(cmd.args[3])
+        step = step if high >= low else -step
+        setpoints = list(range(low, high + (1 if step > 0 else -1), step))
+        if setpoints[-1] != high:
+            setpoints.append(high)
+        for setpoint in setpoints:
+            started = time.perf_counter()
+            ok, latency, error = self._call(lambda: self.client.set_speed_rpm(setpoint, self.motor))
+            self._sleep_until(started + dwell)
+            speed = self.client.read_register("speed_meas", self.motor) if ok else None
+            fields: Dict = {"setpoint_rpm": setpoint, "speed_meas": speed}
+            if error:
+                fields["error"] = error
+            self._record(cmd, bool(ok), latency, **fields)
+
+    def _repeat(self, cmd: ScriptCommand) -> None:
+        for _ in range(int(cmd.args[0])):
+            self._run_block(cmd.body)
+
+
+def _jsonable(value):
+    if hasattr(value, "__dataclass_fields__"):
+        return asdict(value)
+    if isinstance(value, dict):
+        return {str(k): v for k, v in value.items()}
+    return value
+
+
+# ====== CLI ======
+def run_script(path: str, client: ASPEPClient, output: Optional[str] = None, motor: int = 1,
+               stop_on_error: bool = False, handshake: bool = True) -> bool:
+    """
+    Parse the script at path ('-' = stdin) and run it on client (opened here, closed by the caller).
+    A handshake is prepended unless the script starts with one or handshake is False.
+    JSON lines go to output or stdout; the client's own console output is moved to stderr.
+    """
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(path) as f:
+            text = f.read()
+    commands = parse_script(text)
+    if handshake and (not commands or commands[0].name != "handshake"):
+        commands.insert(0, ScriptCommand(0, "handshake", []))
+    out = open(output, "w") if output else sys.stdout
+    try:
+        runner = ScriptRunner(client, out, motor, stop_on_error)
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                client.open()
+            except OSError as e:  # serial.SerialException included: missing or busy port
+                runner._emit(ScriptCommand(0, "open", []), False, None, port=client.port,
+                             error=f"{type(e).__name__}: {e}")
+                return False
+            return runner.run(commands)
+    finally:
+        if output:
+            out.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run an ASPEP/MCP command script, JSON lines out")
+    parser.add_argument("script", help="Command script ('-' = stdin)")
+    parser.add_argument("--port", default=os.environ.get("CONZERO_UART_PORT", "/dev/ttyS0"))
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--motor", type=int, default=1)
+    parser.add_argument("--config", default=None, help="motor_config.json with learned payload layouts")
+    parser.add_argument("--output", default=None, help="Write JSON lines here instead of stdout")
+    parser.add_argument("--stop-on-error", action="store_true", help="End the run at the first failure")
+    parser.add_argument("--no-handshake", action="store_true",
+                        help="Do not handshake before the first command")
+    parser.add_argument("--sim", action="store_true", help="Run against the pty simulator")
+    parser.add_argument("--sim-latency-ms", type=float, default=1.0, help="Simulator turnaround latency")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    aspep_log.setLevel(logging.DEBUG if args.debug else logging.WARNING)  # Logs go to stderr
+
+    sim = None
+    port = args.port
+    if args.sim:
+        from hardware.aspep_simulator import ASPEPSimulator, SimulatorConfig
+        sim = ASPEPSimulator(SimulatorConfig(latency_ms=args.sim_latency_ms, seed=0)).start()
+        port = sim.port
+
+    client = ASPEPClient(port, args.baud, config_path=args.config)
+    try:
+        ok = run_script(args.script, client, args.output, args.motor, args.stop_on_error,
+                        handshake=not args.no_handshake)
+    except ScriptError as e:
+        print(f"Script error: {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        client.close()
+        if sim:
+            sim.stop()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+UART I/O Worker
+Single owner thread for the motor serial port.
+
+Every ASPEPClient transaction is queued here and executed in order on one
+background thread, so callers (the Tk main loop in particular) never block
+on /dev/ttyS0. Each submission returns a concurrent.futures.Future.
+
+Jobs carry a priority class and the queue is served highest class first
+(FIFO within a class): safety (stop, fault ack) before control (start, speed)
+before telemetry polls, so a poll backlog never delays a stop. submit_after()
+queues a job for later without holding the thread in between (timer-driven
+sequences such as speed ramps). An optional on_idle hook runs at least every
+idle_interval seconds (link keepalive / reconnect).
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+# Priority classes (lower runs first)
+PRIORITY_SAFETY = 0
+PRIORITY_CONTROL = 1
+PRIORITY_TELEMETRY = 2
+_PRIORITY_WAKE = -1   # No-op that re-arms the runner's wait
+_PRIORITY_STOP = 99   # After everything already queued
+
+
+class UARTWorker:
+    """Runs queued serial-port jobs on a dedicated thread"""
+
+    def __init__(self, name: str = "MotorUART", idle_interval: float = 0.1,
+                 on_idle: Optional[Callable[[], None]] = None) -> None:
+        self._name = name
+        self._queue: "queue.PriorityQueue[tuple]" = queue.PriorityQueue()  # (priority, seq, job)
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._idle_interval = idle_interval
+        self._on_idle = on_idle
+        self._timers: list = []  # heap of (due, seq, priority, job)
+        self._timer_lock = threading.Lock()
+        self._timer_seq = itertools.count()
+
+    # Public API
+    def start(self) -> None:
+        """Start the worker thread (no-op if already running)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) as a control job and return its Future"""
+        return self.submit_priority(PRIORITY_CONTROL, fn, *args, **kwargs)
+
+    def submit_priority(self, priority: int, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) in the given priority class and return its Future"""
+        future: Future = Future()
+        if not self.is_running():
+            future.set_exception(RuntimeError(f"{self._name} worker is not running"))
+            return future
+        self._put(priority, (future, fn, args, kwargs))
+        return future
+
+    def preempt(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Cancel every queued and timed job, then queue fn(*args, **kwargs) as the next
+        safety job. The job already running is not touched (see ASPEPClient.abort).
+        """
+        dropped = []
+        while True:
+            try:
+                dropped.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._cancel_timers()
+        future = self.submit_priority(PRIORITY_SAFETY, fn, *args, **kwargs)
+        for item in dropped:
+            if item[2]:
+                item[2][0].cancel()
+            else:
+                self._queue.put(item)  # Keep wake-ups and the stop sentinel
+        return future
+
+    def submit_after(self, delay: float, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) as a control job once delay seconds have passed"""
+        future: Future = Future()
+        if not self.is_running():
+            future.set_exception(RuntimeError(f"{self._name} worker is not running"))
+            return future
+        with self._timer_lock:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._timer_seq), PRIORITY_CONTROL,
+                                          (future, fn, args, kwargs)))
+        self._put(_PRIORITY_WAKE, ())  # Re-arm the runner's wait for the new timer
+        return future
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def in_worker_thread(self) -> bool:
+        """True when called from the worker thread itself"""
+        return threading.current_thread() is self._thread
+
+    def stop(self, timeout: float = 3.0) -> None:
+        """Finish queued jobs, then stop the worker thread"""
+        if not self.is_running():
+            return
+        self._put(_PRIORITY_STOP, None)
+        if not self.in_worker_thread():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    # Internal runner
+    def _put(self, priority: int, job: Optional[tuple]) -> None:
+        self._queue.put((priority, next(self._seq), job))
+
+    def _next_wait(self) -> Optional[float]:
+        """Queue wait: until the next timer or idle tick, whichever comes first"""
+        wait = self._idle_interval if self._on_idle else None
+        with self._timer_lock:
+            if self._timers:
+                until_timer = max(0.0, self._timers[0][0] - time.monotonic())
+                wait = until_timer if wait is None else min(wait, until_timer)
+        return wait
+
+    def _release_due_timers(self) -> None:
+        """Move due timer jobs into the queue, where they wait their turn by priority"""
+        now = time.monotonic()
+        with self._timer_lock:
+            while self._timers and self._timers[0][0] <= now:
+                _, _, priority, job = heapq.heappop(self._timers)
+                self._put(priority, job)
+
+    def _cancel_timers(self) -> None:
+        with self._timer_lock:
+            timers, self._timers = self._timers, []
+        for _, _, _, (future, _, _, _) in timers:
+            future.cancel()
+
+    @staticmethod
+    def _execute(job: tuple) -> None:
+        future, fn, args, kwargs = job
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+    def _run(self) -> None:
+        next_idle = time.monotonic() + self._idle_interval
+        while True:
+            self._release_due_timers()
+            try:
+                _, _, job = self._queue.get(timeout=self._next_wait())
+            except queue.Empty:
+                job = ()
+            if job is None:
+                self._cancel_timers()
+                break
+            if job:
+                self._execute(job)
+            if self._on_idle and time.monotonic() >= next_idle:
+                try:
+                    self._on_idle()
+                except Exception as e:
+                    print(f"[{self._name}] idle hook error: {e}")
+                next_idle = time.monotonic() + self._idle_interval
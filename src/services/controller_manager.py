@@ -0,0 +1,216 @@
+"""
+Controller Manager
+Drives several motor controller boards (one per jet) as one group
+
+Each port gets its own MotorService, and so its own UART worker thread. Group
+calls are fanned out to every worker at once and their Futures are combined, so
+one round trip costs the slowest board's latency, not the sum. The interface
+mirrors MotorService, so the UI can use either one.
+
+Ports come from CONZERO_UART_PORTS (comma-separated), falling back to
+CONZERO_UART_PORT:
+    CONZERO_UART_PORTS=/dev/ttyS0,/dev/ttyAMA1 python main.py
+
+With several boards, each one keeps its learned layouts and baud rate in its
+own file (motor_config.ttyS0.json, ...), since the boards may differ.
+"""
+
+import json
+import os
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence
+
+from core.config import PATHS
+from hardware.uart_manager import TelemetrySnapshot
+from services.motor_service import MotorService, ResultCallback
+
+
+def ports_from_env() -> List[str]:
+    """Serial ports of all controllers, from CONZERO_UART_PORTS / CONZERO_UART_PORT"""
+    value = os.environ.get("CONZERO_UART_PORTS") or os.environ.get("CONZERO_UART_PORT", "/dev/ttyS0")
+    return [p for p in re.split(r"[,\s]+", value) if p]
+
+
+# Hand-tuned blocks of the shared motor_config.json that a new per-board file starts from
+# (learned layouts and the negotiated baud are per board and are not copied)
+SHARED_CONFIG_KEYS = ("timeouts", "baud_negotiation")
+
+
+def config_path_for_port(port: str) -> str:
+    """Per-board motor_config file (motor_config.<port name>.json), seeded from the shared one"""
+    root, ext = os.path.splitext(PATHS["motor_config"])
+    path = f"{root}.{os.path.basename(port)}{ext}"
+    if not os.path.exists(path) and os.path.exists(PATHS["motor_config"]):
+        try:
+            with open(PATHS["motor_config"]) as f:
+                shared = json.load(f)
+            with open(path, "w") as f:
+                json.dump({k: shared[k] for k in SHARED_CONFIG_KEYS if k in shared}, f, indent=2)
+        except (OSError, ValueError) as e:
+            print(f"Could not seed {path}: {e}")
+    return path
+
+
+def combine_faults(faults: Sequence[Optional[int]]) -> Optional[int]:
+    """OR of the fault words that were read (None if no board answered)"""
+    read = [f for f in faults if f is not None]
+    if not read:
+        return None
+    combined = 0
+    for f in read:
+        combined |= f
+    return combined
+
+
+def combine_telemetry(snapshots: Sequence[Optional[TelemetrySnapshot]]) -> Optional[TelemetrySnapshot]:
+    """
+    One group snapshot: faults ORed, slowest measured speed, highest reference,
+    lowest bus voltage, hottest heatsink. The status of a faulted board wins.
+    """
+    read = [s for s in snapshots if s is not None]
+    if not read:
+        return None
+    faulted = [s for s in read if s.faults]
+    return TelemetrySnapshot(
+        timestamp=max(s.timestamp for s in read),
+        faults=combine_faults([s.faults for s in read]),
+        speed_meas=min(s.speed_meas for s in read),
+        speed_ref=max(s.speed_ref for s in read),
+        status=(faulted or read)[0].status,
+        bus_voltage=min(s.bus_voltage for s in read),
+        heatsink_temp=max(s.heatsink_temp for s in read),
+    )
+
+
+class ControllerManager:
+    """Group of MotorServices, one per controller board"""
+
+    def __init__(self, ports: Optional[Sequence[str]] = None, baud: int = 115200,
+                 dispatch: Optional[Callable[..., Any]] = None):
+        """dispatch(fn, *args) marshals group callbacks to the caller's thread (see MotorService)"""
+        self.ports = list(ports) if ports else ports_from_env()
+        self._dispatch = dispatch or (lambda fn, *args: fn(*args))
+        # Board-level callbacks stay on their worker threads; only the group result is dispatched
+        shared = len(self.ports) == 1  # A single board keeps the plain motor_config.json
+        self.services: List[MotorService] = [
+            MotorService(port=port, baud=baud, config_path=None if shared else config_path_for_port(port))
+            for port in self.ports
+        ]
+        print(f"Controller group: {', '.join(self.ports)}")
+
+    # ====== FAN-OUT PLUMBING ======
+    def _gather(self, futures: List[Future], combine: Callable[[List[Any]], Any],
+                callback: ResultCallback = None) -> Future:
+        """Future of combine([result per board]) once every board's Future is done"""
+        group: Future = Future()
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def board_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            try:
+                group.set_result(combine([MotorService._result_of(f) for f in futures]))
+            except Exception as e:
+                group.set_exception(e)
+
+        for future in futures:
+            future.add_done_callback(board_done)
+        if callback:
+            group.add_done_callback(lambda f: self._dispatch(callback, MotorService._result_of(f)))
+        return group
+
+    def _fan_out(self, method: str, *args, combine: Callable[[List[Any]], Any] = all,
+                 callback: ResultCallback = None, **kwargs) -> Future:
+        """Call the same MotorService method on every board at once"""
+        futures = [getattr(service, method)(*args, **kwargs) for service in self.services]
+        return self._gather(futures, combine, callback)
+
+    # ====== PUBLIC API (non-blocking, mirrors MotorService) ======
+    def initialize(self, callback: ResultCallback = None) -> Future:
+        """Connect and handshake every board in parallel; True when all are ready"""
+        return self._fan_out("initialize", callback=callback)
+
+    def start(self, motor_index: int = 1, speed_percent: Optional[int] = None,
+              callback: ResultCallback = None) -> Future:
+        """Start all jets together (each START + ramp is queued on its own port at once)"""
+        return self._fan_out("start", motor_index, speed_percent, callback=callback)
+
+    def stop(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Stop all jets; True only if every board confirmed"""
+        return self._fan_out("stop", motor_index, callback=callback)
+
+    def emergency_stop(self, motor_index: int = 1, timeout: Optional[float] = None,
+                       callback: ResultCallback = None) -> Future:
+        """Fast-lane stop on every board at once; True only if every board confirmed standstill"""
+        return self._fan_out("emergency_stop", motor_index, timeout, callback=callback)
+
+    def set_speed(self, speed_percent: int, motor_index: int = 1,
+                  callback: ResultCallback = None) -> Future:
+        """Ramp all jets to speed_percent"""
+        return self._fan_out("set_speed", speed_percent, motor_index, callback=callback)
+
+    def read_faults(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Fault words of all boards ORed together"""
+        return self._fan_out("read_faults", motor_index, combine=combine_faults, callback=callback)
+
+    def acknowledge_faults(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """FAULT_ACK on every board"""
+        return self._fan_out("acknowledge_faults", motor_index, callback=callback)
+
+    def read_speed(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Slowest measured speed in the group"""
+        return self._fan_out("read_speed", motor_index, callback=callback,
+                             combine=lambda speeds: min((s for s in speeds if s is not None), default=None))
+
+    def read_telemetry(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Combined TelemetrySnapshot (see combine_telemetry), all boards polled in parallel"""
+        return self._fan_out("read_telemetry", motor_index, combine=combine_telemetry, callback=callback)
+
+    def read_telemetry_all(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Per-board TelemetrySnapshots, in port order (None for boards that did not answer)"""
+        return self._fan_out("read_telemetry", motor_index, combine=list, callback=callback)
+
+    def dump_flight_recorder(self, callback: ResultCallback = None) -> Future:
+        """Dump every board's flight recorder; returns the list of file paths"""
+        return self._fan_out("dump_flight_recorder", combine=list, callback=callback)
+
+    def ramp_active(self, motor_index: int = 1) -> bool:
+        """True while any board is still ramping"""
+        return any(service.ramp_active(motor_index) for service in self.services)
+
+    def get_last_speed_ref(self) -> Optional[int]:
+        """Last commanded speed reference (highest in the group)"""
+        return max((r for r in (s.get_last_speed_ref() for s in self.services) if r is not None), default=None)
+
+    def get_estop_timeout(self) -> float:
+        """Longest emergency-stop standstill budget in the group"""
+        return max(service.get_estop_timeout() for service in self.services)
+
+    def is_link_up(self) -> bool:
+        """True while every board's ASPEP session is alive"""
+        return all(service.is_link_up() for service in self.services)
+
+    def close(self):
+        """Close all boards (their workers shut down in parallel)"""
+        threads = [threading.Thread(target=service.close, daemon=True) for service in self.services]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+    def __len__(self) -> int:
+        return len(self.services)
+
+    def __enter__(self):
+        """Context manager support"""
+        self.initialize().result()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager cleanup"""
+        self.close()
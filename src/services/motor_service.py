@@ -1,30 +1,219 @@
 """
 Motor Control Service
 Handles all motor UART communication and control
+
+All UART traffic runs on a dedicated UARTWorker thread. Public methods return a
+concurrent.futures.Future and optionally take a callback(result), which is run
+through the `dispatch` hook (e.g. Tk's root.after) so results land on the UI thread.
+Speed changes go through a RampExecutor: only the newest target is ramped to.
+Jobs are queued by priority class: stop and fault ack jump ahead of user
+control, which jumps ahead of telemetry polls; a stop therefore cancels the
+STARTs still queued for its motor. emergency_stop() goes further:
+it flushes the queue and cuts short the exchange in flight.
 """
 
 import os
-from typing import Optional
-from hardware.uart_manager import ASPEPClient
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+from core.config import PATHS
+from hardware.flight_recorder import FlightRecorder
+from hardware.uart_manager import DEFAULT_TIMEOUTS, ASPEPClient, TelemetrySnapshot
+from hardware.uart_worker import PRIORITY_CONTROL, PRIORITY_SAFETY, PRIORITY_TELEMETRY, UARTWorker
+from services.ramp_executor import RampExecutor, RampProgress
+
+ResultCallback = Optional[Callable[[Any], None]]
+
 
 class MotorService:
     """Manages motor control via UART"""
-    
-    def __init__(self, port: Optional[str] = None, baud: int = 115200):
-        """Initialize motor service"""
+
+    def __init__(self, port: Optional[str] = None, baud: int = 115200,
+                 dispatch: Optional[Callable[..., Any]] = None,
+                 on_ramp_progress: Optional[Callable[[RampProgress], None]] = None,
+                 config_path: Optional[str] = None, log_dir: Optional[str] = None):
+        """Initialize motor service
+
+        dispatch(fn, *args) marshals callbacks to the caller's thread;
+        by default callbacks run directly on the UART worker thread.
+        on_ramp_progress(progress) is dispatched the same way during speed ramps.
+        config_path (learned layouts, baud) and log_dir (flight recorder dumps)
+        default to PATHS["motor_config"] and PATHS["logs"].
+        """
         self.port = port or os.environ.get("CONZERO_UART_PORT", "/dev/ttyS0")
         self.baud = baud
+        self.config_path = config_path or PATHS["motor_config"]
+        self.log_dir = log_dir or PATHS["logs"]
         self.client: Optional[ASPEPClient] = None
         self.ready = False
         self._last_speed_ref: Optional[int] = None
-    
-    def initialize(self) -> bool:
+        self._dispatch = dispatch or (lambda fn, *args: fn(*args))
+        self.on_ramp_progress = on_ramp_progress
+        self._queued_starts: Dict[int, List[Future]] = {}  # START jobs not yet finished, per motor
+        self._starts_lock = threading.Lock()
+        self._worker = UARTWorker(name=f"MotorUART:{os.path.basename(self.port)}",
+                                  on_idle=self._supervise_link)
+        self._worker.start()
+        self._ramp = RampExecutor(self._worker, lambda: self.client if self.ready else None,
+                                  on_progress=self._on_ramp_progress)
+
+    # ====== WORKER PLUMBING ======
+    def _submit(self, fn: Callable[..., Any], *args, callback: ResultCallback = None,
+                priority: int = PRIORITY_CONTROL) -> Future:
+        """Run fn on the UART worker (in the given priority class) and route its result to callback"""
+        future = self._worker.submit_priority(priority, fn, *args)
+        if callback:
+            future.add_done_callback(lambda f: self._dispatch(callback, self._result_of(f)))
+        return future
+
+    def _forget_start(self, motor_index: int, future: Future) -> None:
+        with self._starts_lock:
+            queued = self._queued_starts.get(motor_index)
+            if queued and future in queued:
+                queued.remove(future)
+
+    @staticmethod
+    def _result_of(future: Future) -> Any:
+        """Future result, or None if the job raised or was cancelled"""
+        if future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            print(f" Motor job error: {e}")
+            return None
+
+    # ====== PUBLIC API (non-blocking) ======
+    def initialize(self, callback: ResultCallback = None) -> Future:
         """Initialize motor connection and handshake"""
+        return self._submit(self._initialize, callback=callback)
+
+    def start(self, motor_index: int = 1, speed_percent: Optional[int] = None,
+              callback: ResultCallback = None) -> Future:
+        """Start motor (and ramp to speed_percent in the same pipelined burst)"""
+        if speed_percent:
+            self._ramp.cancel(motor_index)
+        future = self._submit(self._start, motor_index, speed_percent, callback=callback)
+        with self._starts_lock:
+            self._queued_starts.setdefault(motor_index, []).append(future)
+        future.add_done_callback(lambda f: self._forget_start(motor_index, f))
+        return future
+
+    def stop(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """
+        Stop motor. The stop jumps the queue, so STARTs and ramps still waiting
+        for this motor are cancelled rather than left to run after it.
+        """
+        self._ramp.cancel(motor_index)
+        with self._starts_lock:
+            queued = self._queued_starts.pop(motor_index, [])
+        for future in queued:
+            future.cancel()  # No-op for a START already running; the stop then follows it
+        return self._submit(self._stop, motor_index, callback=callback, priority=PRIORITY_SAFETY)
+
+    def emergency_stop(self, motor_index: int = 1, timeout: Optional[float] = None,
+                       callback: ResultCallback = None) -> Future:
+        """
+        Fast-lane stop: drops queued jobs and ramps, aborts the UART exchange in
+        flight, sends STOP_MOTOR and waits for the measured speed to reach zero.
+        Resolves True only when the stop was confirmed within timeout seconds.
+        """
+        # Abort first: the e-stop job's clear_abort() must always come after it
+        if self.client:
+            self.client.abort()
+        future = self._worker.preempt(self._emergency_stop, motor_index, timeout)
+        self._ramp.cancel(unschedule=True)  # Its queued steps were just flushed
+        if callback:
+            future.add_done_callback(lambda f: self._dispatch(callback, self._result_of(f)))
+        return future
+
+    def set_speed(self, speed_percent: int, motor_index: int = 1,
+                  callback: ResultCallback = None) -> Future:
+        """
+        Set motor speed as percentage. Requests still waiting are superseded by this
+        one; their Futures resolve with the result of the ramp that replaced them.
+        """
+        target_rpm = self._percent_to_rpm(speed_percent)
+        print(f"  Setting speed: {speed_percent}% → {target_rpm} RPM")
+        future = self._ramp.request(target_rpm, motor_index)
+        if callback:
+            future.add_done_callback(lambda f: self._dispatch(callback, self._result_of(f)))
+        return future
+
+    def ramp_progress(self, motor_index: int = 1) -> Optional[RampProgress]:
+        """Progress of the current/last speed ramp"""
+        return self._ramp.progress(motor_index)
+
+    def ramp_active(self, motor_index: int = 1) -> bool:
+        """True while a speed ramp is still moving the reference"""
+        progress = self._ramp.progress(motor_index)
+        return bool(progress and progress.active)
+
+    def read_faults(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Read motor fault flags"""
+        return self._submit(self._read_faults, motor_index, callback=callback, priority=PRIORITY_TELEMETRY)
+
+    def acknowledge_faults(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Acknowledge/clear motor faults"""
+        return self._submit(self._acknowledge_faults, motor_index, callback=callback, priority=PRIORITY_SAFETY)
+
+    def read_speed(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Read actual motor speed in RPM"""
+        return self._submit(self._read_speed, motor_index, callback=callback, priority=PRIORITY_TELEMETRY)
+
+    def read_telemetry(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Read a TelemetrySnapshot (faults, speed, voltage, ...) in one UART transaction"""
+        return self._submit(self._read_telemetry, motor_index, callback=callback, priority=PRIORITY_TELEMETRY)
+
+    def subscribe_datalog(self, registers, rate_hz: float, on_sample=None,
+                          motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Start an MCP datalog stream; on_sample runs on the UART worker thread"""
+        return self._submit(self._subscribe_datalog, registers, rate_hz, on_sample, motor_index,
+                            callback=callback, priority=PRIORITY_TELEMETRY)
+
+    def unsubscribe_datalog(self, motor_index: int = 1, callback: ResultCallback = None) -> Future:
+        """Stop the MCP datalog stream"""
+        return self._submit(self._unsubscribe_datalog, motor_index, callback=callback,
+                            priority=PRIORITY_TELEMETRY)
+
+    def dump_flight_recorder(self, callback: ResultCallback = None) -> Future:
+        """Write the recent raw UART frames to logs/ and return the file path"""
+        return self._submit(lambda: self.client.dump_flight_recorder() if self.client else None,
+                            callback=callback)
+
+    def get_last_speed_ref(self) -> Optional[int]:
+        """Get last commanded speed reference"""
+        return self._last_speed_ref
+
+    def get_estop_timeout(self) -> float:
+        """Seconds an emergency stop waits for standstill (motor_config.json timeouts.estop)"""
+        return self.client.timeouts["estop"] if self.client else DEFAULT_TIMEOUTS["estop"]
+
+    def close(self):
+        """Close motor connection and stop the UART worker"""
+        self._ramp.cancel()
+        if self.client:
+            self._submit(self._close)
+        self._worker.stop()
+
+    def is_link_up(self) -> bool:
+        """True while the ASPEP session is alive"""
+        return bool(self.ready and self.client and self.client.connected)
+
+    # ====== WORKER-THREAD IMPLEMENTATIONS ======
+    def _supervise_link(self):
+        """Keepalive PING / background re-handshake, run by the worker when idle"""
+        if self.ready and self.client and not self.client.abort_pending:
+            self.client.supervise()
+
+    def _initialize(self) -> bool:
         try:
             print(f"🔌 Initializing motor on {self.port}...")
-            self.client = ASPEPClient(port=self.port, baud=self.baud)
+            self.client = ASPEPClient(port=self.port, baud=self.baud,
+                                      config_path=self.config_path,
+                                      recorder=FlightRecorder(dump_dir=self.log_dir))
             self.client.open()
-            
+
             if self.client.handshake():
                 self.ready = True
                 print(" Motor ready")
@@ -32,31 +221,35 @@ class MotorService:
             else:
                 print(" Motor handshake failed")
                 return False
-                
+
         except Exception as e:
             print(f" Motor init error: {e}")
             return False
-    
-    def start(self, motor_index: int = 1) -> bool:
-        """Start motor"""
+
+    def _start(self, motor_index: int = 1, speed_percent: Optional[int] = None) -> bool:
         if not self.ready or not self.client:
             print(" Motor not ready - cannot start")
             return False
-        
+
         try:
-            success = self.client.start_motor(motor_index)
+            if speed_percent:
+                target_rpm = self._percent_to_rpm(speed_percent)
+                success = self.client.start_motor_with_speed(target_rpm, motor_index)
+                if success:
+                    self._last_speed_ref = target_rpm
+            else:
+                success = self.client.start_motor(motor_index)
             if success:
                 print(" Motor started")
             return success
         except Exception as e:
             print(f" Motor start error: {e}")
             return False
-    
-    def stop(self, motor_index: int = 1) -> bool:
-        """Stop motor"""
+
+    def _stop(self, motor_index: int = 1) -> bool:
         if not self.ready or not self.client:
             return False
-        
+
         try:
             success = self.client.stop_motor(motor_index)
             if success:
@@ -65,48 +258,52 @@ class MotorService:
         except Exception as e:
             print(f" Motor stop error: {e}")
             return False
-    
-    def set_speed(self, speed_percent: int, motor_index: int = 1) -> bool:
-        """Set motor speed as percentage"""
-        if not self.ready or not self.client:
-            print(f" Motor not ready - speed {speed_percent}% not sent")
+
+    def _emergency_stop(self, motor_index: int = 1, timeout: Optional[float] = None) -> bool:
+        if not self.client:
             return False
-        
-        # Convert percentage to RPM
-        if hasattr(self.client, '_max_speed_rpm'):
-            target_rpm = int((speed_percent / 100.0) * self.client._max_speed_rpm)
-        else:
-            # Fallback to default conversion
-            target_rpm = int(speed_percent * 48)  # 100% = 4800 RPM
-        
-        print(f"  Setting speed: {speed_percent}% → {target_rpm} RPM")
-        
+
         try:
-            success = self.client.set_speed_rpm(target_rpm, motor_index)
-            if success:
-                self._last_speed_ref = target_rpm
-                print(f" Speed set: {target_rpm} RPM")
-            return success
+            confirmed = self.client.emergency_stop(motor_index, timeout)
         except Exception as e:
-            print(f" Speed set error: {e}")
+            print(f" Emergency stop error: {e}")
             return False
-    
-    def read_faults(self, motor_index: int = 1) -> Optional[int]:
-        """Read motor fault flags"""
+        if confirmed:
+            self._last_speed_ref = 0  # Matches the client: standstill confirmed
+            print(" Motor stop confirmed")
+        else:
+            print(" Motor stop NOT confirmed")
+        return confirmed
+
+    def _on_ramp_progress(self, progress: RampProgress):
+        """RampExecutor hook (worker thread)"""
+        if progress.ok:
+            self._last_speed_ref = progress.target_rpm
+            print(f" Speed set: {progress.target_rpm} RPM")
+        if self.on_ramp_progress:
+            self._dispatch(self.on_ramp_progress, progress)
+
+    def _percent_to_rpm(self, speed_percent: int) -> int:
+        """Convert percentage to RPM"""
+        if hasattr(self.client, '_max_speed_rpm'):
+            return int((speed_percent / 100.0) * self.client._max_speed_rpm)
+        # Fallback to default conversion
+        return int(speed_percent * 48)  # 100% = 4800 RPM
+
+    def _read_faults(self, motor_index: int = 1) -> Optional[int]:
         if not self.ready or not self.client:
             return None
-        
+
         try:
             return self.client.read_faults(motor_index)
         except Exception as e:
             print(f" Fault read error: {e}")
             return None
-    
-    def acknowledge_faults(self, motor_index: int = 1) -> bool:
-        """Acknowledge/clear motor faults"""
+
+    def _acknowledge_faults(self, motor_index: int = 1) -> bool:
         if not self.ready or not self.client:
             return False
-        
+
         try:
             success = self.client.fault_acknowledge(motor_index)
             if success:
@@ -115,45 +312,59 @@ class MotorService:
         except Exception as e:
             print(f" Fault ack error: {e}")
             return False
-    
-    def read_speed(self, motor_index: int = 1) -> Optional[int]:
-        """Read actual motor speed in RPM"""
+
+    def _read_speed(self, motor_index: int = 1) -> Optional[int]:
         if not self.ready or not self.client:
             return None
-        
+
         try:
-            self.client.poll_speed(motor_index, repeat=1, delay=0)
-            
-            if self.client.last_data_payload and len(self.client.last_data_payload) >= 4:
-                speed_rpm = int.from_bytes(
-                    self.client.last_data_payload[:4], 
-                    'little', 
-                    signed=True
-                )
-                return speed_rpm
-            return None
+            return self.client.poll_speed(motor_index, repeat=1, delay=0)
         except Exception as e:
             print(f" Speed read error: {e}")
             return None
-    
-    def get_last_speed_ref(self) -> Optional[int]:
-        """Get last commanded speed reference"""
-        return self._last_speed_ref
-    
-    def close(self):
-        """Close motor connection"""
-        if self.client:
-            try:
-                self.client.close()
-                print(" Motor connection closed")
-            except Exception as e:
-                print(f" Motor close error: {e}")
-    
+
+    def _read_telemetry(self, motor_index: int = 1) -> Optional[TelemetrySnapshot]:
+        if not self.ready or not self.client:
+            return None
+
+        try:
+            return self.client.read_telemetry(motor_index)
+        except Exception as e:
+            print(f" Telemetry read error: {e}")
+            return None
+
+    def _subscribe_datalog(self, registers, rate_hz: float, on_sample, motor_index: int = 1):
+        if not self.ready or not self.client:
+            return None
+
+        try:
+            return self.client.subscribe_datalog(registers, rate_hz, on_sample, motor_index=motor_index)
+        except Exception as e:
+            print(f" Datalog subscribe error: {e}")
+            return None
+
+    def _unsubscribe_datalog(self, motor_index: int = 1) -> bool:
+        if not self.ready or not self.client:
+            return False
+
+        try:
+            return self.client.unsubscribe_datalog(motor_index)
+        except Exception as e:
+            print(f" Datalog unsubscribe error: {e}")
+            return False
+
+    def _close(self):
+        try:
+            self.client.close()
+            print(" Motor connection closed")
+        except Exception as e:
+            print(f" Motor close error: {e}")
+
     def __enter__(self):
         """Context manager support"""
-        self.initialize()
+        self.initialize().result()
         return self
-    
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager cleanup"""
-        self.close()
\ No newline at end of file
+        self.close()
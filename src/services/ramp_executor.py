@@ -0,0 +1,199 @@
+"""
+Speed Ramp Executor
+Coalesces speed requests and streams the ramp from the UART worker
+
+request() only records the newest target for a motor; one ramp job on the UART
+worker picks it up, so targets superseded before they were sent are dropped
+(three quick SPEED taps cost one ramp). The controller-side RAW ramp is a single
+command. If the controller refuses it, SPEED_REF setpoints are written one step
+per worker timer (UARTWorker.submit_after), so stop and telemetry jobs run
+between steps instead of queueing behind sleeps, and a new target retargets
+the running ramp.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional
+
+from hardware.uart_manager import ASPEPClient
+from hardware.uart_worker import UARTWorker
+
+RAMP_RAW = "raw"
+RAMP_STEPWISE = "stepwise"
+
+
+@dataclass
+class RampProgress:
+    """State of the latest ramp for one motor"""
+    motor_index: int
+    start_rpm: int
+    target_rpm: int
+    setpoint_rpm: int          # Last SPEED_REF written (stepwise) or the RAW ramp target
+    mode: str
+    started_at: float          # time.monotonic()
+    duration_s: float = 0.0    # Controller ramp time (RAW mode)
+    ok: Optional[bool] = None  # None while setpoints are still being sent
+
+    @property
+    def fraction(self) -> float:
+        """0.0 .. 1.0; RAW ramps are estimated from elapsed time"""
+        if self.ok is False:
+            return 0.0
+        if self.mode == RAMP_RAW:
+            if self.duration_s <= 0:
+                return 1.0
+            return min(1.0, (time.monotonic() - self.started_at) / self.duration_s)
+        span = self.target_rpm - self.start_rpm
+        if span == 0:
+            return 1.0
+        return max(0.0, min(1.0, (self.setpoint_rpm - self.start_rpm) / span))
+
+    @property
+    def reference_rpm(self) -> int:
+        """Current speed reference (estimated while the controller runs a RAW ramp)"""
+        if self.mode == RAMP_RAW and self.ok:
+            return int(self.start_rpm + (self.target_rpm - self.start_rpm) * self.fraction)
+        return self.setpoint_rpm
+
+    @property
+    def active(self) -> bool:
+        return self.ok is not False and self.fraction < 1.0
+
+
+class RampExecutor:
+    """Latest-target speed ramps on a UARTWorker"""
+
+    def __init__(self, worker: UARTWorker, get_client: Callable[[], Optional[ASPEPClient]],
+                 step_size: int = 500, step_delay: float = 0.2,
+                 on_progress: Optional[Callable[[RampProgress], None]] = None) -> None:
+        """
+        get_client() returns the ready client or None; on_progress(progress) runs on
+        the worker thread after every setpoint and when a ramp finishes.
+        """
+        self._worker = worker
+        self._get_client = get_client
+        self.step_size = step_size
+        self.step_delay = step_delay
+        self.on_progress = on_progress
+        self._lock = threading.Lock()
+        self._targets: Dict[int, int] = {}
+        self._waiters: Dict[int, List[Future]] = {}
+        self._scheduled: set = set()
+        self._progress: Dict[int, RampProgress] = {}
+
+    # ====== PUBLIC API (any thread) ======
+    def request(self, target_rpm: int, motor_index: int = 1) -> Future:
+        """
+        Ramp motor_index to target_rpm. Replaces any target not yet reached; the
+        Future resolves (True/False) when the ramp that absorbed this request ends.
+        """
+        future: Future = Future()
+        with self._lock:
+            superseded = self._targets.get(motor_index)
+            self._targets[motor_index] = int(target_rpm)
+            self._waiters.setdefault(motor_index, []).append(future)
+            if motor_index not in self._scheduled:
+                self._scheduled.add(motor_index)
+                self._worker.submit(self._run, motor_index)
+        if superseded is not None and superseded != target_rpm:
+            print(f" Ramp target {superseded} → {target_rpm} RPM (superseded)")
+        return future
+
+    def cancel(self, motor_index: Optional[int] = None, unschedule: bool = False) -> None:
+        """
+        Drop pending targets (all motors by default); their Futures resolve False.
+        unschedule also forgets the queued ramp jobs, for after UARTWorker.preempt().
+        """
+        with self._lock:
+            motors = list(self._targets) if motor_index is None else [motor_index]
+            waiters = [f for m in motors for f in self._waiters.pop(m, [])]
+            for m in motors:
+                self._targets.pop(m, None)
+                if unschedule:
+                    self._scheduled.discard(m)
+                progress = self._progress.get(m)
+                if progress and progress.ok is None:
+                    progress.ok = False
+        for future in waiters:
+            if not future.done():
+                future.set_result(False)
+
+    def progress(self, motor_index: int = 1) -> Optional[RampProgress]:
+        """Snapshot of the latest ramp for motor_index (None before the first one)"""
+        with self._lock:
+            progress = self._progress.get(motor_index)
+            return replace(progress) if progress else None
+
+    # ====== WORKER-THREAD IMPLEMENTATION ======
+    def _run(self, motor_index: int) -> None:
+        with self._lock:
+            target = self._targets.get(motor_index)
+            if target is None:
+                self._scheduled.discard(motor_index)
+                return
+            progress = self._progress.get(motor_index)
+        client = self._get_client()
+        if client is None:
+            print(f" Motor not ready - speed {target} RPM not sent")
+            self._finish(motor_index, target, False)
+            return
+
+        try:
+            if progress and progress.ok is None and progress.mode == RAMP_STEPWISE:
+                progress.target_rpm = target  # Retarget the running step-wise ramp
+            else:
+                start = client._last_speed_ref or 0
+                duration_ms = client._ramp_duration_ms(target)
+                progress = RampProgress(motor_index, start, target, start, RAMP_RAW, time.monotonic(),
+                                        duration_ms / 1000.0)
+                with self._lock:
+                    self._progress[motor_index] = progress
+                if target == start or client.ramp_speed_raw(target, motor_index, duration_ms):
+                    progress.setpoint_rpm = target
+                    self._finish(motor_index, target, True)
+                    return
+                print(f" RAW ramp refused - stepping {start} → {target} RPM")
+                progress.mode = RAMP_STEPWISE
+                progress.started_at = time.monotonic()
+
+            setpoint = client.step_speed_toward(target, motor_index, self.step_size)
+        except Exception as e:
+            print(f" Speed ramp error: {e}")
+            setpoint = None
+
+        if setpoint is None:
+            self._finish(motor_index, target, False)
+            return
+        progress.setpoint_rpm = setpoint
+        if setpoint == target:
+            self._finish(motor_index, target, True)
+            return
+        self._notify(progress)
+        self._worker.submit_after(self.step_delay, self._run, motor_index)
+
+    def _finish(self, motor_index: int, target: int, ok: bool) -> None:
+        """Resolve waiters, unless a newer target arrived meanwhile (then keep ramping)"""
+        with self._lock:
+            progress = self._progress.get(motor_index)
+            if ok and self._targets.get(motor_index, target) != target:
+                self._worker.submit(self._run, motor_index)
+                return
+            waiters = self._waiters.pop(motor_index, [])
+            self._targets.pop(motor_index, None)
+            self._scheduled.discard(motor_index)
+            if progress and progress.ok is None:
+                progress.ok = ok
+        for future in waiters:
+            if not future.done():
+                future.set_result(ok)
+        if progress:
+            self._notify(progress)
+
+    def _notify(self, progress: RampProgress) -> None:
+        if self.on_progress:
+            try:
+                self.on_progress(replace(progress))
+            except Exception as e:
+                print(f" Ramp progress callback error: {e}")
@@ -0,0 +1,350 @@
+"""
+Telemetry Analytics
+Session and daily summaries computed from the stored telemetry segments
+
+Segments are read through the memory-mapped block reader and reduced with
+NumPy into mergeable Aggregates: time in each speed zone, average RPM,
+reference-vs-actual tracking error, bus voltage sag during ramps, and fault
+events per hour. Aggregates are cached per segment (keyed by its size and
+mtime), so a refresh only processes new or still-growing segments.
+
+Usage (from src/):
+    python -m services.telemetry_analytics                 # daily table + sessions
+    python -m services.telemetry_analytics --json
+"""
+
+import datetime
+import glob
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+from services.telemetry_store import SEGMENT_PATTERN, read_segment
+
+# Speed zones (|measured RPM|); the last zone is open-ended
+ZONE_EDGES = (0, 500, 1500, 2500, 3500, 4500)
+MAX_SAMPLE_GAP = 5.0        # s; longer gaps between samples count as no data
+SESSION_GAP = 120.0         # s without a speed reference that ends a session
+RAMP_RATE_RPM_S = 300.0     # |d speed/dt| above this counts as ramping
+CACHE_FILE = "analytics_cache.json"
+CACHE_VERSION = 1
+
+
+@dataclass
+class Aggregate:
+    """Mergeable telemetry summary of one time span"""
+    start: float = float("inf")
+    end: float = float("-inf")
+    samples: int = 0
+    running_s: float = 0.0
+    zone_s: List[float] = field(default_factory=lambda: [0.0] * len(ZONE_EDGES))
+    rpm_s: float = 0.0              # ∫|speed| dt while running
+    steady_s: float = 0.0           # Running and not ramping
+    error_s: float = 0.0            # ∫|ref - speed| dt while steady
+    error_sq_s: float = 0.0
+    error_max: float = 0.0
+    level_v_s: float = 0.0          # ∫voltage dt outside ramps
+    level_s: float = 0.0
+    ramp_s: float = 0.0
+    ramp_v_min: float = float("inf")
+    fault_events: int = 0
+    faults_by_hour: Dict[int, int] = field(default_factory=dict)  # Epoch hour -> new fault bits seen
+
+    # ====== DERIVED ======
+    @property
+    def avg_rpm(self) -> float:
+        return self.rpm_s / self.running_s if self.running_s else 0.0
+
+    @property
+    def mean_abs_error(self) -> float:
+        return self.error_s / self.steady_s if self.steady_s else 0.0
+
+    @property
+    def rms_error(self) -> float:
+        return float(np.sqrt(self.error_sq_s / self.steady_s)) if self.steady_s else 0.0
+
+    @property
+    def voltage_sag(self) -> float:
+        """Mean voltage outside ramps minus the lowest voltage seen during a ramp"""
+        if not self.level_s or self.ramp_v_min == float("inf"):
+            return 0.0
+        return max(0.0, self.level_v_s / self.level_s - self.ramp_v_min)
+
+    # ====== MERGING / SERIALIZATION ======
+    def merge(self, other: "Aggregate") -> "Aggregate":
+        self.start = min(self.start, other.start)
+        self.end = max(self.end, other.end)
+        self.samples += other.samples
+        self.running_s += other.running_s
+        self.zone_s = [a + b for a, b in zip(self.zone_s, other.zone_s)]
+        self.rpm_s += other.rpm_s
+        self.steady_s += other.steady_s
+        self.error_s += other.error_s
+        self.error_sq_s += other.error_sq_s
+        self.error_max = max(self.error_max, other.error_max)
+        self.level_v_s += other.level_v_s
+        self.level_s += other.level_s
+        self.ramp_s += other.ramp_s
+        self.ramp_v_min = min(self.ramp_v_min, other.ramp_v_min)
+        self.fault_events += other.fault_events
+        for hour, count in other.faults_by_hour.items():
+            self.faults_by_hour[hour] = self.faults_by_hour.get(hour, 0) + count
+        return self
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["faults_by_hour"] = {str(h): c for h, c in self.faults_by_hour.items()}
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Aggregate":
+        d = dict(d)
+        d["faults_by_hour"] = {int(h): c for h, c in d.get("faults_by_hour", {}).items()}
+        return cls(**d)
+
+    def summary(self) -> dict:
+        """Human-facing figures"""
+        zones = [f"{lo}-{hi}" for lo, hi in zip(ZONE_EDGES, ZONE_EDGES[1:])] + [f"{ZONE_EDGES[-1]}+"]
+        return {
+            "start": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.start)),
+            "end": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.end)),
+            "running_min": round(self.running_s / 60, 1),
+            "time_in_zone_min": {z: round(s / 60, 1) for z, s in zip(zones, self.zone_s)},
+            "avg_rpm": round(self.avg_rpm),
+            "tracking_error_rpm": {"mean": round(self.mean_abs_error, 1), "rms": round(self.rms_error, 1),
+                                   "max": round(self.error_max)},
+            "voltage_sag_v": round(self.voltage_sag, 2),
+            "fault_events": self.fault_events,
+            "faults_per_hour": {time.strftime("%Y-%m-%d %H:00", time.localtime(h * 3600)): c
+                                for h, c in sorted(self.faults_by_hour.items())},
+        }
+
+
+# =========== ========== ========== =================== VECTORIZED REDUCTION =================== ========== ==========
+def _group_sums(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    return np.add.reduceat(values, starts) if len(values) else np.zeros(len(starts))
+
+
+def aggregate_groups(records: np.ndarray, starts: np.ndarray) -> List[Aggregate]:
+    """One Aggregate per group of consecutive records; groups begin at the `starts` indices"""
+    if not len(records) or not len(starts):
+        return []
+    t = records["timestamp"]
+    speed = records["speed_meas"].astype(np.float64)
+    ref = records["speed_ref"].astype(np.float64)
+    volts = records["bus_voltage"].astype(np.float64)
+    faults = records["faults"]
+
+    dt = np.zeros(len(t))
+    dt[:-1] = np.diff(t)
+    dt[(dt < 0) | (dt > MAX_SAMPLE_GAP)] = 0.0
+    rate = np.zeros(len(t))
+    np.divide(np.abs(np.diff(speed)), dt[:-1], out=rate[:-1], where=dt[:-1] > 0)
+
+    running = ref != 0
+    ramping = running & (rate > RAMP_RATE_RPM_S)
+    steady = running & ~ramping
+    error = np.abs(ref - speed)
+    new_bits = np.zeros(len(t), dtype=bool)
+    new_bits[1:] = (faults[1:] & ~faults[:-1]) != 0
+    new_bits[0] = faults[0] != 0
+
+    zone = np.searchsorted(ZONE_EDGES, np.abs(speed), side="right") - 1
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(t))))
+    zone_s = np.bincount(group * len(ZONE_EDGES) + zone, weights=dt * running,
+                         minlength=len(starts) * len(ZONE_EDGES)).reshape(len(starts), len(ZONE_EDGES))
+
+    sums = {
+        "running_s": _group_sums(dt * running, starts),
+        "rpm_s": _group_sums(np.abs(speed) * dt * running, starts),
+        "steady_s": _group_sums(dt * steady, starts),
+        "error_s": _group_sums(error * dt * steady, starts),
+        "error_sq_s": _group_sums(error * error * dt * steady, starts),
+        "level_v_s": _group_sums(volts * dt * ~ramping, starts),
+        "level_s": _group_sums(dt * ~ramping, starts),
+        "ramp_s": _group_sums(dt * ramping, starts),
+        "fault_events": _group_sums(new_bits.astype(np.int64), starts),
+    }
+    error_max = np.maximum.reduceat(np.where(steady, error, 0.0), starts)
+    ramp_v_min = np.minimum.reduceat(np.where(ramping, volts, np.inf), starts)
+    ends = np.append(starts[1:], len(t)) - 1
+
+    result = []
+    for g, (lo, hi) in enumerate(zip(starts, ends)):
+        agg = Aggregate(start=float(t[lo]), end=float(t[hi]), samples=int(hi - lo + 1),
+                        zone_s=zone_s[g].tolist(), error_max=float(error_max[g]), ramp_v_min=float(ramp_v_min[g]),
+                        **{k: (int(v[g]) if k == "fault_events" else float(v[g])) for k, v in sums.items()})
+        if agg.fault_events:
+            hours, counts = np.unique((t[lo:hi + 1][new_bits[lo:hi + 1]] // 3600).astype(np.int64),
+                                      return_counts=True)
+            agg.faults_by_hour = {int(h): int(c) for h, c in zip(hours, counts)}
+        result.append(agg)
+    return result
+
+
+def _day_starts(t: np.ndarray) -> tuple:
+    """Indices where a new local calendar day begins, and the matching dates"""
+    first = datetime.date.fromtimestamp(float(t[0]))
+    last = datetime.date.fromtimestamp(float(t[-1]))
+    days = [first + datetime.timedelta(days=i) for i in range((last - first).days + 1)]
+    midnights = [time.mktime(d.timetuple()) for d in days]
+    starts = np.searchsorted(t, midnights, side="left")
+    starts[0] = 0
+    keep = np.append(starts[1:] > starts[:-1], True)  # Skip days without data
+    return starts[keep], [d.isoformat() for d, k in zip(days, keep) if k]
+
+
+def _run_bounds(records: np.ndarray) -> tuple:
+    """(first, last) indices of runs with a speed reference; runs split on gaps > SESSION_GAP"""
+    t = records["timestamp"]
+    idx = np.flatnonzero(records["speed_ref"] != 0)
+    if not len(idx):
+        return idx, idx
+    breaks = np.flatnonzero((np.diff(idx) > 1) & (np.diff(t[idx]) > SESSION_GAP)) + 1
+    return idx[np.append(0, breaks)], idx[np.append(breaks - 1, len(idx) - 1)]
+
+
+def analyze_records(records: np.ndarray) -> dict:
+    """Per-day and per-run Aggregates of one time-ordered record array"""
+    if not len(records):
+        return {"days": {}, "runs": []}
+    starts, dates = _day_starts(records["timestamp"])
+    days = dict(zip(dates, aggregate_groups(records, starts)))
+
+    # Runs and the idle stretches between them as one grouping; keep the runs
+    firsts, lasts = _run_bounds(records)
+    bounds = np.unique(np.concatenate([[0], firsts, lasts + 1]))
+    bounds = bounds[bounds < len(records)]
+    groups = aggregate_groups(records, bounds)
+    runs = [groups[i] for i in np.searchsorted(bounds, firsts)]
+    return {"days": days, "runs": runs}
+
+
+# =========== ========== ========== =================== CACHED ANALYTICS =================== ========== ==========
+class SessionAnalytics:
+    """Per-segment cached analytics over a TelemetryStore directory"""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.cache_path = os.path.join(directory, CACHE_FILE)
+        self._segments: Dict[str, dict] = {}
+        self.processed = 0  # Segments (re)analyzed by the last refresh()
+        self._load_cache()
+
+    def refresh(self) -> "SessionAnalytics":
+        """Analyze new or changed segments and forget deleted ones"""
+        paths = sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)))
+        present = {os.path.basename(p) for p in paths}
+        changed = any(name not in present for name in self._segments)
+        self._segments = {n: e for n, e in self._segments.items() if n in present}
+        self.processed = 0
+        for path in paths:
+            name = os.path.basename(path)
+            stat = os.stat(path)
+            entry = self._segments.get(name)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                continue
+            try:
+                result = analyze_records(read_segment(path))
+            except (OSError, ValueError) as e:
+                print(f"[SessionAnalytics] skipping {name}: {e}")
+                continue
+            self._segments[name] = {
+                "size": stat.st_size, "mtime": stat.st_mtime,
+                "days": {d: a.to_dict() for d, a in result["days"].items()},
+                "runs": [a.to_dict() for a in result["runs"]],
+            }
+            self.processed += 1
+            changed = True
+        if changed:
+            self._save_cache()
+        return self
+
+    def daily(self) -> Dict[str, Aggregate]:
+        """{YYYY-MM-DD: Aggregate} over all segments"""
+        days: Dict[str, Aggregate] = {}
+        for entry in self._segments.values():
+            for date, d in entry["days"].items():
+                agg = Aggregate.from_dict(d)
+                if date in days:
+                    days[date].merge(agg)
+                else:
+                    days[date] = agg
+        return dict(sorted(days.items()))
+
+    def sessions(self) -> List[Aggregate]:
+        """Swim sessions: runs with a speed reference, joined across segments when the gap is short"""
+        runs = sorted((Aggregate.from_dict(r) for e in self._segments.values() for r in e["runs"]),
+                      key=lambda a: a.start)
+        sessions: List[Aggregate] = []
+        for run in runs:
+            if sessions and run.start - sessions[-1].end <= SESSION_GAP:
+                sessions[-1].merge(run)
+            else:
+                sessions.append(run)
+        return sessions
+
+    def total(self) -> Aggregate:
+        total = Aggregate()
+        for agg in self.daily().values():
+            total.merge(agg)
+        return total
+
+    def _load_cache(self) -> None:
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self._segments = data.get("segments", {})
+        except (OSError, ValueError):
+            self._segments = {}
+
+    def _save_cache(self) -> None:
+        try:
+            tmp = self.cache_path + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump({"version": CACHE_VERSION, "segments": self._segments}, f)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            print(f"[SessionAnalytics] cache write error: {e}")
+
+
+# ========== ========== ==== ================ ==================== CLI ============ ========== ==========
+def main():
+    import argparse
+    from core.config import PATHS
+
+    parser = argparse.ArgumentParser(description="Swim session analytics from recorded telemetry")
+    parser.add_argument("--dir", default=PATHS["telemetry"], help="TelemetryStore segment directory")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    analytics = SessionAnalytics(args.dir).refresh()
+    elapsed = time.perf_counter() - t0
+    daily, sessions = analytics.daily(), analytics.sessions()
+
+    if args.json:
+        print(json.dumps({"days": {d: a.summary() for d, a in daily.items()},
+                          "sessions": [s.summary() for s in sessions],
+                          "total": analytics.total().summary()}, indent=2))
+        return
+
+    print(f"{analytics.processed} segment(s) analyzed in {elapsed:.2f}s")
+    print(f"\n{'Day':<12}{'Run min':>9}{'Avg RPM':>9}{'Err RMS':>9}{'Sag V':>7}{'Faults':>8}")
+    for date, agg in daily.items():
+        print(f"{date:<12}{agg.running_s / 60:>9.1f}{agg.avg_rpm:>9.0f}{agg.rms_error:>9.1f}"
+              f"{agg.voltage_sag:>7.2f}{agg.fault_events:>8}")
+    print(f"\n{len(sessions)} session(s)")
+    for s in sessions[-10:]:
+        summary = s.summary()
+        print(f"  {summary['start']} - {summary['end'][11:]}  {summary['running_min']} min  "
+              f"avg {summary['avg_rpm']} RPM  faults {summary['fault_events']}")
+
+
+if __name__ == "__main__":
+    main()
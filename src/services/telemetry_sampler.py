@@ -0,0 +1,108 @@
+"""
+Telemetry Sampler
+Keeps a preallocated NumPy history of motor telemetry
+
+Every TelemetrySnapshot goes into a fixed-size structured ring buffer. The ring
+is mirrored (each record is written to slot i and slot i + capacity), so any
+window of up to `capacity` records is a contiguous slice: windows are
+zero-copy views, and append stays O(1) with no allocation. Field types come
+from the register table, so a new telemetry register only needs a dtype field
+that matches TelemetrySnapshot.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from hardware.uart_manager import REGISTERS, TELEMETRY_REGISTERS, TelemetrySnapshot
+
+_NUMPY_CODES = {'B': 'u1', 'b': 'i1', 'H': 'u2', 'h': 'i2', 'I': 'u4', 'i': 'i4'}
+
+# One record per snapshot: host time + the telemetry registers in TelemetrySnapshot order
+TELEMETRY_DTYPE = np.dtype([("timestamp", "<f8")] + [
+    (name, "<" + _NUMPY_CODES[REGISTERS[name].struct_code]) for name in TELEMETRY_REGISTERS
+])
+
+
+class TelemetrySampler:
+    """Fixed-size telemetry history with windowed views and display downsampling"""
+
+    def __init__(self, capacity: int = 18000):
+        """capacity: records kept (18000 = 30 min at 10 Hz, 5 h at 1 Hz)"""
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.capacity = capacity
+        self._buf = np.zeros(2 * capacity, dtype=TELEMETRY_DTYPE)
+        self._head = 0     # Slot the next record goes to (0 .. capacity-1)
+        self.count = 0     # Records held (<= capacity)
+        self.total = 0     # Records ever appended
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.count
+
+    # ====== WRITE ======
+    def append(self, snapshot: TelemetrySnapshot) -> None:
+        """Store one snapshot (O(1), no allocation)"""
+        record = (snapshot.timestamp, *(getattr(snapshot, name) for name in TELEMETRY_REGISTERS))
+        with self._lock:
+            head = self._head
+            self._buf[head] = record
+            self._buf[head + self.capacity] = record
+            self._head = (head + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.total += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._head = 0
+            self.count = 0
+
+    # ====== READ (views are invalidated as the ring wraps; copy to keep) ======
+    def latest(self, n: Optional[int] = None) -> np.ndarray:
+        """View of the newest n records (all held records by default), oldest first"""
+        with self._lock:
+            n = self.count if n is None else max(0, min(n, self.count))
+            end = self._head + self.capacity
+            return self._buf[end - n:end]
+
+    def window(self, seconds: float, now: Optional[float] = None) -> np.ndarray:
+        """View of the records from the last `seconds` (relative to now or time.time())"""
+        records = self.latest()
+        start = np.searchsorted(records["timestamp"], (now or time.time()) - seconds, side="left")
+        return records[start:]
+
+    def last(self) -> Optional[np.void]:
+        """Newest record, or None when empty"""
+        records = self.latest(1)
+        return records[0] if len(records) else None
+
+    def downsample(self, field: str, buckets: int, seconds: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """
+        Min/max/mean of `field` in `buckets` equal-count buckets over the window
+        (whole history by default) - enough to draw an envelope of any length.
+        """
+        records = self.latest() if seconds is None else self.window(seconds)
+        empty = np.empty(0)
+        if not len(records) or buckets < 1:
+            return {"timestamp": empty, "min": empty, "max": empty, "mean": empty}
+        buckets = min(buckets, len(records))
+        per_bucket = len(records) // buckets
+        used = records[len(records) - per_bucket * buckets:]  # Drop the oldest remainder
+        values = used[field].astype(np.float64).reshape(buckets, per_bucket)
+        return {
+            "timestamp": used["timestamp"].reshape(buckets, per_bucket)[:, 0].copy(),
+            "min": values.min(axis=1),
+            "max": values.max(axis=1),
+            "mean": values.mean(axis=1),
+        }
+
+    def save(self, path: str, seconds: Optional[float] = None) -> str:
+        """Write the history (or the last `seconds`) to a .npy file"""
+        records = self.latest() if seconds is None else self.window(seconds)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.save(path, records.copy())
+        return path
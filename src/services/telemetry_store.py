@@ -0,0 +1,341 @@
+"""
+Telemetry Store
+Append-only, compressed, columnar telemetry segments on local storage
+
+append() only queues the snapshot. A writer thread batches records and appends
+one compressed block per batch to the current segment file, rotating to a new
+segment by size or age and deleting the oldest segments beyond a total budget.
+Large batches and few fsyncs keep SD card wear low.
+
+Segment file format (little-endian):
+    file header: magic b"CZTS" | version u8 | reserved u8 | created (wall clock) f64 | dtype length u16 | dtype JSON
+    block:       magic b"CZTB" | count u32 | first ms i64 | last ms i64 | compressed length u32 per column
+                 | zlib(column) per column
+Each column is delta encoded in its own dtype (wrap-around, so it is lossless):
+the first value is stored as is, then the differences to the previous record.
+Timestamps are integer milliseconds. A block cut short by a power loss ends
+the segment when reading.
+"""
+
+import glob
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from hardware.uart_manager import TelemetrySnapshot
+from services.telemetry_sampler import TELEMETRY_DTYPE
+
+SEGMENT_MAGIC = b"CZTS"
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct('<4sBBdH')
+BLOCK_MAGIC = b"CZTB"
+BLOCK_PREFIX = struct.Struct('<4sIqq')
+SEGMENT_PATTERN = "telemetry_*.czts"
+
+
+# =========== ========== ========== =================== COLUMN CODEC =================== ========== ==========
+def _storage_dtype(dtype: np.dtype) -> np.dtype:
+    """On-disk record layout: the float timestamp becomes integer milliseconds"""
+    return np.dtype([(name, "<i8" if name == "timestamp" else dtype[name].str) for name in dtype.names])
+
+
+def _delta(column: np.ndarray) -> np.ndarray:
+    encoded = column.copy()
+    encoded[1:] = column[1:] - column[:-1]  # Wraps in the column dtype
+    return encoded
+
+
+def _undelta(encoded: np.ndarray) -> np.ndarray:
+    return np.cumsum(encoded, dtype=encoded.dtype)
+
+
+def encode_block(records: np.ndarray, level: int = 9) -> bytes:
+    """One compressed block from an array of TELEMETRY_DTYPE records"""
+    stored = _storage_dtype(records.dtype)
+    millis = np.round(records["timestamp"] * 1000).astype("<i8")
+    columns = []
+    for name in records.dtype.names:
+        values = millis if name == "timestamp" else records[name].astype(stored[name], copy=False)
+        columns.append(zlib.compress(_delta(values).tobytes(), level))
+    lengths = struct.pack(f'<{len(columns)}I', *(len(c) for c in columns))
+    return BLOCK_PREFIX.pack(BLOCK_MAGIC, len(records), int(millis[0]), int(millis[-1])) + lengths + b"".join(columns)
+
+
+def decode_columns(dtype: np.dtype, count: int, payloads: List[bytes]) -> np.ndarray:
+    """Records of one block from its compressed column payloads"""
+    stored = _storage_dtype(dtype)
+    records = np.empty(count, dtype=dtype)
+    for name, payload in zip(dtype.names, payloads):
+        values = _undelta(np.frombuffer(zlib.decompress(payload), dtype=stored[name], count=count))
+        records[name] = values / 1000.0 if name == "timestamp" else values
+    return records
+
+
+# =========== ========== ========== =================== SEGMENT FILES =================== ========== ==========
+def write_segment_header(f, dtype: np.dtype, created: float) -> None:
+    descr = json.dumps(dtype.descr).encode()
+    f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, 0, created, len(descr)))
+    f.write(descr)
+
+
+def read_segment_header(f) -> Tuple[np.dtype, float]:
+    raw = f.read(SEGMENT_HEADER.size)
+    if len(raw) < SEGMENT_HEADER.size:
+        raise ValueError("Truncated segment header")
+    magic, version, _, created, descr_len = SEGMENT_HEADER.unpack(raw)
+    if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+        raise ValueError(f"Not a telemetry segment (magic={magic!r}, version={version})")
+    descr = json.loads(f.read(descr_len))
+    return np.dtype([tuple(field) for field in descr]), created
+
+
+def _walk_blocks(mm, offset: int, field_count: int) -> Iterator[Tuple[int, int, int, int, Tuple[int, ...]]]:
+    """(count, first ms, last ms, payload offset, column lengths) of each complete block"""
+    lengths_fmt = struct.Struct(f'<{field_count}I')
+    prefix_size = BLOCK_PREFIX.size + lengths_fmt.size
+    while offset + prefix_size <= len(mm):
+        magic, count, first_ms, last_ms = BLOCK_PREFIX.unpack_from(mm, offset)
+        if magic != BLOCK_MAGIC:
+            return
+        lengths = lengths_fmt.unpack_from(mm, offset + BLOCK_PREFIX.size)
+        start = offset + prefix_size
+        offset = start + sum(lengths)
+        if offset > len(mm):
+            return  # Torn final block
+        yield count, first_ms, last_ms, start, lengths
+
+
+def _decode_at(view: memoryview, dtype: np.dtype, count: int, start: int, lengths: Tuple[int, ...]) -> np.ndarray:
+    payloads = []
+    for n in lengths:
+        payloads.append(view[start:start + n])
+        start += n
+    try:
+        return decode_columns(dtype, count, payloads)
+    finally:
+        for payload in payloads:
+            payload.release()
+
+
+def iter_blocks(path: str, t_start: float = float("-inf"),
+                t_end: float = float("inf")) -> Iterator[np.ndarray]:
+    """
+    Decoded blocks of one segment that overlap [t_start, t_end]. The file is
+    memory-mapped: blocks outside the range are skipped by header alone, and
+    columns are decompressed straight from the mapping.
+    """
+    with open(path, 'rb') as f:
+        dtype, _ = read_segment_header(f)
+        offset = f.tell()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            for count, first_ms, last_ms, start, lengths in _walk_blocks(mm, offset, len(dtype.names)):
+                if last_ms / 1000.0 < t_start or first_ms / 1000.0 > t_end:
+                    continue
+                try:
+                    block = _decode_at(view, dtype, count, start, lengths)
+                except zlib.error:
+                    return
+                yield block
+
+
+def read_segment(path: str) -> np.ndarray:
+    """
+    Every record of one segment in a single array. Column deltas of all blocks
+    are decompressed into one buffer and undone with one cumsum per column.
+    """
+    with open(path, 'rb') as f:
+        dtype, _ = read_segment_header(f)
+        offset = f.tell()
+        stored = _storage_dtype(dtype)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            blocks = list(_walk_blocks(mm, offset, len(dtype.names)))
+            deltas = {name: np.empty(sum(b[0] for b in blocks), dtype=stored[name]) for name in dtype.names}
+            block_starts = []
+            filled = 0
+            for count, _, _, start, lengths in blocks:
+                try:
+                    columns = []
+                    for name, n in zip(dtype.names, lengths):
+                        with view[start:start + n] as payload:
+                            columns.append(np.frombuffer(zlib.decompress(payload), dtype=stored[name], count=count))
+                        start += n
+                except (zlib.error, ValueError):
+                    break
+                for name, column in zip(dtype.names, columns):
+                    deltas[name][filled:filled + count] = column
+                block_starts.append(filled)
+                filled += count
+
+    records = np.empty(filled, dtype=dtype)
+    if not filled:
+        return records
+    starts = np.array(block_starts)
+    counts = np.diff(np.append(starts, filled))
+    for name in dtype.names:
+        running = np.cumsum(deltas[name][:filled], dtype=stored[name])
+        # Each block restarts from its own first value: remove the carry from earlier blocks
+        carry = np.zeros(len(starts), dtype=stored[name])
+        carry[1:] = running[starts[1:] - 1]
+        values = running - np.repeat(carry, counts)
+        records[name] = values / 1000.0 if name == "timestamp" else values
+    return records
+
+
+# =========== ========== ========== =================== STORE =================== ========== ==========
+class TelemetryStore:
+    """Batched background writer and range reader for telemetry segments"""
+
+    def __init__(self, directory: str, batch_size: int = 300, flush_interval: float = 300.0,
+                 max_segment_bytes: int = 1 << 20, max_segment_age: float = 24 * 3600.0,
+                 max_total_bytes: int = 64 << 20, dtype: np.dtype = TELEMETRY_DTYPE) -> None:
+        """
+        A batch is written when batch_size records are queued or flush_interval
+        seconds have passed; segments rotate at max_segment_bytes or max_segment_age,
+        and the oldest are deleted once the directory exceeds max_total_bytes.
+        """
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.max_total_bytes = max_total_bytes
+        self.dtype = dtype
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=10 * batch_size)  # records, flush Events, None = stop
+        self._segment: Optional[str] = None
+        self._segment_created = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="TelemetryStore", daemon=True)
+        self._thread.start()
+
+    # ====== PUBLIC API ======
+    def append(self, snapshot: TelemetrySnapshot) -> None:
+        """Queue one snapshot (never blocks; counts and reports a drop if the writer is stuck)"""
+        record = (snapshot.timestamp, *(getattr(snapshot, name) for name in self.dtype.names[1:]))
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped & (self.dropped - 1) == 0:  # First drop, then each doubling
+                print(f"[TelemetryStore] writer behind, {self.dropped} record(s) dropped "
+                      f"(queue holds {self._queue.maxsize})")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Write everything queued so far; True once it is on disk"""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)  # Behind every record queued before it
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write the pending batch and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def segments(self) -> List[str]:
+        """Segment paths, oldest first"""
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)))
+
+    def read(self, t_start: float = float("-inf"), t_end: float = float("inf")) -> np.ndarray:
+        """All stored records with t_start <= timestamp <= t_end (not including unflushed ones)"""
+        paths = self.segments()
+        starts = [self._segment_start(p) for p in paths]
+        parts = []
+        for i, path in enumerate(paths):
+            next_start = starts[i + 1] if i + 1 < len(paths) else float("inf")
+            if next_start < t_start:
+                continue  # Everything in it was written before the next segment was created
+            try:
+                for block in iter_blocks(path, t_start, t_end):
+                    ts = block["timestamp"]
+                    parts.append(block[(ts >= t_start) & (ts <= t_end)])
+            except (OSError, ValueError) as e:
+                print(f"[TelemetryStore] skipping {os.path.basename(path)}: {e}")
+        if not parts:
+            return np.empty(0, dtype=self.dtype)
+        return np.concatenate(parts)
+
+    # ====== WRITER THREAD ======
+    def _run(self) -> None:
+        batch: List[tuple] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = ()
+            flush_done = item if isinstance(item, threading.Event) else None
+            if isinstance(item, tuple) and item:
+                batch.append(item)
+            if batch and (item is None or flush_done or len(batch) >= self.batch_size
+                          or time.monotonic() >= deadline):
+                self._write_batch(batch)
+                batch = []
+            if not batch:
+                deadline = time.monotonic() + self.flush_interval
+            if flush_done:
+                flush_done.set()
+            if item is None:
+                break
+
+    def _write_batch(self, batch: List[tuple]) -> None:
+        try:
+            block = encode_block(np.array(batch, dtype=self.dtype))
+            path = self._current_segment(len(block))
+            with open(path, 'ab') as f:
+                f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            print(f"[TelemetryStore] write error: {e}")
+
+    def _current_segment(self, incoming: int) -> str:
+        """Segment to append to, rotating by size/age first"""
+        now = time.time()
+        if self._segment and os.path.exists(self._segment):
+            size = os.path.getsize(self._segment)
+            if size + incoming <= self.max_segment_bytes and now - self._segment_created < self.max_segment_age:
+                return self._segment
+        path = os.path.join(self.directory, f"telemetry_{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.czts")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory,
+                                f"telemetry_{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}_{suffix}.czts")
+            suffix += 1
+        with open(path, 'wb') as f:
+            write_segment_header(f, self.dtype, now)
+        self._segment, self._segment_created = path, now
+        self._enforce_budget()
+        return path
+
+    def _enforce_budget(self) -> None:
+        paths = self.segments()
+        sizes = [os.path.getsize(p) for p in paths]
+        total = sum(sizes)
+        for path, size in zip(paths, sizes):
+            if total <= self.max_total_bytes or path == self._segment:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                print(f"[TelemetryStore] could not remove {path}: {e}")
+
+    @staticmethod
+    def _segment_start(path: str) -> float:
+        try:
+            with open(path, 'rb') as f:
+                return read_segment_header(f)[1]
+        except (OSError, ValueError):
+            return float("-inf")
@@ -2,6 +2,7 @@ import os
 import time
 import json
 import subprocess
+import threading
 import tkinter as tk 
 from tkinter import PhotoImage
 from typing import Optional,List
@@ -9,14 +10,16 @@ from hardware.connectivity import ConnectivityManager
 
 from hardware.wave import WaveAnimation
 from core.app_state import AppState
-from services.motor_service import MotorService
+from services.controller_manager import ControllerManager
 from services.fault_service import FaultMonitor
+from services.telemetry_sampler import TelemetrySampler
+from services.telemetry_store import TelemetryStore
 from core.translations import t, LanguageManager
  
 # Import Configuration and helpers 
 from core.config import (COLORS, TRAINING_PLANS, SPEED_PRESETS, GPIO_PINS, MODE_DURATIONS,MODE_DESCRIPTIONS,
                     FONTS, UI_DIMENSIONS, DEFAULTS, TIMER_OPTIONS,FAULT_NAMES,STALL_FAULTS,FAULT_COLORS,
-                   PATHS)
+                   PATHS, TIMING)
 from hardware.gpio_handler import GPIOHandler
 from core.mode_manager import ModeManager
 
@@ -36,8 +39,6 @@ class JetUI:
         self.colors = COLORS
         self.timer_options = TIMER_OPTIONS
         self.training_plans = TRAINING_PLANS.copy()
-        self.fault_check_interval = 2000
-        self.speed_check_interval = 1000 
         
          # Pairing system variables
         self.paired_remotes = set()
@@ -55,11 +56,14 @@ class JetUI:
         # MANAGERS/SERVICES (Keep as self.X)
         self.mode_manager = ModeManager()
         self.cm: ConnectivityManager | None = None
-        self.motor = MotorService()
+        self.motor = ControllerManager(dispatch=self._call_in_ui)  # One MotorService per jet (CONZERO_UART_PORTS)
         self.fault_monitor = FaultMonitor(on_fault_changed=self._on_fault_changed) 
+        self.telemetry = TelemetrySampler()  # History for the minutes before a fault
+        self.telemetry_store = TelemetryStore(PATHS["telemetry"])  # Durable, written in batches off the Tk thread
         
         # UI-SPECIFIC TIMERS (Keep as self.X)
         self._fault_cycle_id = None
+        self._telemetry_pending = False
         
         # LED setup
         self.led_pin = GPIO_PINS["led"]
@@ -203,11 +207,8 @@ class JetUI:
         # Initialize motor after a short delay
         self.root.after(200, self._init_motor)
         
-        # Start fault monitoring loop
-        self.root.after(self.fault_check_interval, self._monitor_faults)
-        
-        # Start speed monitoring loop
-        self.root.after(self.speed_check_interval, self._monitor_speed)
+        # Start telemetry (fault + speed) monitoring loop
+        self.root.after(self._telemetry_interval(), self._monitor_telemetry)
         
         
 # ====================================================== LANGUAGE SWITCHTING ======================================================  
@@ -375,27 +376,74 @@ class JetUI:
                 self.state.paused = True
                 self.state.speed = 0
             
-    # ====================================================== FAULT MONITORING ======================================================
+    # ====================================================== TELEMETRY MONITORING ======================================================
 
-    def _monitor_faults(self):
-        """Periodically check motor faults"""
-        if self.state.motor_ready:
-            try:
-                faults = self.motor.read_faults(motor_index=1)
-                if faults is not None:
-                    # Update fault monitor (it calls our callback)
-                    self.fault_monitor.update_faults(faults)
-                    
-                    # Update app state
-                    self.state.current_faults = faults
-                    self.state.system_stalled = self.fault_monitor.is_stalled()
-                    self.state.active_fault_list = self.fault_monitor.active_fault_list
-            except Exception as e:
-                print(f"Fault check error: {e}")
+    def _monitor_telemetry(self):
+        """Periodically read faults and speed in one batched UART transaction"""
+        if self.state.motor_ready and not self._telemetry_pending:
+            self._telemetry_pending = True
+            self.motor.read_telemetry(motor_index=1, callback=self._on_telemetry)
+        
+        if not self._motor_running():
+            # Motor off or paused - clear speed display
+            self.state.speed_actual_label.config(text="")
     
         # Schedule next check
-            self.root.after(self.fault_check_interval, self._monitor_faults)
+        self.root.after(self._telemetry_interval(), self._monitor_telemetry)
+
+    def _telemetry_interval(self) -> int:
+        """Poll period (ms) for the current state: fast while ramping or faulted, slow while idle/off"""
+        if self.state.current_faults or self.state.system_stalled:
+            return TIMING["telemetry_fast_interval"]
+        if not self.state.power_on:
+            return TIMING["telemetry_off_interval"]
+        if self.state.paused:
+            return TIMING["fault_check_interval"]
+        if self.state.motor_ready and self.motor and self.motor.ramp_active():
+            return TIMING["telemetry_fast_interval"]
+        return TIMING["speed_check_interval"]
+
+    def _motor_running(self) -> bool:
+        return bool(self.state.motor_ready and self.motor and self.state.power_on
+                    and not self.state.paused and not self.state.system_stalled)
+
+    def _on_telemetry(self, snapshot):
+        """Telemetry snapshot, delivered on the Tk thread"""
+        self._telemetry_pending = False
+        if snapshot is None:
+            return
+        self.telemetry.append(snapshot)
+        self.telemetry_store.append(snapshot)
+        self._on_faults_read(snapshot.faults)
+        if self._motor_running():
+            self._on_speed_read(snapshot.speed_meas)
+
+    def _on_faults_read(self, faults: int):
+        """Apply a fault word read from the controller"""
+        try:
+            if faults & ~self.state.current_faults:
+                self._save_telemetry_history("fault")
+            
+            # Update fault monitor (it calls our callback)
+            self.fault_monitor.update_faults(faults)
+            
+            # Update app state
+            self.state.current_faults = faults
+            self.state.system_stalled = self.fault_monitor.is_stalled()
+            self.state.active_fault_list = self.fault_monitor.active_fault_list
+        except Exception as e:
+            print(f"Fault check error: {e}")
            
+    def _save_telemetry_history(self, reason: str):
+        """Write the sampled telemetry leading up to now to logs/"""
+        if not len(self.telemetry):
+            return
+        try:
+            path = os.path.join(PATHS["logs"], f"telemetry_{time.strftime('%Y%m%d-%H%M%S')}_{reason}.npy")
+            print(f"Telemetry history saved to {self.telemetry.save(path)}")
+        except Exception as e:
+            print(f"Telemetry history save error: {e}")
+
     def _setup_led(self):
         """Initialize LED GPIO pin"""
         try:
@@ -425,29 +473,16 @@ class JetUI:
             
     # ====================================================== SPEED MONITORING(Remove later) ======================================================
     
-    def _monitor_speed(self):
-        """Periodically check actual motor speed vs reference"""
-        if self.state.motor_ready and self.motor and self.state.power_on and not self.state.paused and not self.state.system_stalled:
-            try:
-               # Poll actual speed
-                # Read actual speed
-                speed_actual = self.motor.read_speed(motor_index=1)
-
-                if speed_actual is not None:
-                    self.state.speed_actual = speed_actual
-                    self.state.speed_reference = self.motor.get_last_speed_ref() or 0
-                    
-                    # Update display
-                    self._update_speed_display()
-                    
-            except Exception as e:
-                print(f"Speed check error: {e}")
-        else:
-            # Motor off or paused - clear speed display
-            self.state.speed_actual_label.config(text="")
-        
-        # Schedule next check
-        self.root.after(self.speed_check_interval, self._monitor_speed)
+    def _on_speed_read(self, speed_actual: int):
+        """Apply a measured speed read from the controller"""
+        try:
+            self.state.speed_actual = speed_actual
+            self.state.speed_reference = self.motor.get_last_speed_ref() or 0
+            
+            # Update display
+            self._update_speed_display()
+        except Exception as e:
+            print(f"Speed check error: {e}")
     
     def _update_speed_display(self):
         """Update speed actual vs reference display"""
@@ -610,6 +645,10 @@ class JetUI:
 
     # ====================================================== BLE EVENT HANDLING ======================================================
     
+    def _call_in_ui(self, fn, *args):
+            """Runs in UART worker thread. Marshal motor results to Tk main thread."""
+            self.root.after(0, fn, *args)
+
     def _on_ble_event(self, evt: dict):
             """Runs in BLE background thread. Marshal to Tk main thread."""
             self.root.after(0, self._handle_ble_event, evt)
@@ -766,12 +805,14 @@ class JetUI:
         """Gracefully stop motor, services and power off the Pi."""
         print(" CRITICAL: Stopping motor before shutdown...")
 
-        # EMERGENCY MOTOR STOP 
+        # EMERGENCY MOTOR STOP (fast lane: skips the UART queue and aborts the read in flight)
+        estop_timeout = self.motor.get_estop_timeout()  # timeouts.estop in motor_config.json
+        stop = None
         try:
             # Method 1: Send immediate stop command via UART
             if self.state.motor_ready:  #  Correct
                 print(" Sending emergency motor stop...")
-                self.motor.stop()  #  Correct
+                stop = self.motor.emergency_stop()
                 
             # Method 2: If UART fails, try GPIO emergency stop (if available)
             # This depends on your motor controller hardware
@@ -779,6 +820,16 @@ class JetUI:
         except Exception as e:
             print(f" Motor stop error: {e}")
 
+        # BLE, LED and logs shut down while the motor spins down
+        steps = [("Telemetry log", self.telemetry_store.close)]
+        if self.cm:
+            steps.append(("BLE", self.cm.stop_ble))
+        if hasattr(self, 'led') and self.led:
+            steps.append(("LED", self.led.off))
+        helpers = [threading.Thread(target=self._shutdown_step, args=step, daemon=True) for step in steps]
+        for thread in helpers:
+            thread.start()
+
         # HARDWARE RESET (if available) 
         try:
             # If your motor controller has a reset pin, trigger it
@@ -789,26 +840,22 @@ class JetUI:
         except Exception as e:
             print(f" Hardware reset error: {e}")
 
-        #  ADD SAFETY DELAY 
-        print(" Waiting for motor to stop...")
-        time.sleep(2)  # Critical: Wait for motor to actually stop
+        #  CONFIRM STANDSTILL (measured speed polled to zero against the deadline)
+        if stop is not None:
+            print(" Waiting for motor to stop...")
+            try:
+                confirmed = stop.result(timeout=estop_timeout + 1)
+            except Exception as e:
+                print(f" Motor stop error: {e}")
+                confirmed = False
+            if not confirmed:
+                print(" WARNING: Motor standstill not confirmed - powering off anyway")
+
+        for thread in helpers:
+            thread.join(timeout=2)
 
         # THEN PROCEED WITH NORMAL SHUTDOWN 
         try:
-            # Stop BLE scanning if running
-            if self.cm:
-                try:
-                    self.cm.stop_ble()
-                except Exception:
-                    pass
-
-            # Turn off LED
-            if hasattr(self, 'led') and self.led:
-                try:
-                    self.led.off()
-                except Exception:
-                    pass
-
             # Sync filesystems
             print(" Syncing filesystems...")
             subprocess.run(["sync"])
@@ -823,6 +870,13 @@ class JetUI:
             subprocess.run(["sudo", "shutdown", "-h", "now"])            
                     
    
+    def _shutdown_step(self, label: str, fn):
+        """Run one shutdown step on a helper thread; errors must not block power-off"""
+        try:
+            fn()
+        except Exception as e:
+            print(f" {label} shutdown error: {e}")
+
     def on_close(self):
         """Cleanup GPIO and close the window"""
         self.wave_anim.cleanup()
@@ -840,13 +894,18 @@ class JetUI:
             except Exception:
                 pass   
         self.motor.close()  
+        self.telemetry_store.close()
         self.root.destroy()    
         
     # ===================================== MOTOR CONTROL =======================================================================
     
     def _init_motor(self):
-        """Initialize motor service"""
-        if self.motor.initialize():
+        """Initialize motor service (handshake runs on the UART worker)"""
+        self.motor.initialize(callback=self._on_motor_initialized)
+
+    def _on_motor_initialized(self, ok: Optional[bool]):
+        """Motor init result, delivered on the Tk thread"""
+        if ok:
             self.state.motor_ready = True
             print("Motor initialized successfully")
         else:
@@ -864,12 +923,13 @@ class JetUI:
             print(" System stalled - cannot start motor")
             return
         
-        # Start motor
-        if self.motor.start():
-            # Send current speed
-            if self.state.speed > 0:
-                self._send_speed_to_motor(self.state.speed)
-        else:
+        # Start motor and send current speed in one pipelined burst
+        speed = self.state.speed if self.state.speed > 0 else None
+        self.motor.start(speed_percent=speed, callback=self._on_motor_started)
+
+    def _on_motor_started(self, success: Optional[bool]):
+        """Motor start result, delivered on the Tk thread (None when a later stop cancelled it)"""
+        if not success and self.state.power_on and not self.state.paused:
             self.status_label.config(text="START ERR", fg="#ff5555")
 
     def _motor_stop_safe(self):
@@ -879,7 +939,11 @@ class JetUI:
         if not self.state.motor_ready:
             return
         
-        if not self.motor.stop():
+        self.motor.stop(callback=self._on_motor_stopped)
+
+    def _on_motor_stopped(self, success: Optional[bool]):
+        """Motor stop result, delivered on the Tk thread"""
+        if not success:
             self.status_label.config(text="STOP ERR", fg="#ff5555")   
             
         
@@ -1216,25 +1280,28 @@ class JetUI:
             print("ERROR: Motor client not ready")
             return
         
+        # Send FAULT_ACK command
+        print("Sending FAULT_ACK...")
+        self.motor.acknowledge_faults(motor_index=1, callback=self._on_faults_acknowledged)
+
+    def _on_faults_acknowledged(self, success: Optional[bool]):
+        """FAULT_ACK result, delivered on the Tk thread"""
+        if not success:
+            print("ERROR: FAULT_ACK failed")
+            self.status_label.config(
+                    text=t("fault.clear_failed"),
+                fg=FAULT_COLORS["active"]
+            )
+            return
+        
+        # Wait for fault register to update, then verify faults cleared
+        self.root.after(200, lambda: self.motor.read_faults(
+            motor_index=1, callback=self._on_fault_clear_verified))
+
+    def _on_fault_clear_verified(self, faults_after: Optional[int]):
+        """Post-FAULT_ACK fault read, delivered on the Tk thread"""
         try:
-            # Send FAULT_ACK command
-            print("Sending FAULT_ACK...")
-            success = self.motor.acknowledge_faults(motor_index=1)
-            
-            if not success:
-                print("ERROR: FAULT_ACK failed")
-                self.status_label.config(
-                        text=t("fault.clear_failed"),
-                    fg=FAULT_COLORS["active"]
-                )
-                return
-            
-            # Wait for fault register to update
-            time.sleep(0.2)
-            
-            # Verify faults cleared
             print("Verifying faults cleared...")
-            faults_after = self.motor.read_faults(motor_index=1)
             
             if faults_after == 0:
                 # Success - faults cleared
@@ -1248,6 +1315,13 @@ class JetUI:
                 self.root.after(500, self._resume_motor)
                 self.root.after(2000, lambda: self.status_label.config(text="") if self.state.current_faults == 0 else None)
                 
+            elif faults_after is None:
+                print("ERROR: Fault verify read failed")
+                self.status_label.config(
+                    text=t("fault.clear_failed"),
+                    fg=FAULT_COLORS["active"]
+                )
+                
             elif faults_after & STALL_FAULTS:
                 # Stall faults remain
                 print(f"ERROR: Stall faults remain: 0x{faults_after:04X}")